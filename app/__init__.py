@@ -7,7 +7,10 @@ from config import Config
 # These are shared extension objects created outside the app factory.
 # They are initialized later inside create_app() so the app can be
 # created multiple times (useful for testing) without conflicts.
-db = SQLAlchemy()
+# RoutingSession sends the queries of @read_only routes to the read
+# replica when one is configured (see app/utils/replica.py).
+from app.utils.replica import RoutingSession
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login = LoginManager()
 
@@ -19,17 +22,29 @@ login.login_message = 'Please log in to access this page.'
 def create_app(config_class=Config):
     app = Flask(__name__)
 
+    # Templates are compiled once per language with constant t('key')
+    # calls inlined (see app/i18n.py).  Must be set before jinja_env is
+    # first used.
+    from app.i18n import I18nEnvironment
+    app.jinja_environment = I18nEnvironment
+
     # Load configuration values (SECRET_KEY, DATABASE_URI, etc.) from config.py
     app.config.from_object(config_class)
 
+    # Engine options for the configured backend (SQLite WAL, Postgres pool)
+    from app.utils import database, replica
+    database.init_app(app)
+    replica.init_app(app)
+
     # Bind the extensions to this specific app instance
     db.init_app(app)
+    database.register_engine_events(app)
     migrate.init_app(app, db)
     login.init_app(app)
 
     # --- Internationalisation (i18n) setup ---
     # Import the translation helpers from app/i18n.py
-    from app.i18n import t, tm
+    from app.i18n import t, tm, get_catalog, resolve_lang
 
     # Register t() and tm() as Jinja2 globals so every template can call
     # {{ t('key') }} or {{ tm(measurement_type) }} without importing anything.
@@ -37,11 +52,29 @@ def create_app(config_class=Config):
     app.jinja_env.globals['tm'] = tm
 
     # Before every request, read the 'lang' cookie (defaults to 'fr') and
-    # store it in Flask's request-scoped g object.  The t() function reads
-    # g.lang to decide which language to return.
+    # store it in Flask's request-scoped g object, along with the compiled
+    # catalog of that language that t() looks keys up in.  Unknown values
+    # fall back to 'fr': g.lang ends up in template names and cache keys.
     @app.before_request
     def set_language():
-        g.lang = request.cookies.get('lang', 'fr')
+        g.lang = resolve_lang(request.cookies.get('lang'))
+        g.catalog = get_catalog(g.lang)
+
+    # {% cache %} template fragments keyed by language and role
+    from app.utils import fragment_cache
+    fragment_cache.init_app(app)
+
+    # Per-request SQL statistics and slow query log
+    from app.utils import sql_instrumentation
+    sql_instrumentation.init_app(app)
+
+    # Reminder scheduler thread (only with REMINDER_SCHEDULER=1)
+    from app.utils import reminders
+    reminders.init_app(app)
+
+    # Maintenance commands (`flask cleanup-exports`, `flask rebuild-summaries`, ...)
+    from app import commands
+    commands.init_app(app)
 
     # Register the main blueprint that contains all application routes
     from app.routes import bp as main_bp
@@ -58,4 +91,4 @@ from app import models
 @login.user_loader
 def load_user(id):
     from app.models.user import User
-    return User.query.get(int(id))
+    return db.session.get(User, int(id))
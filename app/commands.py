@@ -0,0 +1,53 @@
+"""
+Maintenance commands, available through the `flask` CLI
+(e.g. `flask rebuild-summaries`).
+"""
+import click
+
+
+def init_app(app):
+    @app.cli.command('cleanup-exports')
+    def cleanup_exports_command():
+        """Expire old export jobs and evict unused cached exports."""
+        from app.utils.export_jobs import cleanup_expired_exports
+        count = cleanup_expired_exports()
+        click.echo(f'{count} export job(s)/file(s) cleaned up.')
+
+    @app.cli.command('rebuild-summaries')
+    def rebuild_summaries_command():
+        """Recompute every patient's measurement summaries."""
+        from app.models.measurement_summary import MeasurementSummary
+        count = MeasurementSummary.rebuild_all()
+        click.echo(f'{count} summary row(s) rebuilt.')
+
+    @app.cli.command('backfill-alerts')
+    def backfill_alerts_command():
+        """Raise doctor alerts for measurements recorded before alerts existed."""
+        from app.models.alert import Alert
+        count = Alert.backfill()
+        click.echo(f'{count} alert(s) created.')
+
+    @app.cli.command('extend-slot-horizon')
+    @click.option('--days', type=int, default=None,
+                  help='Horizon in days (default: SLOT_HORIZON_DAYS).')
+    def extend_slot_horizon_command(days):
+        """Create the free slots of recurring availabilities up to the horizon."""
+        from app.utils.slots import extend_horizon
+        count = extend_horizon(days)
+        click.echo(f'{count} slot(s) created.')
+
+    @app.cli.command('run-reminders')
+    @click.option('--once', is_flag=True, help='Send the reminders due now and exit.')
+    def run_reminders_command(once):
+        """Run the reminder scheduler (or a single dispatch with --once)."""
+        from app.utils import reminders
+        if once:
+            reminders.schedule_unscheduled()
+            sent = reminders.dispatch_due()
+            click.echo(f'{len(sent)} reminder(s) sent.')
+            return
+        click.echo('Reminder scheduler running, Ctrl+C to stop.')
+        try:
+            reminders.ReminderScheduler(app).run_forever()
+        except KeyboardInterrupt:
+            pass
@@ -1,6 +1,8 @@
 from flask_wtf import FlaskForm
 from wtforms import FloatField, SubmitField, TextAreaField, RadioField, StringField
-from wtforms.validators import DataRequired, Optional, NumberRange
+from wtforms.validators import DataRequired, Optional, NumberRange, ValidationError
+
+from app.models.reminder import parse_time_of_day, parse_weekdays
 
 
 class MeasurementForm(FlaskForm):
@@ -21,3 +23,15 @@ class ReminderForm(FlaskForm):
     time = StringField('Time (HH:MM)', validators=[DataRequired()])
     days = StringField('Days (optional)', validators=[Optional()])
     submit = SubmitField('Save reminder')
+
+    def validate_time(self, field):
+        try:
+            parse_time_of_day(field.data)
+        except ValueError as e:
+            raise ValidationError(str(e))
+
+    def validate_days(self, field):
+        try:
+            parse_weekdays(field.data)
+        except ValueError as e:
+            raise ValidationError(str(e))
@@ -1,4 +1,8 @@
-from flask import g
+from flask import g, has_request_context
+from flask.templating import Environment as FlaskEnvironment
+from jinja2 import BaseLoader, Undefined
+from jinja2.ext import Extension
+from jinja2.lexer import Token, TOKEN_STRING
 
 TRANSLATIONS = {
     'fr': {
@@ -126,6 +130,15 @@ TRANSLATIONS = {
         'list_recent':     'Historique récent',
         'list_no_meas':    'Aucune mesure',
         'list_start':      'Commencer maintenant',
+        'page_older':      'Mesures plus anciennes',
+        # ── measurement/export_status ──────────────────────────────────
+        'export_title':    'Export de vos mesures',
+        'export_pending':  'Préparation de votre fichier en cours…',
+        'export_done':     'Votre fichier est prêt.',
+        'export_failed':   "L'export a échoué. Veuillez réessayer.",
+        'export_expired':  'Ce fichier a expiré. Relancez un export.',
+        'export_download': 'Télécharger',
+        'export_back':     "Retour à l'historique",
         # ── measurement/select_method ──────────────────────────────────
         'select_type':       'Type de saisie',
         'select_how':        'Comment souhaitez-vous ajouter cette mesure ?',
@@ -155,6 +168,8 @@ TRANSLATIONS = {
         'doctor_next_appts': 'Prochains Rendez-vous',
         'doctor_see_all':    'Voir tout',
         'doctor_see_less':   'Voir moins',
+        'doctor_alert_ack':     'Marquer comme vue',
+        'doctor_alert_resolve': 'Marquer comme résolue',
         'doctor_free_slot':  'Créneau libre',
         'doctor_request':    'Demande:',
         'doctor_visio':      'Visio',
@@ -168,6 +183,19 @@ TRANSLATIONS = {
         # ── doctor/patient_history ─────────────────────────────────────
         'hist_patient_title': 'Historique Patient',
         'hist_of':            'Historique de',
+        # ── measurement/trends ─────────────────────────────────────────
+        'trends_title':       'Tendances',
+        'trends_readings':    'mesures',
+        'trends_mean':        'Moyenne',
+        'trends_days':        'j',
+        'trends_slope':       'Évolution par jour',
+        'trends_variability': 'Variabilité',
+        'trends_in_range':    'Temps dans la cible',
+        'trends_normal':      'normal',
+        'trends_warning':     'élevé',
+        'trends_high':        'très élevé',
+        'trends_morning':     'Matin',
+        'trends_evening':     'Soir',
         # ── doctor/agenda ──────────────────────────────────────────────
         'agenda_no_appts':    'Aucun rendez-vous ce jour.',
         'agenda_in_progress': 'En cours',
@@ -193,6 +221,21 @@ TRANSLATIONS = {
         'agenda_visio':       'Visio',
         'agenda_cabinet':     'Cabinet',
         'agenda_request':     'Demande:',
+        'agenda_recurring':   'Récurrent',
+        # ── doctor/availability ────────────────────────────────────────
+        'avail_title':        'Disponibilités récurrentes',
+        'avail_desc':         'Les créneaux libres sont créés automatiquement à l\'avance, chaque semaine.',
+        'avail_horizon':      'Horizon (jours)',
+        'avail_new':          'Nouvelle disponibilité',
+        'avail_days':         'Jours',
+        'avail_start':        'Début',
+        'avail_end':          'Fin',
+        'avail_slot_length':  'Durée d\'un créneau (min)',
+        'avail_save':         'Enregistrer et générer les créneaux',
+        'avail_none':         'Aucune disponibilité récurrente.',
+        'avail_delete_confirm': 'Supprimer cette disponibilité et ses créneaux libres à venir ?',
+        'weekday_0': 'Lun', 'weekday_1': 'Mar', 'weekday_2': 'Mer', 'weekday_3': 'Jeu',
+        'weekday_4': 'Ven', 'weekday_5': 'Sam', 'weekday_6': 'Dim',
         # ── patient/booking ────────────────────────────────────────────
         'book_title':       'Prendre RDV',
         'book_back':        '← Retour',
@@ -202,6 +245,12 @@ TRANSLATIONS = {
         'book_reason':      'Motif de la consultation',
         'book_placeholder': 'Ex: Renouvellement ordonnance, fièvre...',
         'book_confirm':     'Confirmer la demande',
+        'book_doctor':      'Médecin',
+        'book_all_doctors': 'Tous les médecins',
+        'book_all_types':   'Tous',
+        'book_from':        'À partir du',
+        'book_search':      'Rechercher',
+        'book_more':        'Créneaux suivants',
         # ── reminder/add ───────────────────────────────────────────────
         'reminder_new':          'Nouveau rappel',
         'reminder_title_label':  'Titre du rappel',
@@ -391,6 +440,15 @@ TRANSLATIONS = {
         'list_recent':     'Recent history',
         'list_no_meas':    'No measurements',
         'list_start':      'Get started',
+        'page_older':      'Older measurements',
+        # ── measurement/export_status ──────────────────────────────────
+        'export_title':    'Exporting your measurements',
+        'export_pending':  'Preparing your file…',
+        'export_done':     'Your file is ready.',
+        'export_failed':   'The export failed. Please try again.',
+        'export_expired':  'This file has expired. Start a new export.',
+        'export_download': 'Download',
+        'export_back':     'Back to history',
         # ── measurement/select_method ──────────────────────────────────
         'select_type':       'Input type',
         'select_how':        'How would you like to add this measurement?',
@@ -420,6 +478,8 @@ TRANSLATIONS = {
         'doctor_next_appts': 'Next Appointments',
         'doctor_see_all':    'See all',
         'doctor_see_less':   'See less',
+        'doctor_alert_ack':     'Acknowledge',
+        'doctor_alert_resolve': 'Mark as resolved',
         'doctor_free_slot':  'Free slot',
         'doctor_request':    'Request:',
         'doctor_visio':      'Video',
@@ -433,6 +493,19 @@ TRANSLATIONS = {
         # ── doctor/patient_history ─────────────────────────────────────
         'hist_patient_title': 'Patient History',
         'hist_of':            'History of',
+        # ── measurement/trends ─────────────────────────────────────────
+        'trends_title':       'Trends',
+        'trends_readings':    'readings',
+        'trends_mean':        'Mean',
+        'trends_days':        'd',
+        'trends_slope':       'Change per day',
+        'trends_variability': 'Variability',
+        'trends_in_range':    'Time in range',
+        'trends_normal':      'normal',
+        'trends_warning':     'elevated',
+        'trends_high':        'high',
+        'trends_morning':     'Morning',
+        'trends_evening':     'Evening',
         # ── doctor/agenda ──────────────────────────────────────────────
         'agenda_no_appts':    'No appointments today.',
         'agenda_in_progress': 'In progress',
@@ -458,6 +531,21 @@ TRANSLATIONS = {
         'agenda_visio':       'Video',
         'agenda_cabinet':     'Office',
         'agenda_request':     'Request:',
+        'agenda_recurring':   'Recurring',
+        # ── doctor/availability ────────────────────────────────────────
+        'avail_title':        'Recurring availability',
+        'avail_desc':         'Free slots are created automatically ahead of time, every week.',
+        'avail_horizon':      'Horizon (days)',
+        'avail_new':          'New availability',
+        'avail_days':         'Days',
+        'avail_start':        'Start',
+        'avail_end':          'End',
+        'avail_slot_length':  'Slot length (min)',
+        'avail_save':         'Save and generate slots',
+        'avail_none':         'No recurring availability.',
+        'avail_delete_confirm': 'Delete this availability and its upcoming free slots?',
+        'weekday_0': 'Mon', 'weekday_1': 'Tue', 'weekday_2': 'Wed', 'weekday_3': 'Thu',
+        'weekday_4': 'Fri', 'weekday_5': 'Sat', 'weekday_6': 'Sun',
         # ── patient/booking ────────────────────────────────────────────
         'book_title':       'Book appointment',
         'book_back':        '← Back',
@@ -467,6 +555,12 @@ TRANSLATIONS = {
         'book_reason':      'Reason for appointment',
         'book_placeholder': 'e.g. Prescription renewal, fever...',
         'book_confirm':     'Confirm request',
+        'book_doctor':      'Doctor',
+        'book_all_doctors': 'All doctors',
+        'book_all_types':   'All',
+        'book_from':        'From',
+        'book_search':      'Search',
+        'book_more':        'Next slots',
         # ── reminder/add ───────────────────────────────────────────────
         'reminder_new':          'New reminder',
         'reminder_title_label':  'Reminder title',
@@ -534,16 +628,133 @@ TRANSLATIONS = {
 }
 
 
+DEFAULT_LANG = 'fr'
+
+# One flat dict per language with the French fallbacks already merged in,
+# so a lookup is a single dict access.
+CATALOGS = {
+    lang: {**TRANSLATIONS[DEFAULT_LANG], **messages}
+    for lang, messages in TRANSLATIONS.items()
+}
+
+
+def resolve_lang(lang):
+    """
+    `lang` if it is a supported language, else DEFAULT_LANG.  Cookie values
+    must go through this before reaching template names or cache keys.
+    """
+    return lang if lang in CATALOGS else DEFAULT_LANG
+
+
+def get_catalog(lang):
+    return CATALOGS.get(lang, CATALOGS[DEFAULT_LANG])
+
+
 def get_lang():
-    return g.get('lang', 'fr')
+    return g.get('lang', DEFAULT_LANG)
 
 
 def t(key):
-    lang = get_lang()
-    d = TRANSLATIONS.get(lang, TRANSLATIONS['fr'])
-    return d.get(key, TRANSLATIONS['fr'].get(key, key))
+    # g.catalog is bound once per request by the set_language hook.
+    try:
+        return g.catalog.get(key, key)
+    except AttributeError:
+        return get_catalog(get_lang()).get(key, key)
 
 
 def tm(type_str):
     """Translate a measurement type DB value (tension/glycemie/poids)."""
     return t('type_' + type_str) if type_str else ''
+
+
+# ── Per-language precompiled templates ─────────────────────────────────
+#
+# Templates rendered during a request are loaded as '@<lang>/<name>'.
+# The loader serves the plain template source for those names, and the
+# extension below replaces every constant t('key') call with the
+# translated string literal while compiling.  Jinja caches each language
+# variant separately, so translated text costs nothing at render time.
+# Dynamic calls (t(variable), tm(...)) still go through t().
+
+def split_lang(name):
+    """
+    '@en/base.html' -> ('en', 'base.html'); other names -> (None, name).
+    """
+    if name.startswith('@') and '/' in name:
+        prefix, rest = name.split('/', 1)
+        return prefix[1:], rest
+    return None, name
+
+
+class InlineTranslationsExtension(Extension):
+    def filter_stream(self, stream):
+        lang, _ = split_lang(stream.name or '')
+        if lang is None:
+            return stream
+        return self._inline(list(stream), get_catalog(lang))
+
+    @staticmethod
+    def _inline(tokens, catalog):
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if (token.test('name:t')
+                    and (i == 0 or not tokens[i - 1].test('dot'))
+                    and i + 3 < len(tokens)
+                    and tokens[i + 1].test('lparen')
+                    and tokens[i + 2].test('string')
+                    and tokens[i + 3].test('rparen')):
+                key = tokens[i + 2].value
+                yield Token(token.lineno, TOKEN_STRING, catalog.get(key, key))
+                i += 4
+            else:
+                yield token
+                i += 1
+
+
+class LanguageVariantLoader(BaseLoader):
+    """
+    Serves '@<lang>/<name>' from the wrapped loader's '<name>'.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+
+    def get_source(self, environment, template):
+        _, name = split_lang(template)
+        return self.loader.get_source(environment, name)
+
+    def list_templates(self):
+        return self.loader.list_templates()
+
+
+class I18nEnvironment(FlaskEnvironment):
+    """
+    Jinja environment that picks the language variant of each template
+    rendered during a request.  extends/include/import stay within the
+    variant of the template that references them (see join_path).
+    """
+    def __init__(self, app, **options):
+        super().__init__(app, **options)
+        self.loader = LanguageVariantLoader(self.loader)
+        self.add_extension(InlineTranslationsExtension)
+
+    def _variant(self, name):
+        if isinstance(name, str) and has_request_context() and split_lang(name)[0] is None:
+            return f'@{get_lang()}/{name}'
+        return name
+
+    def get_template(self, name, parent=None, globals=None):
+        if parent is None:
+            name = self._variant(name)
+        return super().get_template(name, parent, globals)
+
+    def select_template(self, names, parent=None, globals=None):
+        if parent is None and not isinstance(names, Undefined):
+            names = [self._variant(name) for name in names]
+        return super().select_template(names, parent, globals)
+
+    def join_path(self, template, parent):
+        lang, _ = split_lang(parent)
+        if lang is not None and split_lang(template)[0] is None:
+            return f'@{lang}/{template}'
+        return template
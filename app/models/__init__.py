@@ -3,3 +3,7 @@ from app.models.patient import Patient
 from app.models.measurement import Measurement
 from app.models.reminder import Reminder
 from app.models.appointment import Appointment
+from app.models.export_job import ExportJob
+from app.models.measurement_summary import MeasurementSummary
+from app.models.alert import Alert
+from app.models.slot_template import SlotTemplate
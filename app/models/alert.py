@@ -0,0 +1,106 @@
+from app import db
+from datetime import datetime
+
+class Alert(db.Model):
+    """
+    Doctor alert raised when a measurement crosses the Measurement.is_alert
+    thresholds.  Written by add_measurement so the dashboard only has to
+    read the open rows instead of re-evaluating recent measurements.
+    """
+    __table_args__ = (
+        db.Index('ix_alert_status_created_at', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    measurement_id = db.Column(db.Integer, db.ForeignKey('measurement.id'), unique=True, nullable=False)
+    # The patient the measurement belongs to
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+    type = db.Column(db.String(50), nullable=False)
+
+    # 'open', 'acknowledged', 'resolved'
+    status = db.Column(db.String(20), default='open', nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    acknowledged_at = db.Column(db.DateTime, nullable=True)
+    acknowledged_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+
+    # Relations
+    measurement = db.relationship('Measurement', backref=db.backref('alert', uselist=False))
+    user = db.relationship('User', foreign_keys=[user_id])
+
+    def __repr__(self):
+        return f'<Alert {self.type} {self.status}>'
+
+    @classmethod
+    def unresolved(cls):
+        """
+        Open and acknowledged alerts, newest first, with the measurement
+        and patient profile loaded in the same query.
+        """
+        from app.models.user import User
+        return cls.query.filter(cls.status.in_(('open', 'acknowledged')))\
+            .options(db.joinedload(cls.measurement),
+                     db.joinedload(cls.user).joinedload(User.patient))\
+            .order_by(cls.created_at.desc())
+
+    @classmethod
+    def sync(cls, measurement):
+        """
+        Creates, updates, reopens or resolves the alert of a measurement
+        after it was written.  The measurement must have been flushed.
+        """
+        alert = measurement.alert
+        if measurement.is_alert:
+            if alert is None:
+                alert = cls(measurement=measurement, user_id=measurement.user_id,
+                            type=measurement.type, status='open',
+                            created_at=measurement.date)
+                db.session.add(alert)
+            else:
+                if alert.status == 'resolved':
+                    # e.g. resolved by an earlier average, alerting again:
+                    # back on the dashboard as a new alert.
+                    alert.status = 'open'
+                    alert.created_at = measurement.date
+                    alert.resolved_at = None
+                    alert.acknowledged_at = None
+                    alert.acknowledged_by = None
+        elif alert is not None and alert.status != 'resolved':
+            # e.g. the 30 minute average brought the reading back down
+            alert.status = 'resolved'
+            alert.resolved_at = datetime.utcnow()
+        return alert
+
+    @classmethod
+    def backfill(cls, batch_size=500):
+        """
+        Raises alerts for existing measurements that have none yet.
+        Returns the number of alerts created.
+        """
+        from app.models.measurement import Measurement
+        rows = db.session.query(Measurement.id, Measurement.user_id, Measurement.type,
+                                Measurement.date)\
+            .outerjoin(cls)\
+            .filter(cls.id.is_(None), Measurement.is_alert)\
+            .yield_per(batch_size)
+
+        alerts = [
+            dict(measurement_id=id, user_id=user_id, type=type, status='open', created_at=date)
+            for id, user_id, type, date in rows
+        ]
+        if alerts:
+            db.session.bulk_insert_mappings(cls, alerts)
+        db.session.commit()
+        return len(alerts)
+
+    def acknowledge(self, doctor):
+        if self.status == 'open':
+            self.status = 'acknowledged'
+            self.acknowledged_at = datetime.utcnow()
+            self.acknowledged_by = doctor.id
+
+    def resolve(self):
+        self.status = 'resolved'
+        self.resolved_at = datetime.utcnow()
@@ -2,6 +2,13 @@ from app import db
 from datetime import datetime
 
 class Appointment(db.Model):
+    __table_args__ = (
+        # Agenda and calendar views: one doctor's appointments over a range
+        db.Index('ix_appointment_doctor_id_start_time', 'doctor_id', 'start_time'),
+        # Patient booking: free slots in a date window (see app/utils/booking.py)
+        db.Index('ix_appointment_status_start_time', 'status', 'start_time'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     patient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
@@ -21,6 +28,9 @@ class Appointment(db.Model):
     
     notes = db.Column(db.Text, nullable=True)
 
+    # Modèle récurrent qui a généré ce créneau (None: créé à la main)
+    template_id = db.Column(db.Integer, db.ForeignKey('slot_template.id'), nullable=True, index=True)
+
     # Relations
     doctor = db.relationship('User', foreign_keys=[doctor_id], backref='doctor_appointments')
     patient = db.relationship('User', foreign_keys=[patient_id], backref='patient_appointments')
@@ -29,6 +39,25 @@ class Appointment(db.Model):
         pid = self.patient_id if self.patient_id else 'No Patient'
         return f'<Appointment {self.start_time} - {pid}>'
 
+    @classmethod
+    def claim(cls, slot_id, patient_id, notes=None, now=None):
+        """
+        Réserve un créneau libre en un seul UPDATE (compare-and-set) :
+        la condition status == 'free' est vérifiée par la base au moment
+        de l'écriture, donc deux patients ne peuvent pas obtenir le même
+        créneau.  Returns False when the slot is taken, in the past or
+        does not exist.  Does not commit.
+        """
+        if now is None:
+            now = datetime.now()
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.id == slot_id, cls.status == 'free', cls.start_time > now)
+            .values(patient_id=patient_id, status='pending', notes=notes)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
     def is_visio(self):
         return self.type == 'visio'
 
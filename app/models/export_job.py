@@ -0,0 +1,28 @@
+from app import db
+from datetime import datetime
+
+class ExportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+    # 'pdf', 'excel'
+    format = db.Column(db.String(10), nullable=False)
+
+    # 'pending', 'running', 'done', 'failed', 'expired'
+    status = db.Column(db.String(20), default='pending', index=True)
+
+    # Artifact file name inside EXPORT_DIR (set once the job is done)
+    filename = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationship
+    user = db.relationship('User', backref='export_jobs')
+
+    def __repr__(self):
+        return f'<ExportJob {self.id} {self.format} {self.status}>'
+
+    def is_finished(self):
+        return self.status in ('done', 'failed', 'expired')
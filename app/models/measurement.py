@@ -1,7 +1,85 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+import operator
+from sqlalchemy.ext.hybrid import hybrid_property
+
+from app.utils.cursors import decode_cursor, encode_cursor
+
+# Severity thresholds, checked in order: (level, type, value1 >=, value2 >=).
+# A reading matches when either of its values reaches the limit.
+SEVERITY_RULES = [
+    ('high', 'tension', 140, 90),
+    ('warning', 'tension', 120, 80),
+    ('high', 'glycemie', 126, None),
+    ('warning', 'glycemie', 100, None),
+]
+
+# Doctor alert thresholds (strictly above): type -> (value1 >, value2 >)
+ALERT_RULES = {
+    'tension': (140, 90),
+    'glycemie': (180, None),
+    'poids': (130, None),
+}
+
+UNITS = {
+    'tension': 'mmHg',
+    'glycemie': 'mg/dL',
+    'poids': 'kg',
+}
+
+# A reading taken within this delay of the previous one of the same type
+# is averaged into it instead of being stored separately.
+AVERAGING_WINDOW = timedelta(minutes=30)
+
+STATUS_COLORS = {
+    'high': 'text-red-600',
+    'warning': 'text-amber-500',
+    'normal': 'text-green-600',
+}
+
+
+def _over(value1, value2, limit1, limit2, inclusive):
+    """
+    Python side of the threshold rules (see _over_sql for the SQL side).
+    """
+    compare = operator.ge if inclusive else operator.gt
+    return compare(value1, limit1) or \
+        (limit2 is not None and value2 is not None and compare(value2, limit2))
+
+
+def _over_sql(cls, limit1, limit2, inclusive):
+    compare = operator.ge if inclusive else operator.gt
+    conditions = [compare(cls.value1, limit1)]
+    if limit2 is not None:
+        conditions.append(db.and_(cls.value2.isnot(None), compare(cls.value2, limit2)))
+    return db.or_(*conditions)
+
+
+def severity_level(type, value1, value2):
+    """
+    Severity of a reading from its values (see Measurement.severity).
+    """
+    for level, rule_type, limit1, limit2 in SEVERITY_RULES:
+        if type == rule_type and _over(value1, value2, limit1, limit2, inclusive=True):
+            return level
+    return 'normal'
+
+
+PAGE_SIZE = 50
 
 class Measurement(db.Model):
+    # Every patient view filters on user_id (and often type) then orders by
+    # date desc: these composite indexes let SQLite walk the rows in order.
+    __table_args__ = (
+        db.Index('ix_measurement_user_type_date', 'user_id', 'type', 'date', 'id'),
+        db.Index('ix_measurement_user_date', 'user_id', 'date', 'id'),
+        # Device readings are identified by (source, external_id): a retried
+        # sync hits this index instead of inserting the reading twice.
+        # Rows entered by hand leave both NULL, which never conflicts.
+        db.Index('uq_measurement_user_source_external_id',
+                 'user_id', 'source', 'external_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type = db.Column(db.String(50), nullable=False) # 'tension', 'glycemie', 'poids'
@@ -16,51 +94,146 @@ class Measurement(db.Model):
     date = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     notes = db.Column(db.Text, nullable=True)
     
+    # Device sync: identifier of the device/app and of the reading on it
+    source = db.Column(db.String(50), nullable=True)
+    external_id = db.Column(db.String(100), nullable=True)
+
+    # Client-side sentinel, filled in by batched inserts only: it lets
+    # INSERT ... RETURNING hand the new ids back in row order on SQLite,
+    # which cannot order on the autoincrement id (app/utils/ingest.py).
+    _sentinel = db.insert_sentinel('_sentinel')
+    
     # Relationship
     user = db.relationship('User', backref='measurements')
 
     def __repr__(self):
         return f'<Measurement {self.type}: {self.value1}/{self.value2} {self.unit}>'
 
-    @property
+    @classmethod
+    def for_user(cls, user_id, type=None):
+        """
+        Base query for a user's measurements, newest first.
+        """
+        query = cls.query.filter(cls.user_id == user_id)
+        if type:
+            query = query.filter(cls.type == type)
+        return query.order_by(cls.date.desc(), cls.id.desc())
+
+    @classmethod
+    def data_version(cls, user_id):
+        """
+        (latest id, latest date, count) of a user's measurements: changes
+        whenever one is added or averaged (which moves its date).
+        """
+        return tuple(db.session.query(
+            db.func.max(cls.id),
+            db.func.max(cls.date),
+            db.func.count(cls.id),
+        ).filter(cls.user_id == user_id).one())
+
+    @classmethod
+    def average_latest(cls, measurement_id, value1, value2, now):
+        """
+        Averages a new reading into a stored one in a single UPDATE, as
+        long as that row is still inside AVERAGING_WINDOW.  The values are
+        computed by the database from the current row, so concurrent
+        writers cannot lose each other's update.  Returns False when the
+        row no longer qualifies: the caller inserts a new one instead.
+        """
+        values = {'value1': (cls.value1 + value1) / 2, 'date': now}
+        if value2:
+            values['value2'] = db.case(
+                (cls.value2.is_(None), value2),
+                else_=(cls.value2 + value2) / 2
+            )
+        result = db.session.execute(
+            db.update(cls)
+            .where(cls.id == measurement_id, cls.date > now - AVERAGING_WINDOW)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @classmethod
+    def page_for(cls, user_id, type=None, before=None, limit=PAGE_SIZE):
+        """
+        Keyset pagination over a user's measurements, newest first.
+
+        `before` is a cursor string returned by a previous call (or None for
+        the first page).  Returns (items, next_cursor) where next_cursor is
+        None on the last page.
+        """
+        query = cls.for_user(user_id, type)
+
+        key = decode_cursor(before)
+        if key:
+            date, id_ = key
+            query = query.filter(db.or_(
+                cls.date < date,
+                db.and_(cls.date == date, cls.id < id_)
+            ))
+
+        # Fetch one extra row to know whether another page exists.
+        items = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].date, items[-1].id)
+        return items, next_cursor
+
+    @hybrid_property
     def severity(self):
         """
         Determine severity level: 'normal', 'warning', 'high'.
         """
-        if self.type == 'tension':
-            if self.value1 >= 140 or (self.value2 and self.value2 >= 90):
-                return 'high'
-            elif self.value1 >= 120 or (self.value2 and self.value2 >= 80):
-                return 'warning'
-        
-        elif self.type == 'glycemie':
-            if self.value1 >= 126:
-                return 'high'
-            elif self.value1 >= 100:
-                return 'warning'
-                
-        return 'normal'
-
-    @property
+        return severity_level(self.type, self.value1, self.value2)
+
+    @severity.expression
+    def severity(cls):
+        return db.case(
+            *[(db.and_(cls.type == type, _over_sql(cls, limit1, limit2, inclusive=True)), level)
+              for level, type, limit1, limit2 in SEVERITY_RULES],
+            else_='normal'
+        )
+
+    @hybrid_property
     def status_color(self):
         # Returns Tailwind color class part
-        sev = self.severity
-        if sev == 'high':
-            return 'text-red-600'
-        elif sev == 'warning':
-            return 'text-amber-500'
-        return 'text-green-600'
-
-    @property
+        return STATUS_COLORS[self.severity]
+
+    @status_color.expression
+    def status_color(cls):
+        return db.case(STATUS_COLORS, value=cls.severity)
+
+    @hybrid_property
     def is_alert(self):
         """
         Checks if the measurement should trigger a doctor alert.
         Thresholds: Tension > 140/90, Glycemie > 180, Poids > 130 kg.
         """
-        if self.type == 'tension':
-            return self.value1 > 140 or (self.value2 and self.value2 > 90)
-        elif self.type == 'glycemie':
-            return self.value1 > 180
-        elif self.type == 'poids':
-            return self.value1 > 130
-        return False
+        limits = ALERT_RULES.get(self.type)
+        return limits is not None and _over(self.value1, self.value2, *limits, inclusive=False)
+
+    @is_alert.expression
+    def is_alert(cls):
+        return db.or_(*[
+            db.and_(cls.type == type, _over_sql(cls, limit1, limit2, inclusive=False))
+            for type, (limit1, limit2) in ALERT_RULES.items()
+        ])
+
+    @classmethod
+    def severity_counts(cls, user_ids=None):
+        """
+        Counts readings per (user, type, severity) in one aggregate query.
+        Returns {user_id: {type: {severity: count}}}.
+        """
+        severity = cls.severity.label('severity')
+        query = db.session.query(cls.user_id, cls.type, severity, db.func.count(cls.id))
+        if user_ids is not None:
+            query = query.filter(cls.user_id.in_(user_ids))
+        query = query.group_by(cls.user_id, cls.type, severity)
+
+        counts = {}
+        for user_id, type, level, count in query:
+            counts.setdefault(user_id, {}).setdefault(type, {})[level] = count
+        return counts
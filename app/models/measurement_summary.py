@@ -0,0 +1,271 @@
+from app import db
+from datetime import datetime
+import math
+from sqlalchemy.exc import IntegrityError
+
+# Number of points per type kept for the history chart.
+RECENT_POINTS = 8
+
+class MeasurementSummary(db.Model):
+    """
+    Running per-patient, per-type statistics, maintained by add_measurement
+    so that dashboards never have to scan the whole measurement history.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'type', name='uq_measurement_summary_user_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    type = db.Column(db.String(50), nullable=False)
+
+    # Running aggregates over value1 (mean = sum_value1 / count)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    sum_value1 = db.Column(db.Float, default=0, nullable=False)
+    min_value1 = db.Column(db.Float, nullable=True)
+    max_value1 = db.Column(db.Float, nullable=True)
+
+    # For the trends (app/utils/analytics.py): variance of value1, mean of
+    # value2 and readings per severity level ('normal' = count - others).
+    # NULL on summaries built before these existed (see stale).
+    sum_sq_value1 = db.Column(db.Float, nullable=True)
+    sum_value2 = db.Column(db.Float, nullable=True)
+    count_value2 = db.Column(db.Integer, nullable=True)
+    count_warning = db.Column(db.Integer, nullable=True)
+    count_high = db.Column(db.Integer, nullable=True)
+
+    latest_id = db.Column(db.Integer, nullable=True)
+    latest_value1 = db.Column(db.Float, nullable=True)
+    latest_value2 = db.Column(db.Float, nullable=True)
+    latest_date = db.Column(db.DateTime, nullable=True)
+
+    previous_value1 = db.Column(db.Float, nullable=True)
+    previous_value2 = db.Column(db.Float, nullable=True)
+    previous_date = db.Column(db.DateTime, nullable=True)
+
+    # Last RECENT_POINTS readings, newest first: [{'id', 'date', 'val1', 'val2'}]
+    recent = db.Column(db.JSON, default=list)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<MeasurementSummary {self.user_id} {self.type}: {self.count}>'
+
+    @property
+    def mean_value1(self):
+        return self.sum_value1 / self.count if self.count else None
+
+    @property
+    def mean_value2(self):
+        return self.sum_value2 / self.count_value2 if self.count_value2 else None
+
+    @property
+    def sd_value1(self):
+        """
+        Sample standard deviation of value1 (None under 2 readings).
+        """
+        if self.count is None or self.count < 2:
+            return None
+        variance = (self.sum_sq_value1 - self.sum_value1 ** 2 / self.count) / (self.count - 1)
+        return math.sqrt(max(variance, 0))
+
+    @property
+    def stale(self):
+        return self.sum_sq_value1 is None
+
+    def recent_points(self):
+        """
+        Recent readings, newest first, with dates parsed back to datetime.
+        """
+        return [dict(p, date=datetime.fromisoformat(p['date'])) for p in self.recent or []]
+
+    @classmethod
+    def get_or_create(cls, user_id, type):
+        summary = cls.query.filter_by(user_id=user_id, type=type).first()
+        if summary is None:
+            summary = cls(user_id=user_id, type=type, count=0, sum_value1=0, sum_sq_value1=0,
+                          sum_value2=0, count_value2=0, count_warning=0, count_high=0,
+                          recent=[])
+            db.session.add(summary)
+        return summary
+
+    @classmethod
+    def lock(cls, user_id, type):
+        """
+        Writes to the user's summary for the type, then returns it, so that
+        concurrent writers of the same user and type wait for each other
+        until commit (row lock on Postgres, write lock on SQLite).  Call it
+        first in the transaction, before reading the measurements it
+        guards.  A summary created here is built from the history.
+        """
+        touched = db.session.execute(
+            db.update(cls)
+            .where(cls.user_id == user_id, cls.type == type)
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not touched:
+            try:
+                # Savepoint: locks taken earlier in the transaction (other
+                # types of an ingested batch) stay held if this fails.
+                with db.session.begin_nested():
+                    summary = cls(user_id=user_id, type=type, count=0, sum_value1=0, recent=[])
+                    db.session.add(summary)
+                    summary.rebuild()
+                return summary
+            except IntegrityError:
+                # Created concurrently: read the other transaction's row.
+                return cls.lock(user_id, type)
+
+        # Read after the lock is held, over any copy loaded before.
+        return cls.query.filter_by(user_id=user_id, type=type).populate_existing().one()
+
+    @classmethod
+    def for_user(cls, user_id):
+        """
+        Returns {type: summary} for the user.  Users whose history predates
+        the summary table (or its trend columns) get their summaries built
+        on first access.
+        """
+        summaries = {s.type: s for s in cls.query.filter_by(user_id=user_id)}
+        stale = [s for s in summaries.values() if s.stale]
+        if stale:
+            for summary in stale:
+                summary.rebuild()
+            db.session.commit()
+        if not summaries:
+            from app.models.measurement import Measurement
+            types = db.session.query(Measurement.type)\
+                .filter(Measurement.user_id == user_id).distinct()
+            for (type,) in types:
+                summary = cls.get_or_create(user_id, type)
+                summary.rebuild()
+                summaries[type] = summary
+            if summaries:
+                db.session.commit()
+        return summaries
+
+    @classmethod
+    def rebuild_all(cls):
+        """
+        Recomputes every summary from the measurement table (backfill).
+        """
+        from app.models.measurement import Measurement
+        pairs = db.session.query(Measurement.user_id, Measurement.type).distinct().all()
+        for user_id, type in pairs:
+            cls.get_or_create(user_id, type).rebuild()
+        db.session.commit()
+        return len(pairs)
+
+    @staticmethod
+    def _point(m):
+        return {'id': m.id, 'date': m.date.isoformat(), 'val1': m.value1, 'val2': m.value2}
+
+    def add(self, m):
+        """
+        Accounts for a newly inserted measurement (must be flushed: id and
+        date are needed).
+        """
+        if self.stale or (self.latest_date and m.date < self.latest_date):
+            # Back-dated reading: ordering changes, recompute instead.
+            db.session.flush()
+            self.rebuild()
+            return
+
+        self.count = (self.count or 0) + 1
+        self.sum_value1 = (self.sum_value1 or 0) + m.value1
+        self.sum_sq_value1 += m.value1 ** 2
+        if m.value2 is not None:
+            self.sum_value2 += m.value2
+            self.count_value2 += 1
+        self._count_severity(m.severity, 1)
+        self.min_value1 = m.value1 if self.min_value1 is None else min(self.min_value1, m.value1)
+        self.max_value1 = m.value1 if self.max_value1 is None else max(self.max_value1, m.value1)
+
+        self.previous_value1 = self.latest_value1
+        self.previous_value2 = self.latest_value2
+        self.previous_date = self.latest_date
+        self._set_latest(m)
+
+        self.recent = ([self._point(m)] + (self.recent or []))[:RECENT_POINTS]
+
+    def replace_latest(self, m, old_value1, old_value2):
+        """
+        Accounts for the latest measurement being averaged in place
+        (add_measurement's 30 minute window).
+        """
+        from app.models.measurement import severity_level
+        if self.stale:
+            db.session.flush()
+            self.rebuild()
+            return
+
+        self.sum_value1 = (self.sum_value1 or 0) - old_value1 + m.value1
+        self.sum_sq_value1 += m.value1 ** 2 - old_value1 ** 2
+        if old_value2 is not None:
+            self.sum_value2 -= old_value2
+            self.count_value2 -= 1
+        if m.value2 is not None:
+            self.sum_value2 += m.value2
+            self.count_value2 += 1
+        self._count_severity(severity_level(self.type, old_value1, old_value2), -1)
+        self._count_severity(m.severity, 1)
+        if old_value1 in (self.min_value1, self.max_value1):
+            # The old value may have been the only extreme: ask the database.
+            self._refresh_min_max()
+        else:
+            self.min_value1 = min(self.min_value1, m.value1)
+            self.max_value1 = max(self.max_value1, m.value1)
+
+        self._set_latest(m)
+        self.recent = [self._point(m)] + [p for p in (self.recent or []) if p['id'] != m.id][:RECENT_POINTS - 1]
+
+    def rebuild(self):
+        """
+        Recomputes the summary from scratch.
+        """
+        from app.models.measurement import Measurement
+        severity = Measurement.severity
+        (self.count, self.sum_value1, self.sum_sq_value1, self.sum_value2,
+         self.count_value2, self.count_warning, self.count_high) = db.session.query(
+            db.func.count(Measurement.id),
+            db.func.coalesce(db.func.sum(Measurement.value1), 0),
+            db.func.coalesce(db.func.sum(Measurement.value1 * Measurement.value1), 0),
+            db.func.coalesce(db.func.sum(Measurement.value2), 0),
+            db.func.count(Measurement.value2),
+            db.func.coalesce(db.func.sum(db.case((severity == 'warning', 1), else_=0)), 0),
+            db.func.coalesce(db.func.sum(db.case((severity == 'high', 1), else_=0)), 0),
+        ).filter(Measurement.user_id == self.user_id, Measurement.type == self.type).one()
+        self._refresh_min_max()
+
+        latest = Measurement.for_user(self.user_id, self.type).limit(RECENT_POINTS).all()
+        self.recent = [self._point(m) for m in latest]
+        if latest:
+            self._set_latest(latest[0])
+        else:
+            self.latest_id = self.latest_value1 = self.latest_value2 = self.latest_date = None
+        if len(latest) > 1:
+            self.previous_value1 = latest[1].value1
+            self.previous_value2 = latest[1].value2
+            self.previous_date = latest[1].date
+        else:
+            self.previous_value1 = self.previous_value2 = self.previous_date = None
+
+    def _count_severity(self, level, delta):
+        if level == 'warning':
+            self.count_warning += delta
+        elif level == 'high':
+            self.count_high += delta
+
+    def _set_latest(self, m):
+        self.latest_id = m.id
+        self.latest_value1 = m.value1
+        self.latest_value2 = m.value2
+        self.latest_date = m.date
+
+    def _refresh_min_max(self):
+        from app.models.measurement import Measurement
+        self.min_value1, self.max_value1 = db.session.query(
+            db.func.min(Measurement.value1),
+            db.func.max(Measurement.value1)
+        ).filter(Measurement.user_id == self.user_id, Measurement.type == self.type).one()
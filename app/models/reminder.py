@@ -1,5 +1,68 @@
 from app import db
-from datetime import datetime
+from datetime import datetime, timedelta
+import re
+import unicodedata
+
+# Every day of the week (bit 0 = Monday ... bit 6 = Sunday)
+ALL_WEEKDAYS = 0b1111111
+
+# First letters of day names, French and English -> weekday
+DAY_PREFIXES = {
+    'lun': 0, 'mar': 1, 'mer': 2, 'jeu': 3, 'ven': 4, 'sam': 5, 'dim': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+}
+
+# Free-text values meaning "every day"
+EVERY_DAY = ('tous les jours', 'tlj', 'quotidien', 'every day', 'everyday', 'daily')
+
+
+def parse_time_of_day(value):
+    """
+    'HH:MM' -> minutes since midnight.  Raises ValueError.
+    """
+    match = re.fullmatch(r'\s*(\d{1,2})[:hH](\d{2})\s*', value or '')
+    if not match:
+        raise ValueError('Expected HH:MM.')
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if hours > 23 or minutes > 59:
+        raise ValueError('Expected HH:MM.')
+    return hours * 60 + minutes
+
+
+def _day(token):
+    token = unicodedata.normalize('NFKD', token).encode('ascii', 'ignore').decode()
+    weekday = DAY_PREFIXES.get(token[:3])
+    if weekday is None:
+        raise ValueError(f'Unknown day: {token}')
+    return weekday
+
+
+def parse_weekdays(value):
+    """
+    Free-text list of days ("Lundi, Mercredi", "Lun-Ven", "Mon, Fri") ->
+    weekday bitmask.  Empty means every day.  Raises ValueError.
+    """
+    text = (value or '').strip().lower()
+    if not text or text in EVERY_DAY:
+        return ALL_WEEKDAYS
+
+    text = re.sub(r'\s*-\s*', '-', text)
+    mask = 0
+    for part in re.split(r'[,;/\s]+(?:et\s+|and\s+)?', text):
+        if not part or part in ('et', 'and'):
+            continue
+        if '-' in part:
+            first, last = (_day(p) for p in part.split('-', 1))
+            day = first
+            while True:
+                mask |= 1 << day
+                if day == last:
+                    break
+                day = (day + 1) % 7
+        else:
+            mask |= 1 << _day(part)
+    return mask
+
 
 class Reminder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,5 +73,36 @@ class Reminder(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Horaire normalisé à partir de time / days (voir schedule())
+    weekdays = db.Column(db.Integer, nullable=True) # bitmask, bit 0 = Monday
+    minute_of_day = db.Column(db.Integer, nullable=True)
+
+    # Prochain déclenchement (None: inactif).  Indexed: the scheduler only
+    # reads the reminders that are due.
+    next_fire_at = db.Column(db.DateTime, nullable=True, index=True)
+    last_fired_at = db.Column(db.DateTime, nullable=True)
+
     def __repr__(self):
         return f'<Reminder {self.title} at {self.time}>'
+
+    def next_occurrence(self, after):
+        """
+        First time strictly after `after` matching the schedule.
+        """
+        day = after.replace(hour=0, minute=0, second=0, microsecond=0)
+        for offset in range(8):
+            candidate = day + timedelta(days=offset, minutes=self.minute_of_day)
+            if candidate > after and self.weekdays & (1 << candidate.weekday()):
+                return candidate
+        return None
+
+    def schedule(self, now=None):
+        """
+        Normalises time / days and recomputes next_fire_at.  Raises
+        ValueError if they cannot be read.
+        """
+        if now is None:
+            now = datetime.now()
+        self.minute_of_day = parse_time_of_day(self.time)
+        self.weekdays = parse_weekdays(self.days) or ALL_WEEKDAYS
+        self.next_fire_at = self.next_occurrence(now) if self.is_active is not False else None
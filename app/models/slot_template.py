@@ -0,0 +1,47 @@
+from app import db
+from datetime import datetime
+
+class SlotTemplate(db.Model):
+    """
+    Disponibilité hebdomadaire récurrente d'un médecin : les jours cochés,
+    des créneaux libres de slot_duration minutes entre start et end.
+    Transformée en rendez-vous 'free' par app/utils/slots.py.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+
+    # Bitmask of weekdays: bit 0 = Monday ... bit 6 = Sunday
+    weekdays = db.Column(db.Integer, nullable=False)
+    start = db.Column(db.String(5), nullable=False) # Format HH:MM
+    end = db.Column(db.String(5), nullable=False) # Format HH:MM
+    slot_duration = db.Column(db.Integer, default=30, nullable=False)
+
+    # 'cabinet', 'visio'
+    type = db.Column(db.String(20), default='cabinet')
+    video_link = db.Column(db.String(255), nullable=True)
+
+    is_active = db.Column(db.Boolean, default=True)
+
+    # Last day already expanded into slots (None: never expanded)
+    generated_until = db.Column(db.Date, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relations
+    doctor = db.relationship('User', backref='slot_templates')
+
+    def __repr__(self):
+        return f'<SlotTemplate {self.doctor_id} {self.days()} {self.start}-{self.end}>'
+
+    @staticmethod
+    def weekdays_mask(days):
+        mask = 0
+        for day in days:
+            mask |= 1 << day
+        return mask
+
+    def days(self):
+        return [day for day in range(7) if self.weekdays & (1 << day)]
+
+    def has_day(self, weekday):
+        return bool(self.weekdays & (1 << weekday))
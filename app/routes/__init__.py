@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('main', __name__)
 
-from app.routes import public, auth, patient, doctor
+from app.routes import public, auth, patient, doctor, api
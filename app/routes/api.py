@@ -0,0 +1,132 @@
+from flask import request, abort, jsonify
+from flask_login import current_user, login_required
+from datetime import datetime, timedelta
+
+from app.routes import bp
+from app.utils import agenda
+from app.utils.ingest import MAX_BATCH_SIZE, ingest_measurements
+from app.utils.http_cache import MeasurementValidator, conditional_response
+from app.utils.replica import read_only
+from app.utils.series import BUCKETS, RAW_POINTS, bucketed_series, raw_series
+
+MEASUREMENT_TYPES = ('tension', 'glycemie', 'poids')
+
+# Bounds on points a client may ask for in raw mode (LTTB needs at
+# least 3: the first, the last and one per bucket in between).
+MIN_RAW_POINTS = 3
+MAX_RAW_POINTS = 2000
+
+
+def parse_day(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        abort(400)
+
+
+@bp.route('/api/measurements/series')
+@login_required
+def measurement_series():
+    """
+    Données de graphique pour un type de mesure.
+
+    Query string: type, from / to (YYYY-MM-DD, `to` inclusive),
+    buckets (day, week, month or raw), points (raw mode only) and
+    user_id (doctors only, defaults to the current user).
+    """
+    m_type = request.args.get('type')
+    if m_type not in MEASUREMENT_TYPES:
+        abort(400)
+
+    user_id = current_user.id
+    if current_user.role == 'doctor':
+        user_id = request.args.get('user_id', current_user.id, type=int)
+
+    return conditional_response(MeasurementValidator(user_id), render_series, user_id, m_type)
+
+
+def render_series(user_id, m_type):
+    start = parse_day(request.args.get('from'))
+    end = parse_day(request.args.get('to'))
+    if end:
+        end += timedelta(days=1)
+
+    bucket = request.args.get('buckets', 'raw')
+    if bucket == 'raw':
+        points = request.args.get('points', RAW_POINTS, type=int)
+        points = max(MIN_RAW_POINTS, min(points, MAX_RAW_POINTS))
+        series = [{
+            'date': date.isoformat(),
+            'val1': value1,
+            'val2': value2,
+        } for date, value1, value2 in raw_series(user_id, m_type, points, start, end)]
+    elif bucket in BUCKETS:
+        series = bucketed_series(user_id, m_type, bucket, start, end)
+    else:
+        abort(400)
+
+    return jsonify({'type': m_type, 'buckets': bucket, 'points': series})
+
+
+@bp.route('/api/measurements/bulk', methods=['POST'])
+@login_required
+def bulk_measurements():
+    """
+    Import groupé de mesures (appareils connectés).
+
+    Body: a JSON list of readings, or {"measurements": [...]}.  A reading
+    has the MeasurementForm fields (type, value1, value2, notes), an
+    optional ISO 8601 `date` (defaults to now) and, for device syncs, a
+    `source` and `external_id` that make retries idempotent.  Returns one
+    result per reading, in order.
+    """
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('measurements')
+    if not isinstance(payload, list):
+        abort(400)
+    if len(payload) > MAX_BATCH_SIZE:
+        abort(413)
+
+    results = ingest_measurements(current_user.id, payload)
+    counts = {status: 0 for status in ('created', 'averaged', 'duplicate', 'error')}
+    for result in results:
+        counts[result['status']] += 1
+    return jsonify({**counts, 'results': results})
+
+
+@bp.route('/api/doctor/calendar')
+@read_only
+@login_required
+def doctor_calendar():
+    """
+    Agenda du médecin connecté, jour par jour, avec le taux d'occupation.
+
+    Query string: view (week or month) and date (YYYY-MM-DD, defaults to
+    today), or an explicit from / to range (at most MAX_RANGE_DAYS days).
+    appointments=0 returns the per-day counts only.
+    """
+    if current_user.role != 'doctor':
+        abort(403)
+
+    start = parse_day(request.args.get('from'))
+    end = parse_day(request.args.get('to'))
+    if start or end:
+        if not (start and end) or end < start \
+                or (end - start).days >= agenda.MAX_RANGE_DAYS:
+            abort(400)
+        first_day, last_day = start.date(), end.date()
+    else:
+        day = (parse_day(request.args.get('date')) or datetime.now()).date()
+        view = request.args.get('view', 'week')
+        if view == 'week':
+            first_day, last_day = agenda.week_bounds(day)
+        elif view == 'month':
+            first_day, last_day = agenda.month_bounds(day.year, day.month)
+        else:
+            abort(400)
+
+    with_appointments = request.args.get('appointments', '1') != '0'
+    return jsonify(agenda.calendar_json(current_user.id, first_day, last_day, with_appointments))
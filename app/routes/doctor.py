@@ -1,4 +1,4 @@
-from flask import render_template, redirect, url_for, flash, request, abort
+from flask import render_template, redirect, url_for, flash, request, abort, current_app
 from flask_login import current_user, login_required
 from datetime import datetime, timedelta
 
@@ -7,7 +7,21 @@ from app.models.user import User
 from app.models.patient import Patient
 from app.models.measurement import Measurement
 from app.models.appointment import Appointment
+from app.models.alert import Alert
+from app.models.slot_template import SlotTemplate
 from app.routes import bp
+from app.utils.analytics import patient_statistics
+from app.utils.series import raw_series
+from app.utils.query_budget import query_budget
+from app.utils.replica import read_only
+from app.utils import slots
+from app.utils import agenda as agenda_service
+
+# Alerts listed on the doctor dashboard (the header shows the full count).
+DASHBOARD_ALERTS_LIMIT = 50
+
+# Points per measurement type on the patient history chart.
+CHART_POINTS = 60
 
 def check_doctor():
     """
@@ -18,19 +32,19 @@ def check_doctor():
         abort(403)
 
 @bp.route('/doctor/dashboard')
+@read_only
 @login_required
+@query_budget(6)
 def doctor_dashboard():
     """
     Dashboard Médecin.
     """
     check_doctor()
     
-    # 1. ALERTES
-    recent_measurements = Measurement.query.join(User).join(Patient)\
-        .order_by(Measurement.date.desc())\
-        .limit(50).all()
-        
-    alerts = [m for m in recent_measurements if m.is_alert]
+    # 1. ALERTES (written by add_measurement, see Alert.sync)
+    alerts_query = Alert.unresolved()
+    alerts = alerts_query.limit(DASHBOARD_ALERTS_LIMIT).all()
+    alert_count = alerts_query.order_by(None).count()
     
     # 2. PROCHAINS RDV
     now = datetime.now()
@@ -38,12 +52,35 @@ def doctor_dashboard():
         Appointment.doctor_id == current_user.id,
         Appointment.start_time >= now,
         Appointment.status != 'cancelled'
-    ).order_by(Appointment.start_time).limit(3).all()
+    ).options(db.joinedload(Appointment.patient).joinedload(User.patient))\
+        .order_by(Appointment.start_time).limit(3).all()
+
+    return render_template('doctor/dashboard.html', alerts=alerts, alert_count=alert_count,
+                           next_appointments=next_appointments)
+
+@bp.route('/alert/<int:id>/acknowledge')
+@login_required
+def acknowledge_alert(id):
+    check_doctor()
+    alert = Alert.query.get_or_404(id)
+    alert.acknowledge(current_user)
+    db.session.commit()
+    return redirect(url_for('main.doctor_dashboard'))
 
-    return render_template('doctor/dashboard.html', alerts=alerts, next_appointments=next_appointments)
+@bp.route('/alert/<int:id>/resolve')
+@login_required
+def resolve_alert(id):
+    check_doctor()
+    alert = Alert.query.get_or_404(id)
+    alert.resolve()
+    db.session.commit()
+    flash('Alerte résolue.', 'success')
+    return redirect(url_for('main.doctor_dashboard'))
 
 @bp.route('/doctor/agenda')
+@read_only
 @login_required
+@query_budget(3)
 def agenda():
     check_doctor()
     
@@ -57,30 +94,27 @@ def agenda():
         current_date = datetime.today().date()
         
     # Week Strip Logic: Yesterday, Today, +5 days (relative to selected date)
-    week_days = []
+    # The whole strip is read with one query, for the per-day counts.
     start_strip = current_date - timedelta(days=1)
-    
+    end_strip = start_strip + timedelta(days=6)
+    by_day = agenda_service.group_by_day(
+        agenda_service.appointments_between(current_user.id, start_strip, end_strip),
+        start_strip, end_strip)
+
     french_days = {0: 'Lun', 1: 'Mar', 2: 'Mer', 3: 'Jeu', 4: 'Ven', 5: 'Sam', 6: 'Dim'}
-    
-    for i in range(7):
-        day = start_strip + timedelta(days=i)
+
+    week_days = []
+    for day, day_appointments in by_day.items():
         week_days.append({
             'date_str': day.strftime('%Y-%m-%d'),
             'day_name': french_days[day.weekday()],
             'day_num': day.strftime('%d'),
-            'is_active': (day == current_date)
+            'is_active': (day == current_date),
+            **agenda_service.occupancy(day_appointments)
         })
-        
-    day_start = datetime.combine(current_date, datetime.min.time())
-    day_end = datetime.combine(current_date, datetime.max.time())
-    
-    appointments = Appointment.query.filter(
-        Appointment.doctor_id == current_user.id,
-        Appointment.start_time >= day_start,
-        Appointment.start_time <= day_end,
-        Appointment.status != 'cancelled'
-    ).order_by(Appointment.start_time).all()
-    
+
+    appointments = by_day[current_date]
+
     now_offset_percent = -1
     is_today = (current_date == datetime.today().date())
     
@@ -153,6 +187,10 @@ def create_slot():
         end_dt = start_dt + timedelta(minutes=30)
         duration = 30
     
+    if agenda_service.find_conflict(current_user.id, start_dt, end_dt):
+        flash('Ce créneau chevauche un rendez-vous existant.', 'error')
+        return redirect(url_for('main.agenda', date=date_str))
+
     slot_type = request.form.get('type', 'cabinet')
     if slot_type not in ('cabinet', 'visio'):
         slot_type = 'cabinet'
@@ -178,21 +216,103 @@ def create_slot():
     flash('Créneau libre ajouté.', 'success')
     return redirect(url_for('main.agenda', date=date_str))
 
+@bp.route('/doctor/availability', methods=['GET', 'POST'])
+@login_required
+def availability():
+    """
+    Disponibilités récurrentes : modèles hebdomadaires transformés en
+    créneaux libres jusqu'à l'horizon (voir app/utils/slots.py).
+    """
+    check_doctor()
+
+    if request.method == 'POST':
+        days = sorted({int(d) for d in request.form.getlist('days') if d.isdigit() and int(d) < 7})
+        try:
+            start = slots.parse_time(request.form.get('start', ''))
+            end = slots.parse_time(request.form.get('end', ''))
+            slot_duration = int(request.form.get('slot_duration', 30))
+        except ValueError:
+            flash('Horaires ou durée invalides.', 'error')
+            return redirect(url_for('main.availability'))
+
+        if not days:
+            flash('Choisissez au moins un jour.', 'error')
+            return redirect(url_for('main.availability'))
+        if not slots.MIN_SLOT_MINUTES <= slot_duration <= slots.MAX_SLOT_MINUTES:
+            flash('Durée de créneau invalide.', 'error')
+            return redirect(url_for('main.availability'))
+        if end <= start:
+            flash('L\'heure de fin doit être après l\'heure de début.', 'error')
+            return redirect(url_for('main.availability'))
+
+        slot_type = request.form.get('type', 'cabinet')
+        if slot_type not in ('cabinet', 'visio'):
+            slot_type = 'cabinet'
+        video_link = request.form.get('video_link', '').strip() or None
+        if slot_type != 'visio':
+            video_link = None
+
+        template = SlotTemplate(
+            doctor_id=current_user.id,
+            weekdays=SlotTemplate.weekdays_mask(days),
+            start=start.strftime('%H:%M'),
+            end=end.strftime('%H:%M'),
+            slot_duration=slot_duration,
+            type=slot_type,
+            video_link=video_link
+        )
+        db.session.add(template)
+        db.session.flush()
+        count = slots.expand_templates(current_user.id, [template], slots.horizon())
+        db.session.commit()
+
+        flash(f'Disponibilité enregistrée : {count} créneau(x) créé(s).', 'success')
+        return redirect(url_for('main.availability'))
+
+    templates = SlotTemplate.query.filter_by(doctor_id=current_user.id, is_active=True)\
+        .order_by(SlotTemplate.start).all()
+    return render_template('doctor/availability.html', templates=templates,
+                           horizon_days=current_app.config['SLOT_HORIZON_DAYS'])
+
+@bp.route('/doctor/availability/<int:id>/delete', methods=['POST'])
+@login_required
+def delete_availability(id):
+    check_doctor()
+    template = SlotTemplate.query.get_or_404(id)
+    if template.doctor_id != current_user.id:
+        abort(403)
+
+    count = slots.remove_template(template)
+    db.session.commit()
+    flash(f'Disponibilité supprimée : {count} créneau(x) libre(s) retiré(s).', 'info')
+    return redirect(url_for('main.availability'))
+
 @bp.route('/doctor/patients')
+@read_only
 @login_required
+@query_budget(4)
 def patients():
     check_doctor()
-    patients_list = Patient.query.join(User).filter(User.role == 'patient').all()
-    return render_template('doctor/patients.html', patients=patients_list)
+    patients_list = Patient.query.join(Patient.user)\
+        .filter(User.role == 'patient')\
+        .options(db.contains_eager(Patient.user)).all()
+    
+    # Warning/high readings per patient and type, counted by the database
+    severity_counts = Measurement.severity_counts([p.user_id for p in patients_list])
+    
+    return render_template('doctor/patients.html', patients=patients_list,
+                           severity_counts=severity_counts)
 
 import json
 
 @bp.route('/doctor/patient/<int:user_id>')
+@read_only
 @login_required
+@query_budget(9)
 def patient_history(user_id):
     check_doctor()
     
-    target_user = User.query.get_or_404(user_id)
+    target_user = db.get_or_404(User, user_id, options=[db.joinedload(User.patient)])
     if target_user.role != 'patient':
         flash('Cet utilisateur n\'est pas un patient.', 'warning')
         return redirect(url_for('main.patients'))
@@ -200,23 +320,27 @@ def patient_history(user_id):
     patient = target_user.patient
     measurements = Measurement.query.filter_by(user_id=user_id).order_by(Measurement.date.desc()).all()
     
-    # Prepare chart data
+    # Prepare chart data: the whole history per type, downsampled to a
+    # fixed number of points (LTTB) rather than the last few readings.
     chart_data = []
     types = ['tension', 'glycemie', 'poids']
     for t in types:
-        type_measurements = [m for m in measurements if m.type == t][:20] # Limit points per type
-        for m in type_measurements:
+        for date, value1, value2 in raw_series(user_id, t, CHART_POINTS):
             chart_data.append({
-                'date': m.date.strftime('%d/%m %H:%M'),
-                'type': m.type,
-                'val1': m.value1,
-                'val2': m.value2,
-                'timestamp': m.date.timestamp()
+                'date': date.strftime('%d/%m/%y %H:%M'),
+                'type': t,
+                'val1': value1,
+                'val2': value2,
+                'timestamp': date.timestamp()
             })
             
     chart_data.sort(key=lambda x: x['timestamp'])
+
+    # Tendances : moyennes glissantes, pentes, variabilité, temps dans la cible
+    trends = patient_statistics(user_id)
     
     return render_template('doctor/patient_history.html', 
                            patient=patient, 
                            measurements=measurements,
-                           chart_data_json=json.dumps(chart_data))
+                           chart_data_json=json.dumps(chart_data),
+                           trends=trends)
@@ -1,32 +1,41 @@
-from flask import render_template, redirect, url_for, flash, request, send_file, abort
+from flask import render_template, redirect, url_for, flash, request, send_file, abort, jsonify, Response, stream_with_context
 from flask_login import current_user, login_required
 import json
-from datetime import datetime, timedelta
+import os
+from datetime import datetime
 
 from app import db
-from app.models.measurement import Measurement
+from app.models.measurement import Measurement, UNITS, AVERAGING_WINDOW
+from app.models.measurement_summary import MeasurementSummary
+from app.models.alert import Alert
 from app.models.reminder import Reminder
 from app.models.appointment import Appointment
+from app.models.export_job import ExportJob
+from app.models.user import User
 from app.forms import MeasurementForm, ReminderForm
 from app.routes import bp
-from app.utils.exports import generate_measurements_pdf, generate_measurements_excel
+from app.utils import booking, export_cache
+from app.utils import reminders as reminders_engine
+from app.utils.exports import stream_measurements_csv
+from app.utils.export_jobs import submit_export_job, artifact_path, EXPORT_FORMATS, EXPORT_BATCH_SIZE
+from app.utils.analytics import patient_statistics
 from app.utils.health_advice import get_health_advice
+from app.utils.query_budget import query_budget
+from app.utils.replica import read_only
+from app.utils.http_cache import measurements_conditional
 
 # --- DASHBOARD & MEASUREMENTS ---
 @bp.route('/home', methods=['GET'])
 @login_required
+@measurements_conditional
+@query_budget(2)
 def home():
     """
     Tableau de bord principal (Dashboard).
     """
     m_type = request.args.get('type')
     
-    query = Measurement.query.filter_by(user_id=current_user.id)
-        
-    if m_type:
-        query = query.filter_by(type=m_type)
-        
-    measurements = query.order_by(Measurement.date.desc()).limit(8).all()
+    measurements = Measurement.for_user(current_user.id, m_type).limit(8).all()
     latest = measurements[0] if measurements else None
     
     # Données pour Chart.js
@@ -50,12 +59,21 @@ def select_measurement_method():
     return render_template('measurement/select_method.html')
 
 @bp.route('/history', methods=['GET'])
+@read_only
 @login_required
+@measurements_conditional(dated=True)
+@query_budget(4)
 def history():
     """
     Historique complet des mesures.
     """
-    measurements = Measurement.query.filter_by(user_id=current_user.id).order_by(Measurement.date.desc()).all()
+    # The analysis and the chart only need the latest points per type,
+    # kept up to date in MeasurementSummary by add_measurement.  Loaded
+    # first: a lazy backfill commits, which would expire the page below.
+    summaries = MeasurementSummary.for_user(current_user.id)
+    
+    measurements, next_cursor = Measurement.page_for(
+        current_user.id, before=request.args.get('before'))
     
     # Données pour le graphique global
     chart_data = []
@@ -64,47 +82,48 @@ def history():
     # Extraction des dernières données pour l'analyse
     analysis_data = {}
     
-    # Helper lambda to find latest measurements of a specific type
-    get_ms = lambda t: [m for m in measurements if m.type == t]
-    
     # Glycemie
-    g_list = get_ms('glycemie')
-    if g_list:
-        analysis_data['glycemie'] = g_list[0].value1
+    if 'glycemie' in summaries:
+        analysis_data['glycemie'] = summaries['glycemie'].latest_value1
         
     # Tension
-    t_list = get_ms('tension')
-    if t_list:
-        analysis_data['tension'] = t_list[0].value1
+    if 'tension' in summaries:
+        analysis_data['tension'] = summaries['tension'].latest_value1
         
     # Poids (Actuel + Précédent)
-    p_list = get_ms('poids')
-    if p_list:
-        analysis_data['poids'] = p_list[0].value1
-        if len(p_list) > 1:
-            analysis_data['poids_precedent'] = p_list[1].value1
+    if 'poids' in summaries:
+        analysis_data['poids'] = summaries['poids'].latest_value1
+        if summaries['poids'].previous_value1 is not None:
+            analysis_data['poids_precedent'] = summaries['poids'].previous_value1
 
     # Génération des conseils
     health_tips = get_health_advice(analysis_data)
+
+    # Tendances (moyennes glissantes, pentes, ...): the whole-history
+    # figures come from the summaries, only the last 90 days are read.
+    trends = patient_statistics(current_user.id, summaries)
     
     # Chart Data Construction
     for t in types:
-        type_measurements = [m for m in measurements if m.type == t][:8]
-        for m in type_measurements:
+        if t not in summaries:
+            continue
+        for p in summaries[t].recent_points():
             chart_data.append({
-                'date': m.date.strftime('%d/%m %H:%M'),
-                'type': m.type,
-                'val1': m.value1,
-                'val2': m.value2,
-                'timestamp': m.date.timestamp()
+                'date': p['date'].strftime('%d/%m %H:%M'),
+                'type': t,
+                'val1': p['val1'],
+                'val2': p['val2'],
+                'timestamp': p['date'].timestamp()
             })
     
     chart_data.sort(key=lambda x: x['timestamp'])
 
     return render_template('measurement/history.html', 
                            measurements=measurements,
+                           next_cursor=next_cursor,
                            chart_data_json=json.dumps(chart_data),
-                           health_tips=health_tips)
+                           health_tips=health_tips,
+                           trends=trends)
 
 @bp.route('/measurements/add', methods=['GET', 'POST'])
 @login_required
@@ -114,45 +133,44 @@ def add_measurement():
     """
     form = MeasurementForm()
     if form.validate_on_submit():
-        last_measurement = Measurement.query.filter_by(
-            user_id=current_user.id, 
-            type=form.type.data
-        ).order_by(Measurement.date.desc()).first()
+        now = datetime.utcnow()
+        
+        # Serialises concurrent submissions of this user and type (e.g.
+        # phone + web) until the commit below.
+        summary = MeasurementSummary.lock(current_user.id, form.type.data)
+        
+        last_measurement = Measurement.for_user(current_user.id, form.type.data).first()
         
         updated = False
-        if last_measurement:
-            time_diff = datetime.utcnow() - last_measurement.date
-            if time_diff < timedelta(minutes=30):
-                last_measurement.value1 = (last_measurement.value1 + form.value1.data) / 2
-                if form.value2.data and last_measurement.value2:
-                    last_measurement.value2 = (last_measurement.value2 + form.value2.data) / 2
-                elif form.value2.data:
-                    last_measurement.value2 = form.value2.data
-                
-                last_measurement.date = datetime.utcnow()
+        if last_measurement and now - last_measurement.date < AVERAGING_WINDOW:
+            old_value1, old_value2 = last_measurement.value1, last_measurement.value2
+            # Atomic: the row is averaged by the database, and only if it
+            # is still inside the window.
+            if Measurement.average_latest(last_measurement.id, form.value1.data, form.value2.data, now):
+                db.session.refresh(last_measurement)
+                summary.replace_latest(last_measurement, old_value1, old_value2)
+                Alert.sync(last_measurement)
                 updated = True
                 flash('Mesure mise à jour (moyenne sur 30min) avec succès!', 'info')
 
         if not updated:
-            unit = ''
-            if form.type.data == 'tension':
-                unit = 'mmHg'
-            elif form.type.data == 'glycemie':
-                unit = 'mg/dL'
-            elif form.type.data == 'poids':
-                unit = 'kg'
-                
             measurement = Measurement(
                 user_id=current_user.id,
                 type=form.type.data,
                 value1=form.value1.data,
                 value2=form.value2.data,
-                unit=unit,
+                unit=UNITS.get(form.type.data, ''),
+                date=now,
                 notes=form.notes.data
             )
             db.session.add(measurement)
+            db.session.flush()
+            summary.add(measurement)
+            Alert.sync(measurement)
             flash('Mesure ajoutée avec succès!', 'success')
             
+        # Cached exports no longer match the data.
+        export_cache.invalidate_user(current_user.id)
         db.session.commit()
         return redirect(url_for('main.home'))
     
@@ -160,70 +178,107 @@ def add_measurement():
 
 @bp.route('/measurements/list')
 @login_required
+@measurements_conditional
+@query_budget(2)
 def list_measurements():
     m_type = request.args.get('type')
-    query = Measurement.query.filter_by(user_id=current_user.id)
-    
-    if m_type:
-        query = query.filter_by(type=m_type)
-        
-    measurements = query.order_by(Measurement.date.desc()).all()
-    return render_template('measurement/list.html', measurements=measurements, m_type=m_type)
+    measurements, next_cursor = Measurement.page_for(
+        current_user.id, type=m_type, before=request.args.get('before'))
+    return render_template('measurement/list.html', measurements=measurements,
+                           m_type=m_type, next_cursor=next_cursor)
 
 @bp.route('/measurements/export/pdf')
 @login_required
 def export_pdf():
-    measurements = Measurement.query.filter_by(user_id=current_user.id).order_by(Measurement.date.desc()).all()
-    
-    buffer = generate_measurements_pdf(measurements, current_user.email)
-    
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"mesures_{datetime.now().strftime('%Y%m%d')}.pdf",
-        mimetype='application/pdf'
-    )
+    job = submit_export_job(current_user.id, 'pdf')
+    return redirect(url_for('main.export_status', job_id=job.id))
 
 @bp.route('/measurements/export/excel')
 @login_required
 def export_excel():
-    measurements = Measurement.query.filter_by(user_id=current_user.id).order_by(Measurement.date.desc()).all()
+    job = submit_export_job(current_user.id, 'excel')
+    return redirect(url_for('main.export_status', job_id=job.id))
+
+def get_own_export_job(job_id):
+    job = ExportJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        abort(403)
+    return job
+
+@bp.route('/measurements/export/job/<int:job_id>')
+@login_required
+def export_status(job_id):
+    job = get_own_export_job(job_id)
+    return render_template('measurement/export_status.html', job=job)
+
+@bp.route('/measurements/export/job/<int:job_id>/status')
+@login_required
+def export_status_json(job_id):
+    job = get_own_export_job(job_id)
+    return jsonify({
+        'status': job.status,
+        'download_url': url_for('main.export_download', job_id=job.id) if job.status == 'done' else None
+    })
+
+@bp.route('/measurements/export/job/<int:job_id>/download')
+@login_required
+def export_download(job_id):
+    job = get_own_export_job(job_id)
+    if job.status != 'done':
+        abort(404)
     
-    buffer = generate_measurements_excel(measurements)
+    path = artifact_path(job)
+    if not os.path.exists(path):
+        # Evicted from the export cache in the meantime.
+        job.status = 'expired'
+        db.session.commit()
+        abort(404)
     
+    extension, mimetype = EXPORT_FORMATS[job.format]
     return send_file(
-        buffer,
+        path,
         as_attachment=True,
-        download_name=f"mesures_{datetime.now().strftime('%Y%m%d')}.xlsx",
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        download_name=f"mesures_{job.created_at.strftime('%Y%m%d')}.{extension}",
+        mimetype=mimetype
+    )
+
+@bp.route('/measurements/export/csv')
+@login_required
+@measurements_conditional
+def export_csv():
+    measurements = Measurement.for_user(current_user.id).yield_per(EXPORT_BATCH_SIZE)
+    
+    # Rows are read from the database while the response is being sent.
+    return Response(
+        stream_with_context(stream_measurements_csv(measurements)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f"attachment; filename=mesures_{datetime.now().strftime('%Y%m%d')}.csv"}
     )
 
 # --- REMINDERS & APPOINTMENTS ---
 @bp.route('/reminders')
 @login_required
+@query_budget(3)
 def reminders():
     reminders_list = Reminder.query.filter_by(user_id=current_user.id).order_by(Reminder.time).all()
-    appointments_list = Appointment.query.filter_by(patient_id=current_user.id).order_by(Appointment.start_time.desc()).all()
+    appointments_list = Appointment.query.filter_by(patient_id=current_user.id)\
+        .options(db.joinedload(Appointment.doctor).joinedload(User.patient))\
+        .order_by(Appointment.start_time.desc()).all()
     return render_template('reminder/reminders.html', reminders=reminders_list, appointments=appointments_list)
 
 @bp.route('/patient/book', methods=['GET', 'POST'])
 @login_required
+@query_budget(4)
 def book_appointment():
     if request.method == 'POST':
-        slot_id = request.form.get('slot_id')
+        slot_id = request.form.get('slot_id', type=int)
         reason = request.form.get('reason')
         
         if not slot_id:
             flash('Veuillez sélectionner un créneau.', 'error')
             return redirect(url_for('main.book_appointment'))
             
-        slot = Appointment.query.get(slot_id)
-        if slot and slot.status == 'free':
-            slot.patient_id = current_user.id
-            slot.status = 'pending'
-            slot.notes = reason
-            db.session.commit()
-            
+        if booking.book_slot(slot_id, current_user.id, reason):
             # Flash message with doctor name if possible, or generic
             flash('Votre demande a été envoyée au médecin.', 'success')
             return redirect(url_for('main.reminders'))
@@ -231,13 +286,12 @@ def book_appointment():
             flash('Ce créneau n\'est plus disponible.', 'error')
             return redirect(url_for('main.book_appointment'))
 
-    # GET: List free slots grouped by day
-    now = datetime.now()
-    free_slots = Appointment.query.filter(
-        Appointment.status == 'free',
-        Appointment.start_time > now
-    ).order_by(Appointment.start_time).all()
-    
+    # GET: the next free slots of a bounded window, grouped by day
+    filters = booking.SlotFilters.from_args(request.args)
+    free_slots, next_cursor = booking.next_free_slots(filters, after=request.args.get('after'))
+    day_counts = booking.free_slot_counts(filters)
+    doctors = booking.doctors_with_free_slots(filters)
+
     # Group by day
     grouped_slots = {}
     for slot in free_slots:
@@ -248,8 +302,10 @@ def book_appointment():
                 'slots': []
             }
         grouped_slots[day_key]['slots'].append(slot)
-        
-    return render_template('patient/booking.html', grouped_slots=grouped_slots)
+
+    return render_template('patient/booking.html', grouped_slots=grouped_slots,
+                           filters=filters, day_counts=day_counts, doctors=doctors,
+                           next_cursor=next_cursor)
 
 @bp.route('/reminders/add', methods=['GET', 'POST'])
 @login_required
@@ -262,8 +318,10 @@ def add_reminder():
             time=form.time.data,
             days=form.days.data
         )
+        reminder.schedule()
         db.session.add(reminder)
         db.session.commit()
+        reminders_engine.reminder_changed(reminder)
         flash('Rappel ajouté!', 'success')
         return redirect(url_for('main.reminders'))
     return render_template('reminder/add.html', form=form)
@@ -275,7 +333,13 @@ def toggle_reminder(id):
     if reminder.user_id != current_user.id:
         abort(403)
     reminder.is_active = not reminder.is_active
+    try:
+        reminder.schedule()
+    except ValueError:
+        # Older reminder whose days cannot be read: never fires
+        reminder.next_fire_at = None
     db.session.commit()
+    reminders_engine.reminder_changed(reminder)
     return redirect(url_for('main.reminders'))
 
 @bp.route('/reminders/delete/<int:id>')
@@ -286,5 +350,6 @@ def delete_reminder(id):
         abort(403)
     db.session.delete(reminder)
     db.session.commit()
+    reminders_engine.reminder_deleted(id)
     flash('Rappel supprimé.', 'success')
     return redirect(url_for('main.reminders'))
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Doctor calendar queries.
+
+A doctor's appointments over any range of days are read with one query
+on the (doctor_id, start_time) index, then grouped by day in a single
+pass; the agenda page, its week strip and the week / month JSON views
+all go through appointments_between().
+
+Appointments never span midnight (create_slot and the slot templates
+end on their start day), so an appointment overlapping [start, end)
+starts after start - 1 day: the overlap check is an index range scan
+too, refined on end_time.
+"""
+from datetime import datetime, date, timedelta
+
+from app import db
+from app.models.user import User
+from app.models.appointment import Appointment
+
+# Upper bound on an appointment's length (see the module docstring).
+MAX_APPOINTMENT_LENGTH = timedelta(days=1)
+
+# Statuses of an appointment taken by a patient.
+BOOKED_STATUSES = ('pending', 'scheduled', 'confirmed', 'done')
+
+# Longest range served by the JSON views, in days.
+MAX_RANGE_DAYS = 62
+
+
+def day_bounds(first_day, last_day):
+    """
+    [start, end) datetimes covering first_day .. last_day inclusive.
+    """
+    return (datetime.combine(first_day, datetime.min.time()),
+            datetime.combine(last_day + timedelta(days=1), datetime.min.time()))
+
+
+def week_bounds(day):
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
+
+
+def month_bounds(year, month):
+    first_day = date(year, month, 1)
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return first_day, next_month - timedelta(days=1)
+
+
+def appointments_between(doctor_id, first_day, last_day, with_patients=True):
+    """
+    The doctor's appointments (except cancelled ones) starting between
+    the two days, inclusive, ordered by start_time.  One query.
+    """
+    start, end = day_bounds(first_day, last_day)
+    query = Appointment.query.filter(
+        Appointment.doctor_id == doctor_id,
+        Appointment.start_time >= start,
+        Appointment.start_time < end,
+        Appointment.status != 'cancelled'
+    )
+    if with_patients:
+        query = query.options(db.joinedload(Appointment.patient).joinedload(User.patient))
+    return query.order_by(Appointment.start_time).all()
+
+
+def group_by_day(appointments, first_day, last_day):
+    """
+    {day: [appointments]} for every day of the range (empty days
+    included, in order).  Appointments must be ordered by start_time.
+    """
+    days = {}
+    day = first_day
+    while day <= last_day:
+        days[day] = []
+        day += timedelta(days=1)
+    for apt in appointments:
+        days.setdefault(apt.start_time.date(), []).append(apt)
+    return days
+
+
+def occupancy(appointments):
+    """
+    Counts and booked share (by duration) of one day's appointments.
+    """
+    booked = [a for a in appointments if a.status in BOOKED_STATUSES]
+    free = [a for a in appointments if a.status == 'free']
+    booked_minutes = sum(a.duration or 0 for a in booked)
+    free_minutes = sum(a.duration or 0 for a in free)
+    total_minutes = booked_minutes + free_minutes
+    return {
+        'total': len(appointments),
+        'booked': len(booked),
+        'pending': sum(1 for a in booked if a.status == 'pending'),
+        'free': len(free),
+        'booked_minutes': booked_minutes,
+        'free_minutes': free_minutes,
+        'occupancy': round(booked_minutes / total_minutes, 3) if total_minutes else None,
+    }
+
+
+def overlap_criteria(doctor_id, start, end):
+    """
+    Filter on the doctor's appointments overlapping [start, end).
+    """
+    return (
+        Appointment.doctor_id == doctor_id,
+        Appointment.start_time < end,
+        Appointment.start_time > start - MAX_APPOINTMENT_LENGTH,
+        Appointment.end_time > start,
+        Appointment.status != 'cancelled',
+    )
+
+
+def find_conflict(doctor_id, start, end, exclude_id=None):
+    """
+    First appointment of the doctor overlapping [start, end), or None.
+    """
+    query = Appointment.query.filter(*overlap_criteria(doctor_id, start, end))
+    if exclude_id is not None:
+        query = query.filter(Appointment.id != exclude_id)
+    return query.order_by(Appointment.start_time).first()
+
+
+def appointment_json(apt):
+    patient = apt.patient.patient if apt.patient and apt.patient.patient else None
+    return {
+        'id': apt.id,
+        'start': apt.start_time.isoformat(),
+        'end': apt.end_time.isoformat(),
+        'duration': apt.duration,
+        'status': apt.status,
+        'type': apt.type,
+        'patient': f'{patient.first_name} {patient.last_name}' if patient else None,
+    }
+
+
+def calendar_json(doctor_id, first_day, last_day, with_appointments=True):
+    """
+    Per-day occupancy (and appointments) of the doctor over the range.
+    """
+    appointments = appointments_between(doctor_id, first_day, last_day,
+                                        with_patients=with_appointments)
+    days = []
+    for day, day_appointments in group_by_day(appointments, first_day, last_day).items():
+        entry = {'date': day.isoformat(), **occupancy(day_appointments)}
+        if with_appointments:
+            entry['appointments'] = [appointment_json(a) for a in day_appointments]
+        days.append(entry)
+    return {'from': first_day.isoformat(), 'to': last_day.isoformat(), 'days': days}
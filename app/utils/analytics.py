@@ -0,0 +1,198 @@
+"""
+Per-patient trend statistics, computed with NumPy.
+
+Whole-history figures come from MeasurementSummary, which keeps running
+sums for them (count, mean, min / max, standard deviation, readings per
+severity level), so they cost nothing extra.  The windowed figures only
+need the last WINDOW_DAYS of each type: those readings are loaded with
+one query (a range scan of ix_measurement_user_type_date per type, dates
+converted to days by the database) and turned into one array per type.
+Every statistic over them is vectorised, with no Python loop over
+readings:
+- rolling means over the last 7 and 30 days (time-based windows, from
+  cumulative sums and searchsorted);
+- trend (least-squares slope, per day) over the last 7, 30 and 90 days;
+- morning vs evening means over the last WINDOW_DAYS.
+Time in range (share of readings per severity level) uses the same
+rules as Measurement.severity (SEVERITY_RULES).
+
+Windows are anchored on the patient's latest reading of each type, so a
+patient who stopped measuring still gets trends for their last period.
+"""
+from datetime import timedelta
+
+import numpy as np
+
+from app import db
+from app.models.measurement import Measurement, SEVERITY_RULES
+from app.models.measurement_summary import MeasurementSummary
+
+ROLLING_WINDOWS = (7, 30)
+SLOPE_WINDOWS = (7, 30, 90)
+
+# Days of readings loaded per type, for the longest window.
+WINDOW_DAYS = max(ROLLING_WINDOWS + SLOPE_WINDOWS)
+
+# Hours of the day, [start, end)
+MORNING_HOURS = (5, 12)
+EVENING_HOURS = (17, 23)
+
+# Fewest readings needed for a slope or a standard deviation.
+MIN_POINTS = 3
+
+# julianday() of 1970-01-01 00:00
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def days_expression():
+    """
+    Measurement.date as days since the epoch (float), computed in SQL so
+    no datetime object is built per row.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return db.extract('epoch', Measurement.date) / 86400
+    return db.func.julianday(Measurement.date) - UNIX_EPOCH_JULIAN_DAY
+
+
+def load_series(user_id, since):
+    """
+    {type: (days, hours, value1, value2)} arrays of the patient's readings
+    of each type in `since` ({type: datetime}) from that date on, oldest
+    first.  days: days since the epoch (float); hours: hour of the day
+    (float); value2: NaN where missing.  One query.
+    """
+    if not since:
+        return {}
+    days = days_expression().label('days')
+    query = db.union_all(*[
+        db.select(Measurement.type, days, Measurement.value1, Measurement.value2)
+        .where(Measurement.user_id == user_id, Measurement.type == type,
+               Measurement.date >= date)
+        for type, date in since.items()
+    ])
+    rows = db.session.execute(query.order_by(query.selected_columns.type,
+                                             query.selected_columns.days)).all()
+    if not rows:
+        return {}
+
+    types, days, value1, value2 = zip(*rows)
+    types = np.array(types)
+    days = np.array(days, dtype=float)
+    hours = (days % 1) * 24
+    value1 = np.array(value1, dtype=float)
+    # None -> NaN
+    value2 = np.array(value2, dtype=float)
+
+    # Rows come sorted by type: split at each type's first row.
+    names, starts = np.unique(types, return_index=True)
+    order = np.argsort(starts)
+    names, starts = names[order], starts[order]
+    bounds = list(starts) + [len(rows)]
+    return {
+        str(name): (days[a:b], hours[a:b], value1[a:b], value2[a:b])
+        for name, a, b in zip(names, bounds[:-1], bounds[1:])
+    }
+
+
+def rolling_means(days, values, window):
+    """
+    Mean of the readings within `window` days up to each reading (inclusive).
+    """
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    first = np.searchsorted(days, days - window, side='right')
+    last = np.arange(1, len(values) + 1)
+    return (sums[last] - sums[first]) / (last - first)
+
+
+def slope(days, values):
+    """
+    Least-squares slope, in units per day (None with too few points).
+    """
+    if len(values) < MIN_POINTS:
+        return None
+    t = days - days.mean()
+    denominator = np.dot(t, t)
+    if denominator == 0:
+        return None
+    return float(np.dot(t, values - values.mean()) / denominator)
+
+
+def time_in_range(summary):
+    """
+    Percentage of readings per severity level, or None for types without
+    rules (weight).
+    """
+    if not summary.count or not any(rule_type == summary.type for _, rule_type, _, _ in SEVERITY_RULES):
+        return None
+    counts = {
+        'warning': summary.count_warning,
+        'high': summary.count_high,
+    }
+    counts['normal'] = summary.count - counts['warning'] - counts['high']
+    return {level: round(counts[level] / summary.count * 100, 1)
+            for level in ('normal', 'warning', 'high')}
+
+
+def _mean(values):
+    return float(values.mean()) if len(values) else None
+
+
+def _round(value, digits=2):
+    return None if value is None else round(value, digits)
+
+
+def type_statistics(summary, days, hours, value1, value2):
+    """
+    Statistics of one type: whole history from the summary, windows from
+    the arrays returned by load_series().
+    """
+    latest = days[-1]
+    stats = {
+        'count': summary.count,
+        'mean': _round(summary.mean_value1),
+        'min': summary.min_value1,
+        'max': summary.max_value1,
+    }
+    if summary.count_value2:
+        stats['mean2'] = _round(summary.mean_value2)
+
+    means = {}
+    for window in ROLLING_WINDOWS:
+        means[window] = _round(float(rolling_means(days, value1, window)[-1]))
+    stats['rolling_mean'] = means
+
+    slopes = {}
+    for window in SLOPE_WINDOWS:
+        recent = days >= latest - window
+        slopes[window] = _round(slope(days[recent], value1[recent]), 3)
+    stats['slope'] = slopes
+
+    sd = summary.sd_value1 if summary.count >= MIN_POINTS else None
+    mean = summary.mean_value1
+    stats['sd'] = _round(sd)
+    stats['cv'] = _round(sd / mean * 100, 1) if sd is not None and mean else None
+
+    stats['time_in_range'] = time_in_range(summary)
+
+    morning = (hours >= MORNING_HOURS[0]) & (hours < MORNING_HOURS[1])
+    evening = (hours >= EVENING_HOURS[0]) & (hours < EVENING_HOURS[1])
+    stats['morning_mean'] = _round(_mean(value1[morning]))
+    stats['evening_mean'] = _round(_mean(value1[evening]))
+    stats['morning_count'] = int(morning.sum())
+    stats['evening_count'] = int(evening.sum())
+    return stats
+
+
+def patient_statistics(user_id, summaries=None):
+    """
+    {type: statistics} for every measurement type the patient has.
+    `summaries` ({type: MeasurementSummary}) when the caller already has
+    them.
+    """
+    if summaries is None:
+        summaries = MeasurementSummary.for_user(user_id)
+    since = {type: summary.latest_date - timedelta(days=WINDOW_DAYS)
+             for type, summary in summaries.items() if summary.latest_date}
+    series = load_series(user_id, since)
+    return {type: type_statistics(summaries[type], *arrays)
+            for type, arrays in series.items()}
@@ -0,0 +1,171 @@
+"""
+Free slot search for patient booking.
+
+The booking page never loads the whole future calendar: it shows a
+bounded window (BOOKING_WINDOW_DAYS from the chosen day) that can be
+filtered by doctor and consultation type, with
+- per-day counts of free slots, aggregated by the database;
+- the next BOOKING_PAGE_SIZE slots, paginated with a (start_time, id)
+  cursor.
+Both are range scans on the (status, start_time) index.
+
+Booking itself is a compare-and-set (Appointment.claim), retried in the
+same request when the database reports a lock conflict.
+"""
+import time
+from datetime import datetime, date, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models.user import User
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.utils.cursors import decode_cursor, encode_cursor
+
+SLOT_TYPES = ('cabinet', 'visio')
+
+# Attempts at claiming a slot when the database reports a lock conflict
+# (SQLite "database is locked", Postgres serialization failure), and the
+# pause before the first retry (doubled at each attempt), in seconds.
+CLAIM_ATTEMPTS = 3
+CLAIM_RETRY_DELAY = 0.05
+
+class SlotFilters:
+    """
+    Search criteria of the booking page, read from the query string.
+    """
+    def __init__(self, doctor_id=None, type=None, first_day=None, days=None):
+        today = date.today()
+        max_days = current_app.config['BOOKING_MAX_DAYS_AHEAD']
+        if days is None:
+            days = current_app.config['BOOKING_WINDOW_DAYS']
+
+        self.doctor_id = doctor_id
+        self.type = type if type in SLOT_TYPES else None
+        self.first_day = min(max(first_day or today, today), today + timedelta(days=max_days))
+        self.last_day = min(self.first_day + timedelta(days=days - 1), today + timedelta(days=max_days))
+
+    @classmethod
+    def from_args(cls, args):
+        try:
+            first_day = datetime.strptime(args.get('from', ''), '%Y-%m-%d').date()
+        except ValueError:
+            first_day = None
+        return cls(doctor_id=args.get('doctor', type=int),
+                   type=args.get('type') or None,
+                   first_day=first_day)
+
+    def bounds(self):
+        """
+        [start, end) of the window; slots in the past are never offered.
+        """
+        start = max(datetime.combine(self.first_day, datetime.min.time()), datetime.now())
+        end = datetime.combine(self.last_day + timedelta(days=1), datetime.min.time())
+        return start, end
+
+    def apply(self, query):
+        start, end = self.bounds()
+        query = query.filter(
+            Appointment.status == 'free',
+            Appointment.start_time > start,
+            Appointment.start_time < end
+        )
+        if self.doctor_id:
+            query = query.filter(Appointment.doctor_id == self.doctor_id)
+        if self.type:
+            query = query.filter(Appointment.type == self.type)
+        return query
+
+    def args(self, **overrides):
+        """
+        Query string arguments reproducing these filters (for links).
+        """
+        args = {'doctor': self.doctor_id, 'type': self.type,
+                'from': self.first_day.isoformat()}
+        args.update(overrides)
+        return {k: v for k, v in args.items() if v}
+
+
+def day_expression():
+    if db.engine.dialect.name == 'postgresql':
+        return db.cast(Appointment.start_time, db.Date)
+    return db.func.date(Appointment.start_time)
+
+
+def next_free_slots(filters, after=None, limit=None):
+    """
+    Free slots matching the filters, soonest first.
+
+    `after` is a cursor string returned by a previous call (or None for
+    the first page).  Returns (slots, next_cursor) where next_cursor is
+    None on the last page.
+    """
+    if limit is None:
+        limit = current_app.config['BOOKING_PAGE_SIZE']
+
+    query = filters.apply(Appointment.query)\
+        .options(db.joinedload(Appointment.doctor).joinedload(User.patient))
+
+    key = decode_cursor(after)
+    if key:
+        start_time, id_ = key
+        query = query.filter(db.or_(
+            Appointment.start_time > start_time,
+            db.and_(Appointment.start_time == start_time, Appointment.id > id_)
+        ))
+
+    # Fetch one extra row to know whether another page exists.
+    slots = query.order_by(Appointment.start_time, Appointment.id).limit(limit + 1).all()
+    next_cursor = None
+    if len(slots) > limit:
+        slots = slots[:limit]
+        next_cursor = encode_cursor(slots[-1].start_time, slots[-1].id)
+    return slots, next_cursor
+
+
+def free_slot_counts(filters):
+    """
+    {day: number of free slots} over the filters' window, counted in SQL.
+    """
+    day = day_expression().label('day')
+    query = filters.apply(db.session.query(day, db.func.count(Appointment.id)))\
+        .group_by(day).order_by(day)
+    return {date.fromisoformat(str(d)): count for d, count in query}
+
+
+def doctors_with_free_slots(filters):
+    """
+    (doctor_id, last name) of the doctors with free slots in the window,
+    whatever the doctor filter.
+    """
+    unfiltered = SlotFilters(type=filters.type, first_day=filters.first_day,
+                             days=(filters.last_day - filters.first_day).days + 1)
+    doctor_ids = unfiltered.apply(db.session.query(Appointment.doctor_id)).distinct().subquery()
+    return db.session.query(User.id, Patient.last_name)\
+        .outerjoin(Patient, Patient.user_id == User.id)\
+        .filter(User.id.in_(db.select(doctor_ids.c.doctor_id)))\
+        .order_by(Patient.last_name).all()
+
+
+def book_slot(slot_id, patient_id, notes=None):
+    """
+    Claims a free slot for the patient and commits.  Returns True when
+    the patient got it, False when it was taken (or is no longer bookable).
+    """
+    delay = CLAIM_RETRY_DELAY
+    for attempt in range(CLAIM_ATTEMPTS):
+        try:
+            claimed = Appointment.claim(slot_id, patient_id, notes)
+            if claimed:
+                db.session.commit()
+            else:
+                db.session.rollback()
+            return claimed
+        except OperationalError:
+            db.session.rollback()
+            if attempt == CLAIM_ATTEMPTS - 1:
+                raise
+            time.sleep(delay)
+            delay *= 2
@@ -0,0 +1,27 @@
+"""
+Keyset pagination cursors.
+
+Lists ordered by (datetime, id) page with a cursor naming the last row
+shown, '<iso datetime>_<id>', so it stays readable in query strings.
+Used by the measurement list and the booking page.
+"""
+from datetime import datetime
+
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_cursor(when, id):
+    return f"{when.strftime(CURSOR_DATE_FORMAT)}_{id}"
+
+
+def decode_cursor(cursor):
+    """
+    Returns (datetime, id) from a cursor string, or None if missing/invalid.
+    """
+    if not cursor:
+        return None
+    try:
+        date_str, id_str = cursor.rsplit('_', 1)
+        return datetime.strptime(date_str, CURSOR_DATE_FORMAT), int(id_str)
+    except ValueError:
+        return None
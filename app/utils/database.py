@@ -0,0 +1,90 @@
+"""
+Engine configuration per database backend.
+
+- SQLite: every new connection switches to WAL (readers no longer block
+  the writer, and the writer no longer blocks readers), synchronous=NORMAL
+  (safe with WAL, one fsync per checkpoint instead of per commit), a
+  busy_timeout so concurrent writers queue instead of failing with
+  "database is locked", and memory-mapped reads.
+- Postgres: a bounded connection pool per worker, with pre-ping (dead
+  connections after a server restart are replaced transparently) and
+  recycling.
+
+Options set explicitly in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import db
+
+
+def normalize_database_uri(uri):
+    """
+    Hosting platforms still hand out 'postgres://' URLs, which SQLAlchemy
+    no longer accepts.
+    """
+    if uri and uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(config):
+    backend = make_url(config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+    if backend == 'sqlite':
+        return {
+            # pysqlite's own wait on a locked database, in seconds.
+            'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000},
+        }
+    if backend == 'postgresql':
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        }
+    return {}
+
+
+def sqlite_pragmas(config, database):
+    pragmas = [
+        f"busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"mmap_size = {int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+    # WAL needs a file: it does not apply to in-memory databases.
+    if config['SQLITE_WAL'] and database not in (None, '', ':memory:'):
+        pragmas += ['journal_mode = WAL', 'synchronous = NORMAL']
+    return pragmas
+
+
+def init_app(app):
+    """
+    Must run before db.init_app(app), which creates the engines.
+    """
+    config = app.config
+    config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(config),
+        **config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+
+
+def register_engine_events(app):
+    """
+    Must run after db.init_app(app).
+    """
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            _set_pragmas_on_connect(engine, sqlite_pragmas(app.config, engine.url.database))
+
+
+def _set_pragmas_on_connect(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
@@ -0,0 +1,120 @@
+"""
+Content-addressed cache of rendered exports.
+
+An artifact is named after what it was rendered from: the user, the
+format and the version of the user's measurements (see
+Measurement.data_version).  The exports are not localized, so the
+language is not part of the key: every language shares one copy.  Asking again for the same export while the
+data is unchanged finds the file already on disk and skips rendering.
+
+Files live in EXPORT_DIR as '<user_id>-<digest>.<ext>'.  Every hit
+refreshes the file's mtime, and the least recently used files are evicted
+once the directory grows past EXPORT_CACHE_MAX_MB.  add_measurement drops
+the user's files right away (invalidate_user).
+"""
+import hashlib
+import os
+import time
+
+from flask import current_app
+
+from app.models.export_job import ExportJob
+from app.models.measurement import Measurement
+
+
+def export_dir():
+    return current_app.config['EXPORT_DIR']
+
+
+def cache_filename(user_id, fmt, extension):
+    version = Measurement.data_version(user_id)
+    key = repr((user_id, fmt) + version)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return f'{user_id}-{digest}.{extension}'
+
+
+def lookup(filename):
+    """
+    Returns True (and marks the file as recently used) when it is cached.
+    """
+    path = os.path.join(export_dir(), filename)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def _cached_files():
+    directory = export_dir()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    files = []
+    for name in names:
+        if name.endswith('.tmp'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    return files
+
+
+def evict(max_bytes=None, unused_since=None):
+    """
+    Removes the least recently used files until the cache fits in
+    max_bytes (EXPORT_CACHE_MAX_MB by default), and any file not used
+    since the `unused_since` timestamp.  Returns the number of files removed.
+    """
+    if max_bytes is None:
+        max_bytes = current_app.config['EXPORT_CACHE_MAX_MB'] * 1024 * 1024
+
+    files = sorted(_cached_files())
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if total <= max_bytes and (unused_since is None or mtime >= unused_since):
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def store(tmp_path, filename):
+    """
+    Moves a freshly rendered file into the cache, then enforces the size bound.
+    """
+    os.replace(tmp_path, os.path.join(export_dir(), filename))
+    evict()
+
+
+def invalidate_user(user_id):
+    """
+    Drops every cached export of the user; their finished jobs expire.
+    Called when the user's measurements change.  Does not commit.
+    """
+    prefix = f'{user_id}-'
+    for _, _, path in _cached_files():
+        if os.path.basename(path).startswith(prefix):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    ExportJob.query.filter(
+        ExportJob.user_id == user_id,
+        ExportJob.status == 'done'
+    ).update({'status': 'expired'}, synchronize_session=False)
+
+
+def older_than(hours):
+    return time.time() - hours * 3600
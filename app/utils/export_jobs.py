@@ -0,0 +1,188 @@
+"""
+Background export jobs.
+
+PDF and Excel exports are rendered by a local process pool instead of
+inside the request: the route records an ExportJob row, hands its id to
+the pool and returns immediately.  The worker writes the artifact into
+the export cache (see app/utils/export_cache.py) and updates the row,
+which the status page polls.  An export whose data has not changed since
+it was last rendered is served from the cache without a new render.
+Jobs expire after EXPORT_TTL_HOURS: `flask cleanup-exports`, run
+periodically (cron), marks them and evicts unused artifacts.
+
+Pool processes are spawned, not forked: the web process is
+multithreaded and holds open connection pools, which a forked child
+would inherit mid-use.
+
+With EXPORT_WORKERS = 0 jobs run inline (handy for tests and debugging).
+"""
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models.export_job import ExportJob
+from app.models.measurement import Measurement
+from app.utils import export_cache
+from app.utils.exports import generate_measurements_pdf, generate_measurements_excel
+
+# format -> (file extension, mimetype)
+EXPORT_FORMATS = {
+    'pdf': ('pdf', 'application/pdf'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+# Rows fetched per round-trip while rendering an export.
+EXPORT_BATCH_SIZE = 500
+
+_executor = None
+
+# App instance living in each worker process (see _init_worker).
+_worker_app = None
+
+
+def _init_worker(config):
+    """
+    Runs once in every pool process: build an app of its own, with its own
+    database engine, from the parent's configuration values.  The
+    parent's web process already runs the reminder scheduler, if any.
+    """
+    global _worker_app
+    from app import create_app
+    config = dict(config, REMINDER_SCHEDULER=False)
+    _worker_app = create_app(type('ExportWorkerConfig', (), config))
+    # Never reuse a connection from the parent, whatever the start method:
+    # drop any pooled one without closing it under the parent's feet.
+    with _worker_app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def _run_in_worker(job_id):
+    with _worker_app.app_context():
+        run_export_job(job_id)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        config = {k: v for k, v in current_app.config.items() if k.isupper()}
+        _executor = ProcessPoolExecutor(
+            max_workers=current_app.config['EXPORT_WORKERS'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(config,)
+        )
+    return _executor
+
+
+def artifact_path(job):
+    return os.path.join(current_app.config['EXPORT_DIR'], job.filename)
+
+
+def run_export_job(job_id):
+    """
+    Renders one export.  Must be called inside an app context.
+    """
+    job = db.session.get(ExportJob, job_id)
+    if job is None or job.status != 'pending':
+        return
+
+    job.status = 'running'
+    db.session.commit()
+
+    filename = job.filename
+    export_dir = current_app.config['EXPORT_DIR']
+    try:
+        measurements = Measurement.for_user(job.user_id).yield_per(EXPORT_BATCH_SIZE)
+        if job.format == 'pdf':
+            output = generate_measurements_pdf(measurements, job.user.email)
+        else:
+            output = generate_measurements_excel(measurements)
+
+        os.makedirs(export_dir, exist_ok=True)
+        tmp_path = os.path.join(export_dir, f'{filename}.{os.getpid()}.tmp')
+        with output, open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(output, f)
+        export_cache.store(tmp_path, filename)
+
+        job.status = 'done'
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Export job %s failed', job_id)
+        job.status = 'failed'
+        job.error = str(e)
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def submit_export_job(user_id, fmt):
+    """
+    Queues an export for the user and returns its ExportJob.
+
+    When the same export (user, format and data version) is already
+    cached, the job is created as done and points at it.  One that is
+    still queued or running is reused rather than rendered twice, unless
+    it was queued more than EXPORT_TTL_HOURS ago (a killed worker).
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    filename = export_cache.cache_filename(user_id, fmt, extension)
+
+    cutoff = datetime.utcnow() - timedelta(hours=current_app.config['EXPORT_TTL_HOURS'])
+    job = ExportJob.query.filter(
+        ExportJob.filename == filename,
+        ExportJob.status.in_(('pending', 'running')),
+        ExportJob.created_at >= cutoff
+    ).first()
+    if job:
+        return job
+
+    if export_cache.lookup(filename):
+        job = ExportJob(user_id=user_id, format=fmt, filename=filename,
+                        status='done', finished_at=datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    job = ExportJob(user_id=user_id, format=fmt, filename=filename)
+    db.session.add(job)
+    db.session.commit()
+
+    if current_app.config['EXPORT_WORKERS'] > 0:
+        _get_executor().submit(_run_in_worker, job.id)
+    else:
+        run_export_job(job.id)
+    return job
+
+
+def cleanup_expired_exports():
+    """
+    Marks jobs finished more than EXPORT_TTL_HOURS ago as expired and
+    evicts cached artifacts nobody asked for during that time.  Jobs stuck
+    in the queue for that long (e.g. a killed worker) are marked as failed.
+    Returns the number of jobs and files touched.  Run periodically
+    through `flask cleanup-exports`.
+    """
+    ttl_hours = current_app.config['EXPORT_TTL_HOURS']
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+
+    # Artifacts are shared between jobs through the cache: only the
+    # eviction below deletes files.
+    expired = ExportJob.query.filter(
+        ExportJob.status == 'done',
+        ExportJob.finished_at < cutoff
+    ).update({'status': 'expired'}, synchronize_session=False)
+
+    stale = ExportJob.query.filter(
+        ExportJob.status.in_(('pending', 'running')),
+        ExportJob.created_at < cutoff
+    ).update({'status': 'failed', 'error': 'Timed out'}, synchronize_session=False)
+
+    if expired or stale:
+        db.session.commit()
+    return expired + stale + export_cache.evict(unused_since=export_cache.older_than(ttl_hours))
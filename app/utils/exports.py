@@ -1,25 +1,62 @@
-from io import BytesIO
+import csv
+from io import StringIO
+from tempfile import SpooledTemporaryFile
 from datetime import datetime
-import pandas as pd
+from openpyxl import Workbook
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 
-def generate_measurements_pdf(measurements, user_email):
+# Size of the pieces handed to the WSGI server when streaming a file.
+CHUNK_SIZE = 64 * 1024
+
+# Exports smaller than this stay in memory, larger ones spill to disk.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+PDF_HEADER = ['Date', 'Type', 'Valeur 1', 'Valeur 2', 'Unité']
+
+# A row as wide as any real one, to measure the row height.
+PDF_SAMPLE_ROW = ['31/12/2000 23:59', 'Glycemie', '888.8', '888.8', 'mg/dL']
+
+# Fixed widths spare reportlab from measuring every cell of every table.
+PDF_COL_WIDTHS = [110, 80, 70, 70, 60]
+
+PDF_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+
+def pdf_table(data):
+    # repeatRows: should reportlab still have to split a table, the
+    # continuation starts with the header too.
+    return Table(data, colWidths=PDF_COL_WIDTHS, style=PDF_TABLE_STYLE, repeatRows=1)
+
+
+def pdf_rows_per_table(height):
     """
-    Génère un PDF avec l'historique des mesures.
+    Data rows of a table (header included) that fit in `height` points.
     """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    elements.append(Paragraph('Historique de Santé', styles['Title']))
-    elements.append(Paragraph(f'Patient: {user_email}', styles['Normal']))
-    elements.append(Paragraph(f'Date: {datetime.now().strftime("%d/%m/%Y")}', styles['Normal']))
-    
-    data = [['Date', 'Type', 'Valeur 1', 'Valeur 2', 'Unité']]
+    _, header_height = pdf_table([PDF_HEADER]).wrap(0, height)
+    _, table_height = pdf_table([PDF_HEADER, PDF_SAMPLE_ROW]).wrap(0, height)
+    return max(int((height - header_height) // (table_height - header_height)), 1)
+
+
+def pdf_tables(measurements, rows_per_table, first_rows=None):
+    """
+    Découpe les mesures en tables d'une page chacune, en-tête répété.
+    Each table fits in its frame, so reportlab never has to split (and
+    re-measure) one giant table across hundreds of pages.  The first
+    table holds `first_rows` rows (what is left of the first page).
+    """
+    limit = first_rows or rows_per_table
+    data = [PDF_HEADER]
     for m in measurements:
         val2 = str(m.value2) if m.value2 else '-'
         data.append([
@@ -29,43 +66,97 @@ def generate_measurements_pdf(measurements, user_email):
             val2,
             m.unit
         ])
-        
-    t = Table(data)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(t)
+        if len(data) > limit:
+            yield pdf_table(data)
+            data = [PDF_HEADER]
+            limit = rows_per_table
+
+    if len(data) > 1:
+        yield pdf_table(data)
+
+
+def generate_measurements_pdf(measurements, user_email):
+    """
+    Génère un PDF avec l'historique des mesures.
+
+    Returns a file object positioned at 0 (spilled to disk past
+    SPOOL_MAX_SIZE).
+    """
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    elements.append(Paragraph('Historique de Santé', styles['Title']))
+    elements.append(Paragraph(f'Patient: {user_email}', styles['Normal']))
+    elements.append(Paragraph(f'Date: {datetime.now().strftime("%d/%m/%Y")}', styles['Normal']))
+
+    # Page frame of SimpleDocTemplate: the margins, less 6pt of padding
+    # on each side.
+    width, height = doc.width - 12, doc.height - 12
+    title_height = sum(p.wrap(width, height)[1] + p.getSpaceBefore() + p.getSpaceAfter()
+                       for p in elements)
+    elements.extend(pdf_tables(measurements,
+                               rows_per_table=pdf_rows_per_table(height),
+                               first_rows=pdf_rows_per_table(height - title_height)))
     
     doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    output.seek(0)
+    return output
+
+EXPORT_COLUMNS = ['Date', 'Type', 'Valeur 1', 'Valeur 2', 'Unité', 'Notes']
+
+
+def measurement_row(m):
+    """
+    Une ligne d'export (mêmes colonnes pour Excel et CSV).
+    """
+    return [
+        m.date.strftime('%Y-%m-%d %H:%M:%S'),
+        m.type,
+        m.value1,
+        m.value2,
+        m.unit,
+        m.notes
+    ]
+
 
 def generate_measurements_excel(measurements):
     """
     Génère un fichier Excel avec l'historique des mesures.
+
+    `measurements` may be any iterable (ideally a query using yield_per):
+    rows are appended one by one to a write-only workbook, so memory stays
+    flat whatever the history size.  Returns a file object positioned at 0.
     """
-    data = []
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Mesures')
+    ws.append(EXPORT_COLUMNS)
     for m in measurements:
-        data.append({
-            'Date': m.date.strftime('%Y-%m-%d %H:%M:%S'),
-            'Type': m.type,
-            'Valeur 1': m.value1,
-            'Valeur 2': m.value2,
-            'Unité': m.unit,
-            'Notes': m.notes
-        })
-        
-    df = pd.DataFrame(data)
-    
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Mesures')
-        
+        ws.append(measurement_row(m))
+
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    wb.save(output)
     output.seek(0)
     return output
+
+
+def stream_measurements_csv(measurements):
+    """
+    Génère un export CSV ligne par ligne (générateur de chunks encodés).
+    """
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    # BOM so that Excel opens the UTF-8 file with the right accents.
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    for m in measurements:
+        writer.writerow(measurement_row(m))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue().encode('utf-8')
+
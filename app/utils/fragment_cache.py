@@ -0,0 +1,154 @@
+"""
+Template fragment cache.
+
+    {% cache 'nav' %} ... {% endcache %}
+    {% cache 'mobile_nav:' ~ request.endpoint, 600 %} ... {% endcache %}
+
+The rendered body of a cache block is stored under its key, automatically
+prefixed with the template name, the current language (g.lang) and the
+role of the logged-in user ('anonymous' otherwise).  Only put in a cache
+block markup that depends on nothing else.
+
+Backends (FRAGMENT_CACHE):
+- 'memory': per-process LRU bounded by FRAGMENT_CACHE_MAX_ENTRIES;
+- 'filesystem': one file per fragment in FRAGMENT_CACHE_DIR, shared by
+  all worker processes;
+- 'none': blocks are rendered every time.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from app.i18n import get_lang, split_lang
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU of rendered fragments with a per-entry expiry.
+    """
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemCache:
+    """
+    One file per fragment; the first line holds the expiry timestamp.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.html')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                expires = float(f.readline())
+                if expires < time.time():
+                    return None
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, value, ttl):
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(f'{time.time() + ttl}\n')
+            f.write(value)
+        # Atomic, so concurrent readers never see a partial fragment.
+        os.replace(tmp, path)
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.html'):
+                os.remove(os.path.join(self.directory, name))
+
+
+def current_role():
+    if current_user and current_user.is_authenticated:
+        return current_user.role or 'patient'
+    return 'anonymous'
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_ttl=3600)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_cached', args), [], [], body
+        ).set_lineno(lineno)
+
+    def _cached(self, template_name, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+
+        # The language variant prefix ('@en/') is already covered by lang.
+        _, template_name = split_lang(template_name or '')
+        full_key = f'{template_name}:{get_lang()}:{current_role()}:{key}'
+        value = cache.get(full_key)
+        if value is None:
+            value = caller()
+            cache.set(full_key, str(value), ttl or self.environment.fragment_cache_ttl)
+        return Markup(value)
+
+
+def make_cache(app):
+    kind = app.config.get('FRAGMENT_CACHE', 'memory')
+    if kind == 'memory':
+        return MemoryCache(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 512))
+    if kind == 'filesystem':
+        return FileSystemCache(app.config['FRAGMENT_CACHE_DIR'])
+    return None
+
+
+def init_app(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = make_cache(app)
+    app.jinja_env.fragment_cache_ttl = app.config.get('FRAGMENT_CACHE_TTL', 3600)
+    app.extensions['fragment_cache'] = app.jinja_env.fragment_cache
@@ -0,0 +1,88 @@
+"""
+Conditional responses for pages derived from a user's measurements.
+
+The validator is computed with one indexed aggregate query (latest id,
+latest date and row count of the user's measurements) and combined with
+the language, the user and the URL into an ETag.  When the browser
+already has that version (If-None-Match) the view is not run at all and
+a 304 is returned.  Last-Modified is the date of the latest measurement.
+Pages whose content also depends on the current date (trends over the
+last 7/30/90 days) add today's date to the validator, so a copy from
+yesterday is never revalidated.
+
+Responses are sent with `Cache-Control: private, no-cache`: browsers
+keep them but revalidate on every use, so a new measurement is visible
+immediately.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from flask import request, session, make_response
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+from app.i18n import get_lang
+from app.models.measurement import Measurement
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+class MeasurementValidator:
+    def __init__(self, user_id, dated=False):
+        latest_id, latest_date, count = Measurement.data_version(user_id)
+        self.last_modified = latest_date
+        key = ':'.join(str(part) for part in (
+            user_id, current_user.email, get_lang(),
+            latest_id, latest_date, count, request.full_path,
+            date.today() if dated else '',
+        ))
+        self.etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def not_modified(self):
+        # A pending flash message must be shown, so never answer 304 then.
+        if request.method != 'GET' or session.get('_flashes'):
+            return False
+        # Validated on the ETag only: the date alone does not change
+        # with the language.
+        return not is_resource_modified(request.environ, etag=self.etag)
+
+    def apply(self, response):
+        response.set_etag(self.etag)
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        # The language comes from the 'lang' cookie.
+        response.vary.add('Cookie')
+        return response
+
+    def not_modified_response(self):
+        return self.apply(make_response('', 304))
+
+
+def conditional_response(validator, view, *args, **kwargs):
+    """
+    Runs view(*args, **kwargs) unless the client's copy is still valid.
+    """
+    if validator.not_modified():
+        return validator.not_modified_response()
+    response = make_response(view(*args, **kwargs))
+    if response.status_code == 200:
+        validator.apply(response)
+    return response
+
+
+def measurements_conditional(view=None, dated=False):
+    """
+    Decorator for views that only show the current user's measurements;
+    `@measurements_conditional(dated=True)` when they also depend on
+    today's date.
+    """
+    if view is None:
+        return lambda view: measurements_conditional(view, dated)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        validator = MeasurementValidator(current_user.id, dated)
+        return conditional_response(validator, view, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,315 @@
+"""
+Bulk ingestion of measurements (connected devices).
+
+A device uploads its buffered readings in one request.  Each reading is
+validated with the MeasurementForm rules, then readings are processed per
+type in date order with the same 30 minute averaging as add_measurement:
+a reading close to the previous one (stored or from the batch) is
+averaged into it.  New rows are written with a single bulk insert, the
+summaries of the touched types are updated incrementally (only a type
+with back-dated readings is rebuilt), alerts are raised, and everything
+is committed once.
+
+Readings sent with a `source` and an `external_id` are stored exactly
+as sent (no averaging) through INSERT ... ON CONFLICT DO NOTHING on the
+(user_id, source, external_id) unique index: a retried sync only costs
+an index probe per reading and reports them as duplicates.
+"""
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.forms import MeasurementForm
+from app.models.alert import Alert
+from app.models.measurement import Measurement, UNITS, AVERAGING_WINDOW
+from app.models.measurement_summary import MeasurementSummary
+from app.utils import export_cache
+
+# Upper bound on readings per request.
+MAX_BATCH_SIZE = 1000
+
+# Column lengths of Measurement.source / external_id.
+SOURCE_MAX_LENGTH = 50
+EXTERNAL_ID_MAX_LENGTH = 100
+
+# Clock skew tolerated on device timestamps.
+FUTURE_TOLERANCE = timedelta(minutes=5)
+
+
+def parse_reading_date(value, now):
+    """
+    ISO 8601 timestamp -> naive UTC datetime (None: now).
+    Raises ValueError for unreadable or future dates.
+    """
+    if value is None:
+        return now
+    date = datetime.fromisoformat(str(value))
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    if date > now + FUTURE_TOLERANCE:
+        raise ValueError('date in the future')
+    return date
+
+
+def validate_reading(row, now):
+    """
+    Returns (reading, errors) for one uploaded row.
+    """
+    if not isinstance(row, dict):
+        return None, {'row': ['Expected an object.']}
+
+    formdata = MultiDict({k: str(v) for k, v in row.items() if v is not None and k != 'date'})
+    form = MeasurementForm(formdata=formdata, meta={'csrf': False})
+    errors = {} if form.validate() else dict(form.errors)
+
+    try:
+        date = parse_reading_date(row.get('date'), now)
+    except ValueError as e:
+        errors['date'] = [str(e)]
+
+    source = str(row.get('source') or '').strip() or None
+    external_id = str(row.get('external_id') or '').strip() or None
+    if (source is None) != (external_id is None):
+        errors['external_id'] = ['source and external_id go together.']
+    elif source is not None and (len(source) > SOURCE_MAX_LENGTH
+                                 or len(external_id) > EXTERNAL_ID_MAX_LENGTH):
+        errors['external_id'] = ['Too long.']
+
+    if errors:
+        return None, errors
+    return {
+        'type': form.type.data,
+        'value1': form.value1.data,
+        'value2': form.value2.data,
+        'notes': form.notes.data or None,
+        'date': date,
+        'source': source,
+        'external_id': external_id,
+    }, None
+
+
+def _row(user_id, reading):
+    return dict(
+        user_id=user_id,
+        type=reading['type'],
+        value1=reading['value1'],
+        value2=reading['value2'],
+        unit=UNITS.get(reading['type'], ''),
+        date=reading['date'],
+        notes=reading['notes'],
+        source=reading['source'],
+        external_id=reading['external_id'],
+    )
+
+
+def _average_into(target, reading):
+    """
+    add_measurement's averaging, on row mappings.
+    """
+    target['value1'] = (target['value1'] + reading['value1']) / 2
+    if reading['value2'] and target['value2']:
+        target['value2'] = (target['value2'] + reading['value2']) / 2
+    elif reading['value2']:
+        target['value2'] = reading['value2']
+    target['date'] = reading['date']
+
+
+def insert_rows(rows):
+    """
+    Inserts measurement row mappings and sets 'id' on each.  One batched
+    INSERT ... RETURNING (bulk_insert_mappings with return_defaults
+    sends one statement per row), its ids in row order.
+    """
+    ids = db.session.scalars(
+        db.insert(Measurement).returning(Measurement.id, sort_by_parameter_order=True),
+        rows
+    ).all()
+    for row, id in zip(rows, ids):
+        row['id'] = id
+
+
+def stored_external_ids(user_id, keys):
+    """
+    {(source, external_id): id} of the given keys already stored for the user.
+    """
+    query = db.session.query(Measurement.source, Measurement.external_id, Measurement.id)\
+        .filter(Measurement.user_id == user_id,
+                Measurement.external_id.in_({external_id for _, external_id in keys}))
+    return {(source, external_id): id for source, external_id, id in query
+            if (source, external_id) in keys}
+
+
+def insert_ignoring_duplicates(user_id, rows):
+    """
+    Inserts device rows, skipping those whose (user_id, source,
+    external_id) is already stored.  Sets 'id' on the rows actually
+    inserted and returns them.
+    """
+    dialect = db.engine.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = insert(Measurement).on_conflict_do_nothing(
+            index_elements=['user_id', 'source', 'external_id']
+        ).returning(Measurement.id, Measurement.source, Measurement.external_id)
+        inserted = {(source, external_id): id
+                    for id, source, external_id in db.session.execute(stmt, rows)}
+    else:
+        # No ON CONFLICT clause: filter out known ids first (not race-free).
+        known = stored_external_ids(user_id, {(r['source'], r['external_id']) for r in rows})
+        rows = [r for r in rows if (r['source'], r['external_id']) not in known]
+        if rows:
+            insert_rows(rows)
+        inserted = {(r['source'], r['external_id']): r['id'] for r in rows}
+
+    new_rows = []
+    for row in rows:
+        id = inserted.get((row['source'], row['external_id']))
+        if id is not None:
+            row['id'] = id
+            new_rows.append(row)
+    return new_rows
+
+
+def update_summaries(summaries, new_rows, replaced):
+    """
+    Applies a batch to the summaries of its types the way add_measurement
+    does: the stored latest reading averaged in place (replace_latest),
+    then the new rows in date order (add).  A type with a row older than
+    its latest stored reading, or with a stale summary, is rebuilt
+    instead.
+
+    replaced: {type: (Measurement, old value1, old value2)}.
+    """
+    added = {}
+    for row in new_rows:
+        added.setdefault(row['type'], []).append(row)
+
+    for type in set(added) | set(replaced):
+        summary = summaries[type]
+        rows = sorted(added.get(type, []), key=lambda r: (r['date'], r['id']))
+        if summary.stale or (rows and summary.latest_date is not None
+                             and rows[0]['date'] < summary.latest_date):
+            summary.rebuild()
+            continue
+        if type in replaced:
+            summary.replace_latest(*replaced[type])
+        for row in rows:
+            summary.add(Measurement(**{k: row[k] for k in ('id', 'type', 'value1', 'value2', 'date')}))
+
+
+def ingest_measurements(user_id, rows):
+    """
+    Validates and stores a batch of readings for the user.
+
+    Returns one result per input row, in input order:
+    {'index', 'status': 'created' | 'averaged' | 'duplicate' | 'error',
+    'id' or 'errors'}.
+    """
+    now = datetime.utcnow()
+    results = [None] * len(rows)
+
+    by_type = {}
+    # (source, external_id) -> (row mapping, indexes of the readings)
+    keyed = {}
+    for index, row in enumerate(rows):
+        reading, errors = validate_reading(row, now)
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+        elif reading['external_id'] is not None:
+            key = (reading['source'], reading['external_id'])
+            if key not in keyed:
+                keyed[key] = (_row(user_id, reading), [])
+            keyed[key][1].append(index)
+        else:
+            by_type.setdefault(reading['type'], []).append((reading['date'], index, reading))
+
+    # Same lock as add_measurement, on every type of the batch before
+    # anything is written (in a fixed order, so two batches cannot wait
+    # for each other): the stored latest readings cannot change under us,
+    # and concurrent syncs neither create nor rebuild the same summary at
+    # the same time.
+    types = set(by_type) | {row['type'] for row, _ in keyed.values()}
+    summaries = {type: MeasurementSummary.lock(user_id, type) for type in sorted(types)}
+
+    new_rows = []
+    # index -> mapping of the row the reading ended up in
+    targets = {}
+    # Stored rows averaged with readings of the batch: (Measurement, mapping)
+    averaged_stored = []
+
+    for type, readings in by_type.items():
+        readings.sort(key=lambda r: (r[0], r[1]))
+
+        # The stored latest reading becomes the averaging target once the
+        # batch reaches its date; older readings are back-filled history.
+        stored = Measurement.for_user(user_id, type).first()
+        current = None
+        for date, index, reading in readings:
+            if stored is not None and stored.date <= date:
+                current = dict(id=stored.id, value1=stored.value1,
+                               value2=stored.value2, date=stored.date)
+                averaged_stored.append((stored, current))
+                stored = None
+
+            if current is not None and date - current['date'] < AVERAGING_WINDOW:
+                _average_into(current, reading)
+                results[index] = {'index': index, 'status': 'averaged'}
+            else:
+                current = _row(user_id, reading)
+                new_rows.append(current)
+                results[index] = {'index': index, 'status': 'created'}
+            targets[index] = current
+
+    if new_rows:
+        insert_rows(new_rows)
+
+    for index, target in targets.items():
+        results[index]['id'] = target['id']
+
+    touched_types = set(by_type)
+    if keyed:
+        inserted = insert_ignoring_duplicates(user_id, [row for row, _ in keyed.values()])
+        new_rows.extend(inserted)
+        touched_types.update(row['type'] for row in inserted)
+
+        retried = {key for key, (row, _) in keyed.items() if 'id' not in row}
+        stored_ids = stored_external_ids(user_id, retried) if retried else {}
+        for key, (row, indexes) in keyed.items():
+            # Later copies within the batch are duplicates of the first one.
+            status = 'created' if 'id' in row else 'duplicate'
+            id = row['id'] if 'id' in row else stored_ids.get(key)
+            for index in indexes:
+                results[index] = {'index': index, 'status': status, 'id': id}
+                status = 'duplicate'
+
+    averaged_stored = [
+        (m, a) for m, a in averaged_stored
+        if (a['value1'], a['value2'], a['date']) != (m.value1, m.value2, m.date)
+    ]
+    replaced = {}
+    for m, averaged in averaged_stored:
+        replaced[m.type] = (m, m.value1, m.value2)
+        m.value1, m.value2, m.date = averaged['value1'], averaged['value2'], averaged['date']
+
+    # Alerts: stored rows go through the usual sync, new rows are
+    # evaluated in memory and inserted in bulk too.
+    db.session.flush()
+    for m, _ in averaged_stored:
+        Alert.sync(m)
+    alerts = []
+    for row in new_rows:
+        m = Measurement(**{k: row[k] for k in ('type', 'value1', 'value2')})
+        if m.is_alert:
+            alerts.append(dict(measurement_id=row['id'], user_id=user_id, type=row['type'],
+                               status='open', created_at=row['date']))
+    if alerts:
+        db.session.bulk_insert_mappings(Alert, alerts)
+
+    update_summaries(summaries, new_rows, replaced)
+
+    if touched_types:
+        export_cache.invalidate_user(user_id)
+    db.session.commit()
+    return results
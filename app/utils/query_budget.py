@@ -0,0 +1,71 @@
+"""
+SQL statement budgets for routes.
+
+Decorate a view with @query_budget(n) to declare how many statements it may
+run.  When QUERY_BUDGET_ENFORCED is set (tests), a view going over its
+budget raises QueryBudgetExceeded, so an N+1 regression fails loudly
+instead of slowing the clinic down as data grows.  Otherwise the decorator
+does nothing.  The tests enable it for every request (tests/conftest.py).
+
+Statements are counted on every engine (the primary and the read replica
+of @read_only routes), and only those run by the current thread, so
+concurrent requests do not count each other's.
+"""
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import event
+
+from app import db
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts the statements this thread sends to the databases inside the
+    block:
+
+        with count_queries() as statements:
+            ...
+        len(statements)
+    """
+    statements = []
+    thread = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def query_budget(max_statements):
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not current_app.config.get('QUERY_BUDGET_ENFORCED'):
+                return view(*args, **kwargs)
+
+            with count_queries() as statements:
+                rv = view(*args, **kwargs)
+            if len(statements) > max_statements:
+                raise QueryBudgetExceeded(
+                    f'{view.__name__} ran {len(statements)} SQL statements '
+                    f'(budget {max_statements}):\n' + '\n'.join(statements)
+                )
+            return rv
+        return wrapped
+    return decorator
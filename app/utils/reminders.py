@@ -0,0 +1,300 @@
+"""
+Reminder engine.
+
+Each reminder stores its schedule in normalised form (weekday bitmask and
+minute of the day) and its next due time, Reminder.next_fire_at, which is
+indexed.  The due time is computed when the reminder is created or
+toggled, and again each time it fires.  Finding the due reminders is
+therefore an index range scan: schedules are never parsed at dispatch
+time.
+
+dispatch_due() passes the due reminders to the notifier in batches.  It
+first claims each one with a compare-and-set on next_fire_at, so several
+processes running a scheduler never send the same reminder twice.  A
+reminder missed while no scheduler was running fires once, then resumes
+its schedule.
+
+ReminderScheduler is the local loop.  It keeps a heap of
+(next_fire_at, id) for the reminders due within
+REMINDER_LOOKAHEAD_SECONDS and sleeps until the earliest one is due.
+The heap is reloaded from the index twice per lookahead period, and the
+patient routes update it in place (add / toggle / delete) through
+reminder_changed() and reminder_deleted().  Run it with
+`flask run-reminders`, or inside the web process with
+REMINDER_SCHEDULER=1: the thread is then started by the first request,
+so CLI commands and export workers, which build an app but serve no
+requests, never start one.  The notifier is pluggable
+(REMINDER_NOTIFIER, a dotted path to a Notifier class).
+"""
+import heapq
+import logging
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.utils import import_string
+
+from app import db
+from app.models.reminder import Reminder
+
+logger = logging.getLogger('app.reminders')
+
+# Pause after a failed dispatch before trying again, in seconds.
+RETRY_SECONDS = 30
+
+
+class Notifier(ABC):
+    """
+    Delivers reminders: send() receives a batch of Reminder rows, already
+    claimed (next_fire_at advanced, last_fired_at set to the due time).
+    """
+    @abstractmethod
+    def send(self, reminders):
+        pass
+
+
+class LogNotifier(Notifier):
+    """
+    Writes one line per reminder to the 'app.reminders' logger.
+    """
+    def send(self, reminders):
+        for reminder in reminders:
+            logger.info('Reminder %s for user %s at %s: %s', reminder.id, reminder.user_id,
+                        reminder.last_fired_at, reminder.title)
+
+
+class MemoryNotifier(Notifier):
+    """
+    Keeps what it was given, for tests: [(id, user_id, title, due time)].
+    """
+    def __init__(self):
+        self.sent = []
+
+    def send(self, reminders):
+        self.sent.extend((r.id, r.user_id, r.title, r.last_fired_at) for r in reminders)
+
+
+def get_notifier(app=None):
+    app = app or current_app
+    notifier = app.extensions.get('reminder_notifier')
+    if notifier is None:
+        notifier = import_string(app.config['REMINDER_NOTIFIER'])()
+        app.extensions['reminder_notifier'] = notifier
+    return notifier
+
+
+def schedule_unscheduled(now=None):
+    """
+    Computes next_fire_at for active reminders that have none (created
+    before the engine existed).  Returns the number scheduled.
+    """
+    count = 0
+    for reminder in Reminder.query.filter(Reminder.is_active.is_(True),
+                                          Reminder.next_fire_at.is_(None)):
+        try:
+            reminder.schedule(now)
+        except ValueError:
+            logger.warning('Reminder %s has an unreadable schedule: %r %r',
+                           reminder.id, reminder.time, reminder.days)
+            continue
+        count += 1
+    db.session.commit()
+    return count
+
+
+def claim(reminder, now):
+    """
+    Moves a due reminder on to its next occurrence after `now`, with a
+    compare-and-set on next_fire_at.  Returns False when another process
+    claimed it first.  Does not commit.
+    """
+    fire_at = reminder.next_fire_at
+    next_fire_at = reminder.next_occurrence(now)
+    result = db.session.execute(
+        db.update(Reminder)
+        .where(Reminder.id == reminder.id, Reminder.next_fire_at == fire_at)
+        .values(next_fire_at=next_fire_at, last_fired_at=fire_at)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    set_committed_value(reminder, 'next_fire_at', next_fire_at)
+    set_committed_value(reminder, 'last_fired_at', fire_at)
+    return True
+
+
+def dispatch_due(now=None, notifier=None, batch_size=None):
+    """
+    Sends every reminder due at `now`, batch by batch (each batch is
+    claimed and committed before it goes to the notifier).  Returns the
+    reminders sent.
+    """
+    if now is None:
+        now = datetime.now()
+    if notifier is None:
+        notifier = get_notifier()
+    if batch_size is None:
+        batch_size = current_app.config['REMINDER_BATCH_SIZE']
+
+    sent = []
+    while True:
+        batch = Reminder.query.filter(
+            Reminder.next_fire_at <= now,
+            Reminder.is_active.is_(True)
+        ).order_by(Reminder.next_fire_at, Reminder.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        claimed = [reminder for reminder in batch if claim(reminder, now)]
+        db.session.commit()
+        if claimed:
+            notifier.send(claimed)
+            sent.extend(claimed)
+        if len(batch) < batch_size:
+            break
+    return sent
+
+
+class ReminderScheduler:
+    def __init__(self, app, notifier=None):
+        self.app = app
+        self.notifier = notifier
+        self.lookahead = timedelta(seconds=app.config['REMINDER_LOOKAHEAD_SECONDS'])
+
+        self._heap = []          # (next_fire_at, reminder id)
+        self._due = {}           # reminder id -> next_fire_at of its live heap entry
+        self._loaded_until = None
+        self._reload_at = None
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    # -- incremental updates (request threads) --------------------------
+
+    def refresh(self, reminder):
+        """
+        Takes a reminder's new next_fire_at into account (added, toggled,
+        or just fired).
+        """
+        with self._cond:
+            self._due.pop(reminder.id, None)
+            fire_at = reminder.next_fire_at if reminder.is_active else None
+            if fire_at is not None and self._loaded_until is not None \
+                    and fire_at <= self._loaded_until:
+                self._due[reminder.id] = fire_at
+                heapq.heappush(self._heap, (fire_at, reminder.id))
+                self._cond.notify()
+
+    def forget(self, reminder_id):
+        # Its heap entry no longer matches _due and is skipped when popped.
+        with self._cond:
+            self._due.pop(reminder_id, None)
+
+    # -- loop ------------------------------------------------------------
+
+    def load(self, now):
+        """
+        Reloads the heap with the reminders due before now + lookahead.
+        """
+        until = now + self.lookahead
+        rows = db.session.query(Reminder.id, Reminder.next_fire_at).filter(
+            Reminder.next_fire_at <= until,
+            Reminder.is_active.is_(True)
+        ).all()
+        db.session.commit()
+        with self._cond:
+            self._due = dict(rows)
+            self._heap = [(fire_at, id) for id, fire_at in rows]
+            heapq.heapify(self._heap)
+            self._loaded_until = until
+            self._reload_at = now + self.lookahead / 2
+
+    def run_pending(self, now=None):
+        """
+        Dispatches what is due and returns the number of seconds until
+        something else is.  Must be called inside an app context.
+        """
+        if now is None:
+            now = datetime.now()
+        if self._reload_at is None or now >= self._reload_at:
+            self.load(now)
+
+        with self._cond:
+            due = False
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, id = heapq.heappop(self._heap)
+                if self._due.get(id) == fire_at:
+                    del self._due[id]
+                    due = True
+
+        if due:
+            for reminder in dispatch_due(now, self.notifier):
+                self.refresh(reminder)
+
+        with self._cond:
+            wake_at = self._reload_at
+            if self._heap and self._heap[0][0] < wake_at:
+                wake_at = self._heap[0][0]
+        return max((wake_at - now).total_seconds(), 0)
+
+    def run_forever(self):
+        with self.app.app_context():
+            schedule_unscheduled()
+
+        while True:
+            with self.app.app_context():
+                try:
+                    wait = self.run_pending()
+                except Exception:
+                    logger.exception('Reminder dispatch failed')
+                    db.session.rollback()
+                    wait = RETRY_SECONDS
+            with self._cond:
+                if not self._stopped and wait > 0:
+                    self._cond.wait(wait)
+                if self._stopped:
+                    return
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run_forever, name='reminder-scheduler',
+                                            daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def reminder_changed(reminder):
+    """
+    Called by the routes after a reminder was added or toggled.
+    """
+    scheduler = current_app.extensions.get('reminder_scheduler')
+    if scheduler is not None:
+        scheduler.refresh(reminder)
+
+
+def reminder_deleted(reminder_id):
+    scheduler = current_app.extensions.get('reminder_scheduler')
+    if scheduler is not None:
+        scheduler.forget(reminder_id)
+
+
+def init_app(app):
+    if not app.config['REMINDER_SCHEDULER']:
+        return
+    scheduler = ReminderScheduler(app)
+    app.extensions['reminder_scheduler'] = scheduler
+
+    @app.before_request
+    def start_reminder_scheduler():
+        # Only a process serving requests runs the scheduler.
+        scheduler.start()
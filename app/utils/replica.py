@@ -0,0 +1,77 @@
+"""
+Read replica routing.
+
+When SQLALCHEMY_REPLICA_URI is set, it is registered as the 'replica'
+bind.  Routes decorated with @read_only run their SELECTs on it; flushes
+and UPDATE/INSERT/DELETE statements always go to the primary, as does
+everything outside those routes.
+
+Read-your-writes: once a request has flushed something (e.g. a lazy
+backfill inside a read-only view), the rest of that request reads from
+the primary too, and the user's session is pinned to the primary for
+REPLICA_STICKY_SECONDS, so the pages shown right after a change never
+come from a replica that has not caught up.
+"""
+import time
+from functools import wraps
+
+from flask import g, session, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+
+# Flask session key: primary-only until this timestamp.
+STICKY_KEY = 'db_primary_until'
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing
+                and not getattr(clause, 'is_dml', False)
+                and has_app_context() and g.get('use_replica')):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(session, flush_context):
+    if has_request_context():
+        g.db_wrote = True
+        # Rows expired by the coming commit must reload from the primary.
+        g.pop('use_replica', None)
+
+
+def read_only(view):
+    """
+    Runs the view's queries on the read replica (if one is configured),
+    unless this user wrote something in the last few seconds.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get(STICKY_KEY, 0) < time.time():
+            g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def init_app(app):
+    """
+    Must run before db.init_app(app), which creates the engines.
+    """
+    uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if not uri:
+        return
+
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}),
+        REPLICA_BIND: uri,
+    }
+
+    @app.after_request
+    def stick_to_primary_after_write(response):
+        if g.pop('db_wrote', False):
+            session[STICKY_KEY] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+        return response
@@ -0,0 +1,120 @@
+"""
+Chart series for measurements.
+
+Two modes, both with a payload whose size does not depend on how many
+readings the patient has:
+- bucketed: the database groups readings by day/week/month and returns
+  min/max/mean of value1 and value2 per bucket;
+- raw: readings are fetched as plain tuples and reduced to a fixed number
+  of points with LTTB (Largest-Triangle-Three-Buckets), which keeps the
+  visual shape of the curve (peaks included).
+"""
+from app import db
+from app.models.measurement import Measurement
+
+BUCKETS = ('day', 'week', 'month')
+
+# Default number of points returned in raw mode.
+RAW_POINTS = 200
+
+# strftime patterns used to group readings on SQLite.
+SQLITE_BUCKET_FORMATS = {
+    'day': '%Y-%m-%d',
+    'month': '%Y-%m',
+}
+
+
+def bucket_expression(bucket):
+    if db.engine.dialect.name == 'postgresql':
+        return db.func.date_trunc(bucket, Measurement.date)
+    if bucket == 'week':
+        # The Monday of the reading's week, like date_trunc('week').
+        # strftime('%Y-%W') would split the week spanning New Year in two.
+        return db.func.date(Measurement.date, 'weekday 0', '-6 days')
+    return db.func.strftime(SQLITE_BUCKET_FORMATS[bucket], Measurement.date)
+
+
+def _range_filter(query, user_id, type, start, end):
+    query = query.filter(Measurement.user_id == user_id, Measurement.type == type)
+    if start:
+        query = query.filter(Measurement.date >= start)
+    if end:
+        query = query.filter(Measurement.date < end)
+    return query
+
+
+def bucketed_series(user_id, type, bucket, start=None, end=None):
+    """
+    Aggregates readings per bucket in SQL.  Each point is dated by the
+    first reading of its bucket.
+    """
+    key = bucket_expression(bucket).label('bucket')
+    query = db.session.query(
+        db.func.min(Measurement.date),
+        db.func.count(Measurement.id),
+        db.func.min(Measurement.value1),
+        db.func.max(Measurement.value1),
+        db.func.avg(Measurement.value1),
+        db.func.min(Measurement.value2),
+        db.func.max(Measurement.value2),
+        db.func.avg(Measurement.value2),
+    )
+    query = _range_filter(query, user_id, type, start, end).group_by(key).order_by(key)
+
+    return [{
+        'date': date.isoformat(),
+        'count': count,
+        'val1': {'min': min1, 'max': max1, 'mean': mean1},
+        'val2': {'min': min2, 'max': max2, 'mean': mean2} if mean2 is not None else None,
+    } for date, count, min1, max1, mean1, min2, max2, mean2 in query]
+
+
+def raw_series(user_id, type, points=RAW_POINTS, start=None, end=None):
+    """
+    Readings in the range, oldest first, downsampled to `points` with LTTB.
+    Returns a list of (date, value1, value2) tuples.
+    """
+    query = db.session.query(Measurement.date, Measurement.value1, Measurement.value2)
+    query = _range_filter(query, user_id, type, start, end)\
+        .order_by(Measurement.date, Measurement.id)
+    return lttb(query.all(), points)
+
+
+def lttb(rows, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling over (date, value1, ...)
+    rows sorted by date.  The first and last rows are always kept.
+    """
+    n = len(rows)
+    if threshold >= n or threshold < 3:
+        return list(rows)
+
+    xs = [r[0].timestamp() for r in rows]
+    ys = [r[1] for r in rows]
+
+    sampled = [rows[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        # Point of the current bucket forming the largest triangle with the
+        # previously selected point and the next bucket's average.
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(rows[best])
+        a = best
+
+    sampled.append(rows[-1])
+    return sampled
@@ -0,0 +1,181 @@
+"""
+Recurring availability: expansion of SlotTemplate rows into free slots.
+
+A template ("Monday and Thursday, 09:00-12:00, 15 minute consultations
+at the office") is expanded server-side, for all of a doctor's templates
+at once:
+- candidate slots are generated day by day up to the horizon;
+- the doctor's appointments in the covered period are read with a single
+  range query, and candidates overlapping one of them (or an earlier
+  candidate) are dropped in memory;
+- the remaining slots are written with one bulk insert.
+
+Each template remembers the last day it was expanded to
+(generated_until), so extending the horizon is idempotent: a second run
+creates nothing, and a generated slot the doctor removed is not created
+again.
+"""
+import bisect
+from datetime import datetime, date, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models.appointment import Appointment
+from app.models.slot_template import SlotTemplate
+from app.utils.agenda import overlap_criteria
+
+# Bounds of a template's slot length, in minutes.
+MIN_SLOT_MINUTES = 5
+MAX_SLOT_MINUTES = 240
+
+
+def parse_time(value):
+    """
+    'HH:MM' -> datetime.time.  Raises ValueError.
+    """
+    return datetime.strptime(value, '%H:%M').time()
+
+
+def horizon(days=None):
+    """
+    Last day that should have slots: SLOT_HORIZON_DAYS from today by default.
+    """
+    if days is None:
+        days = current_app.config['SLOT_HORIZON_DAYS']
+    return date.today() + timedelta(days=days)
+
+
+def template_slots(template, first_day, last_day):
+    """
+    (start, end) of every slot of the template between the two days, inclusive.
+    """
+    start_time, end_time = parse_time(template.start), parse_time(template.end)
+    length = timedelta(minutes=template.slot_duration)
+
+    day = first_day
+    while day <= last_day:
+        if template.has_day(day.weekday()):
+            start = datetime.combine(day, start_time)
+            day_end = datetime.combine(day, end_time)
+            while start + length <= day_end:
+                yield start, start + length
+                start += length
+        day += timedelta(days=1)
+
+
+def busy_intervals(doctor_id, start, end):
+    """
+    (start_time, end_time) of the doctor's appointments overlapping
+    [start, end), ordered by start_time.  One range query.
+    """
+    return db.session.query(Appointment.start_time, Appointment.end_time)\
+        .filter(*overlap_criteria(doctor_id, start, end))\
+        .order_by(Appointment.start_time).all()
+
+
+def without_overlaps(candidates, busy):
+    """
+    Candidates (sorted by start, with their payload as a third item) that
+    overlap neither a busy interval (sorted by start) nor a candidate kept
+    before them.
+    """
+    starts = [start for start, _ in busy]
+    # latest_end[i]: latest end among busy[0..i]
+    latest_end = []
+    for _, end in busy:
+        latest_end.append(max(end, latest_end[-1]) if latest_end else end)
+
+    kept = []
+    kept_until = None
+    for start, end, payload in candidates:
+        if kept_until is not None and kept_until > start:
+            continue
+        # Busy intervals starting before this slot ends overlap it when
+        # one of them ends after it starts.
+        i = bisect.bisect_left(starts, end)
+        if i and latest_end[i - 1] > start:
+            continue
+        kept.append((start, end, payload))
+        kept_until = end if kept_until is None else max(kept_until, end)
+    return kept
+
+
+def expand_templates(doctor_id, templates, until):
+    """
+    Creates the free slots of the doctor's templates up to `until` (a date)
+    and advances their generated_until.  Returns the number of slots
+    created.  Does not commit.
+    """
+    now = datetime.now()
+    today = now.date()
+
+    candidates = []
+    for template in templates:
+        first_day = today
+        if template.generated_until is not None:
+            first_day = max(first_day, template.generated_until + timedelta(days=1))
+        for start, end in template_slots(template, first_day, until):
+            if start >= now:
+                candidates.append((start, end, template))
+        if template.generated_until is None or template.generated_until < until:
+            template.generated_until = until
+
+    if not candidates:
+        return 0
+
+    candidates.sort(key=lambda c: (c[0], c[1]))
+    busy = busy_intervals(doctor_id, candidates[0][0], max(end for _, end, _ in candidates))
+
+    rows = [
+        dict(
+            doctor_id=doctor_id,
+            patient_id=None,
+            start_time=start,
+            end_time=end,
+            duration=template.slot_duration,
+            status='free',
+            type=template.type,
+            video_link=template.video_link,
+            template_id=template.id,
+        )
+        for start, end, template in without_overlaps(candidates, busy)
+    ]
+    if rows:
+        db.session.bulk_insert_mappings(Appointment, rows)
+    return len(rows)
+
+
+def extend_horizon(days=None):
+    """
+    Materialises the slots of every active template up to the horizon,
+    one transaction per doctor.  Returns the number of slots created.
+    """
+    until = horizon(days)
+    templates = SlotTemplate.query.filter(
+        SlotTemplate.is_active.is_(True),
+        db.or_(SlotTemplate.generated_until.is_(None), SlotTemplate.generated_until < until)
+    ).order_by(SlotTemplate.doctor_id).all()
+
+    by_doctor = {}
+    for template in templates:
+        by_doctor.setdefault(template.doctor_id, []).append(template)
+
+    created = 0
+    for doctor_id, doctor_templates in by_doctor.items():
+        created += expand_templates(doctor_id, doctor_templates, until)
+        db.session.commit()
+    return created
+
+
+def remove_template(template):
+    """
+    Deactivates the template and withdraws its future free slots (booked
+    ones are kept).  Does not commit.
+    """
+    template.is_active = False
+    return Appointment.query.filter(
+        Appointment.template_id == template.id,
+        Appointment.status == 'free',
+        Appointment.start_time > datetime.now()
+    ).update({'status': 'cancelled'}, synchronize_session=False)
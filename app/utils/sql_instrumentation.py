@@ -0,0 +1,140 @@
+"""
+Per-request SQL instrumentation.
+
+SQLAlchemy cursor events time every statement; statements run while a
+request is being handled are accumulated in `g.sql_stats`.  After the
+request:
+- a `Server-Timing: db;dur=...` header reports the statement count and
+  total database time (visible in the browser dev tools);
+- one structured log line is written to the 'app.sql' logger;
+- statements slower than SQL_SLOW_QUERY_MS are logged as warnings with
+  their EXPLAIN (QUERY PLAN) output, taken right after the statement on
+  the connection that ran it.
+"""
+import json
+import logging
+import time
+
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('app.sql')
+
+# Number of slowest statements kept per request.
+SLOWEST_KEPT = 3
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append((context, time.perf_counter()))
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute: drop its
+    # start time, or the connection carries it back to the pool.
+    conn = exception_context.connection
+    started = conn.info.get('query_start_time') if conn is not None else None
+    if started and started[-1][0] is exception_context.execution_context:
+        started.pop()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()[1]
+    if not has_request_context() or 'sql_stats' not in g:
+        return
+
+    stats = g.sql_stats
+    stats['count'] += 1
+    stats['time'] += elapsed
+
+    slowest = stats['slowest']
+    if len(slowest) < SLOWEST_KEPT or elapsed > slowest[-1][0]:
+        plan = None
+        if (elapsed >= current_app.config['SQL_SLOW_QUERY_MS'] / 1000 and not executemany
+                and statement.lstrip().upper().startswith('SELECT')):
+            try:
+                plan = explain(conn, statement, parameters)
+            except Exception as e:
+                plan = [f'(EXPLAIN failed: {e})']
+        slowest.append((elapsed, statement, plan))
+        slowest.sort(key=lambda s: s[0], reverse=True)
+        del slowest[SLOWEST_KEPT:]
+
+
+def explain(conn, statement, parameters):
+    """
+    Returns the query plan of a statement as text lines.  Runs on `conn`,
+    the connection that executed the statement (same database, replica
+    or primary, and same transaction), through a raw DBAPI cursor so the
+    EXPLAIN is neither timed nor counted against the query budget.
+    """
+    sqlite = conn.dialect.name == 'sqlite'
+    prefix = 'EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN '
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if sqlite:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        else:
+            # A failed EXPLAIN must not abort the request's transaction.
+            cursor.execute('SAVEPOINT sql_explain')
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            except Exception:
+                cursor.execute('ROLLBACK TO SAVEPOINT sql_explain')
+                raise
+            finally:
+                cursor.execute('RELEASE SAVEPOINT sql_explain')
+    finally:
+        cursor.close()
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def init_app(app):
+    if not app.config.get('SQL_INSTRUMENTATION'):
+        return
+
+    # Listening on the Engine class covers every engine (binds included).
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = {'count': 0, 'time': 0.0, 'slowest': []}
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+
+        db_ms = stats['time'] * 1000
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.1f};desc="{stats["count"]} SQL statements"'
+        )
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'sql_statements': stats['count'],
+            'sql_ms': round(db_ms, 2),
+            'slowest_ms': [round(s[0] * 1000, 2) for s in stats['slowest']],
+        }))
+
+        threshold = app.config['SQL_SLOW_QUERY_MS'] / 1000
+        for elapsed, statement, plan in stats['slowest']:
+            if elapsed < threshold:
+                break
+            message = statement
+            if plan is not None:
+                message += '\nPlan:\n' + '\n'.join(plan)
+            logger.warning('Slow SQL (%.1f ms) on %s %s:\n%s',
+                           elapsed * 1000, request.method, request.path, message)
+
+        return response
@@ -10,3 +10,59 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Optional read replica used by @read_only routes; after a write the
+    # user stays on the primary for REPLICA_STICKY_SECONDS.
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+    # Engine tuning per backend (see app/utils/database.py).
+    # SQLite: WAL journal, busy timeout and memory-mapped reads.
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1') == '1'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    # Postgres: connection pool of each worker process.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+
+    # Make @query_budget raise when a route runs too many SQL statements
+    # (enable it in tests).
+    QUERY_BUDGET_ENFORCED = os.environ.get('QUERY_BUDGET_ENFORCED') == '1'
+
+    # Per-request SQL statistics (Server-Timing header, 'app.sql' logger)
+    # and slow query log with EXPLAIN output above SQL_SLOW_QUERY_MS.
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') == '1'
+    SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 100))
+
+    # Background exports (see app/utils/export_jobs.py).
+    # EXPORT_WORKERS = 0 renders exports inline, in the request.
+    EXPORT_DIR = os.environ.get('EXPORT_DIR') or os.path.join(basedir, 'exports')
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_TTL_HOURS = int(os.environ.get('EXPORT_TTL_HOURS', 24))
+    # Size bound of the rendered exports kept for reuse (LRU eviction).
+    EXPORT_CACHE_MAX_MB = int(os.environ.get('EXPORT_CACHE_MAX_MB', 500))
+
+    # Recurring availability: free slots are materialised this many days
+    # ahead (`flask extend-slot-horizon`, run daily).
+    SLOT_HORIZON_DAYS = int(os.environ.get('SLOT_HORIZON_DAYS', 28))
+    # Patient booking page: days shown at once, how far ahead patients
+    # may book, and slots per page.
+    BOOKING_WINDOW_DAYS = int(os.environ.get('BOOKING_WINDOW_DAYS', 14))
+    BOOKING_MAX_DAYS_AHEAD = int(os.environ.get('BOOKING_MAX_DAYS_AHEAD', 90))
+    BOOKING_PAGE_SIZE = int(os.environ.get('BOOKING_PAGE_SIZE', 60))
+
+    # Reminder engine (see app/utils/reminders.py).  REMINDER_SCHEDULER=1
+    # runs the scheduler inside the web process (started by its first
+    # request); otherwise run `flask run-reminders` alongside it.
+    REMINDER_SCHEDULER = os.environ.get('REMINDER_SCHEDULER') == '1'
+    REMINDER_NOTIFIER = os.environ.get('REMINDER_NOTIFIER', 'app.utils.reminders.LogNotifier')
+    REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 100))
+    REMINDER_LOOKAHEAD_SECONDS = int(os.environ.get('REMINDER_LOOKAHEAD_SECONDS', 300))
+
+    # {% cache %} template fragments: 'memory' (per-process LRU),
+    # 'filesystem' (shared by all workers) or 'none'.
+    FRAGMENT_CACHE = os.environ.get('FRAGMENT_CACHE', 'memory')
+    FRAGMENT_CACHE_DIR = os.environ.get('FRAGMENT_CACHE_DIR') or os.path.join(basedir, 'instance', 'fragments')
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 512))
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
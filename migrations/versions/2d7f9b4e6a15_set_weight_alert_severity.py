@@ -0,0 +1,26 @@
+"""Set severity of weight alerts
+
+Revision ID: 2d7f9b4e6a15
+Revises: 9c4e1a7f3b28
+Create Date: 2026-02-19 09:12:37.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7f9b4e6a15'
+down_revision = '9c4e1a7f3b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Alerts on types without severity rules (poids) were stored as
+    # 'normal'; see app.models.alert.alert_severity.
+    op.execute(sa.text("UPDATE alert SET severity = 'high' WHERE severity = 'normal'"))
+
+
+def downgrade():
+    pass
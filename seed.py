@@ -8,6 +8,8 @@ from app.models.patient import Patient
 from app.models.measurement import Measurement
 from app.models.reminder import Reminder
 from app.models.appointment import Appointment
+from app.models.measurement_summary import MeasurementSummary
+from app.models.alert import Alert
 from datetime import datetime, timedelta
 import random
 
@@ -157,6 +159,12 @@ def seed_database():
 
         db.session.commit()
 
+        # Résumés par type (dernière valeur, min/max/moyenne)
+        MeasurementSummary.rebuild_all()
+
+        # Alertes médecin pour les mesures hors seuils
+        Alert.backfill()
+
         # Créer des rappels pour quelques patients
         print("⏰ Création des rappels...")
         reminders_data = [
@@ -0,0 +1,143 @@
+"""
+Shared fixtures.
+
+Every test gets its own app on a temporary SQLite database, with
+QUERY_BUDGET_ENFORCED on: a route running more SQL statements than its
+@query_budget raises QueryBudgetExceeded, which fails the test making
+the request.  Code outside routes can be held to a budget with the
+max_queries fixture.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import Config
+from app import create_app, db
+from app.models import User, Patient, Measurement, MeasurementSummary, Appointment
+from app.models.measurement import UNITS
+from app.utils.query_budget import count_queries
+
+PASSWORD = 'secret'
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    QUERY_BUDGET_ENFORCED = True
+    SQLALCHEMY_REPLICA_URI = None
+    EXPORT_WORKERS = 0
+    REMINDER_SCHEDULER = False
+    FRAGMENT_CACHE = 'none'
+
+
+@pytest.fixture
+def config(tmp_path):
+    class LocalConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        EXPORT_DIR = str(tmp_path / 'exports')
+    return LocalConfig
+
+
+@contextmanager
+def running_app(config):
+    app = create_app(config)
+    with app.app_context():
+        # Same schema on every engine (primary and replica, if any)
+        for engine in db.engines.values():
+            db.metadata.create_all(engine)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def app(config):
+    with running_app(config) as app:
+        yield app
+
+
+def create_user(email, role='patient', first_name='Jean', last_name='Martin'):
+    """
+    A user with its profile, committed.  Returns the user id.
+    """
+    user = User(email=email, role=role)
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Patient(user_id=user.id, first_name=first_name, last_name=last_name))
+    db.session.commit()
+    return user.id
+
+
+def add_readings(user_id, count, start=None, step=timedelta(hours=7)):
+    """
+    `count` readings cycling through the three types, oldest first, then
+    rebuilds the summaries.
+    """
+    start = start or datetime.utcnow() - step * count
+    types = ('tension', 'glycemie', 'poids')
+    rows = []
+    for i in range(count):
+        type = types[i % 3]
+        rows.append(dict(user_id=user_id, type=type, value1=90 + i % 70,
+                         value2=70 + i % 30 if type == 'tension' else None,
+                         unit=UNITS[type], date=start + step * i))
+    db.session.bulk_insert_mappings(Measurement, rows)
+    db.session.commit()
+    MeasurementSummary.rebuild_all()
+
+
+def add_free_slots(doctor_id, count, start=None, duration=30):
+    start = start or datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    slots = [dict(doctor_id=doctor_id, start_time=start + timedelta(minutes=duration * i),
+                  end_time=start + timedelta(minutes=duration * (i + 1)),
+                  duration=duration, status='free', type='cabinet')
+             for i in range(count)]
+    db.session.bulk_insert_mappings(Appointment, slots)
+    db.session.commit()
+
+
+@pytest.fixture
+def patient_id(app):
+    with app.app_context():
+        return create_user('patient@example.com')
+
+
+@pytest.fixture
+def doctor_id(app):
+    with app.app_context():
+        return create_user('doctor@example.com', role='doctor', first_name='Anne', last_name='Durand')
+
+
+@pytest.fixture
+def login(app):
+    """
+    login(email) -> test client with that user logged in.
+    """
+    def login(email):
+        client = app.test_client()
+        response = client.post('/login', data={'email': email, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+    return login
+
+
+@pytest.fixture
+def max_queries(app):
+    """
+    Fails the test when the block runs more SQL statements than allowed:
+
+        with max_queries(2):
+            ...
+    """
+    @contextmanager
+    def check(limit):
+        with count_queries() as statements:
+            yield statements
+        if len(statements) > limit:
+            pytest.fail(f'{len(statements)} SQL statements (budget {limit}):\n'
+                        + '\n'.join(statements), pytrace=False)
+    return check
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Alert, Measurement, User
+
+
+@pytest.fixture
+def patient(app, patient_id, login):
+    return login('patient@example.com')
+
+
+def add(client, type, value1, value2=None):
+    data = {'type': type, 'value1': value1}
+    if value2 is not None:
+        data['value2'] = value2
+    assert client.post('/measurements/add', data=data).status_code == 302
+
+
+def alerts(app):
+    with app.app_context():
+        return [(a.type, a.status) for a in Alert.query.order_by(Alert.id)]
+
+
+def test_sync_opens_resolves_and_reopens(app, patient):
+    add(patient, 'glycemie', 200)
+    assert alerts(app) == [('glycemie', 'open')]
+
+    # Averaged with 150 within 30 minutes: 175, back under 180.
+    add(patient, 'glycemie', 150)
+    assert alerts(app) == [('glycemie', 'resolved')]
+    with app.app_context():
+        alert = Alert.query.one()
+        assert alert.resolved_at is not None
+        assert Measurement.query.count() == 1
+
+    # Averaged with 250: 212.5, alerting again.
+    add(patient, 'glycemie', 250)
+    assert alerts(app) == [('glycemie', 'open')]
+    with app.app_context():
+        alert = Alert.query.one()
+        assert alert.resolved_at is None and alert.measurement.value1 == 212.5
+
+
+def test_reopened_alert_is_no_longer_acknowledged(app, patient_id, doctor_id):
+    with app.app_context():
+        m = Measurement(user_id=patient_id, type='tension', value1=150, value2=95, unit='mmHg',
+                        date=datetime(2024, 1, 1, 8))
+        db.session.add(m)
+        db.session.flush()
+        alert = Alert.sync(m)
+        alert.acknowledge(db.session.get(User, doctor_id))
+        assert alert.status == 'acknowledged'
+
+        m.value1, m.value2 = 130, 85
+        assert Alert.sync(m).status == 'resolved'
+        m.value1, m.date = 145, datetime(2024, 1, 1, 8, 20)
+        Alert.sync(m)
+        assert (alert.status, alert.acknowledged_by, alert.acknowledged_at) == ('open', None, None)
+        assert alert.created_at == datetime(2024, 1, 1, 8, 20)
+
+        # Never alerting: no alert at all.
+        normal = Measurement(user_id=patient_id, type='poids', value1=80, unit='kg', date=m.date)
+        db.session.add(normal)
+        db.session.flush()
+        assert Alert.sync(normal) is None
+
+
+def test_backfill_alerts_command(app, patient_id):
+    readings = [
+        ('tension', 141, 85, True),
+        ('tension', 140, 90, False),   # thresholds are strictly above
+        ('tension', 130, 91, True),
+        ('glycemie', 181, None, True),
+        ('glycemie', 180, None, False),
+        ('poids', 131, None, True),
+        ('poids', 130, None, False),
+    ]
+    with app.app_context():
+        db.session.bulk_insert_mappings(Measurement, [
+            dict(user_id=patient_id, type=type, value1=value1, value2=value2, unit='',
+                 date=datetime(2024, 1, 1, i))
+            for i, (type, value1, value2, _) in enumerate(readings)
+        ])
+        db.session.commit()
+        # One of them already has its alert.
+        first = Measurement.query.order_by(Measurement.id).first()
+        Alert.sync(first)
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['backfill-alerts'])
+    assert result.exit_code == 0
+    assert result.output.strip() == '3 alert(s) created.'
+    assert runner.invoke(args=['backfill-alerts']).output.strip() == '0 alert(s) created.'
+
+    with app.app_context():
+        alerted = sorted((a.measurement.value1, a.status, a.created_at == a.measurement.date)
+                         for a in Alert.query)
+        expected = sorted((value1, 'open', True) for _, value1, _, alert in readings if alert)
+        assert alerted == expected
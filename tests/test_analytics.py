@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app import db
+from app.models import Measurement, MeasurementSummary
+from app.utils.analytics import load_series, patient_statistics, rolling_means, slope, time_in_range
+
+START = datetime(2024, 1, 1, 8)
+
+
+def store(user_id, readings):
+    """
+    readings: (type, date, value1, value2); rebuilds the summaries.
+    """
+    db.session.bulk_insert_mappings(Measurement, [
+        dict(user_id=user_id, type=type, value1=value1, value2=value2, unit='', date=date)
+        for type, date, value1, value2 in readings
+    ])
+    db.session.commit()
+    MeasurementSummary.rebuild_all()
+
+
+def linear_glycemia(count=100):
+    # One reading a day at 08:00, rising by 0.5 mg/dL a day from 100.
+    return [('glycemie', START + timedelta(days=i), 100 + 0.5 * i, None) for i in range(count)]
+
+
+def test_rolling_means_use_time_windows():
+    days = np.array([0.0, 1.0, 2.0, 10.0])
+    values = np.array([1.0, 2.0, 3.0, 10.0])
+    assert rolling_means(days, values, 7).tolist() == [1.0, 1.5, 2.0, 10.0]
+    assert rolling_means(days, values, 30).tolist() == [1.0, 1.5, 2.0, 4.0]
+
+
+def test_slope_of_a_linear_series():
+    days = np.arange(10, dtype=float)
+    assert slope(days, 2 * days + 5) == pytest.approx(2.0)
+    assert slope(days, np.full(10, 7.0)) == pytest.approx(0.0)
+    assert slope(days[:2], days[:2]) is None
+    assert slope(np.zeros(5), np.arange(5.0)) is None
+
+
+def test_time_in_range():
+    summary = SimpleNamespace(type='glycemie', count=10, count_warning=3, count_high=1)
+    assert time_in_range(summary) == {'normal': 60.0, 'warning': 30.0, 'high': 10.0}
+    assert time_in_range(SimpleNamespace(type='poids', count=10, count_warning=0, count_high=0)) is None
+    assert time_in_range(SimpleNamespace(type='glycemie', count=0, count_warning=0, count_high=0)) is None
+
+
+def test_load_series_per_type(app, patient_id):
+    with app.app_context():
+        store(patient_id, [
+            ('tension', START, 130, 85),
+            ('tension', START + timedelta(days=1, hours=12), 120, None),
+            ('glycemie', START, 95, None),
+            ('glycemie', START + timedelta(days=5), 105, None),
+        ])
+        series = load_series(patient_id, {'tension': START, 'glycemie': START + timedelta(days=1)})
+
+    epoch_day = (START - datetime(1970, 1, 1)).total_seconds() / 86400
+    days, hours, value1, value2 = series['tension']
+    assert days == pytest.approx([epoch_day, epoch_day + 1.5])
+    assert hours == pytest.approx([8, 20])
+    assert value1.tolist() == [130, 120]
+    assert value2[0] == 85 and np.isnan(value2[1])
+
+    days, hours, value1, value2 = series['glycemie']
+    assert days == pytest.approx([epoch_day + 5])
+    assert value1.tolist() == [105]
+
+
+def test_patient_statistics_of_a_linear_series(app, patient_id):
+    with app.app_context():
+        store(patient_id, linear_glycemia())
+        stats = patient_statistics(patient_id)['glycemie']
+
+    values = 100 + 0.5 * np.arange(100)
+    assert stats['count'] == 100
+    assert stats['mean'] == 124.75
+    assert (stats['min'], stats['max']) == (100, 149.5)
+    assert stats['slope'] == {7: 0.5, 30: 0.5, 90: 0.5}
+    # The last 7 and 30 readings.
+    assert stats['rolling_mean'] == {7: 148.0, 30: 142.25}
+    assert stats['sd'] == round(float(np.std(values, ddof=1)), 2)
+    assert stats['cv'] == round(float(np.std(values, ddof=1)) / 124.75 * 100, 1)
+    # Thresholds 100 (warning) and 126 (high), inclusive.
+    assert stats['time_in_range'] == {'normal': 0.0, 'warning': 52.0, 'high': 48.0}
+    # Mornings of the last 90 days only (91 readings, i = 9..99).
+    assert (stats['morning_count'], stats['morning_mean']) == (91, 127.0)
+    assert (stats['evening_count'], stats['evening_mean']) == (0, None)
+
+
+def test_patient_statistics_without_readings(app, patient_id):
+    with app.app_context():
+        assert patient_statistics(patient_id) == {}
+
+
+def test_trends_grid_uses_literal_classes(app, patient_id, login):
+    # Classes Tailwind can find in the template (and ship in output.css).
+    with app.app_context():
+        store(patient_id, linear_glycemia(10))
+    page = login('patient@example.com').get('/history').get_data(as_text=True)
+    assert 'grid gap-4 md:grid-cols-1' in page
@@ -0,0 +1,96 @@
+"""
+Stress tests of the 30 minute averaging (add_measurement) under
+concurrent submissions of the same user and type.
+"""
+import threading
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Measurement, MeasurementSummary
+
+from conftest import add_readings
+
+
+def submit_concurrently(clients, per_client, value1):
+    """
+    Every client posts `per_client` readings at the same time.  Returns
+    the status codes and the exceptions raised.
+    """
+    barrier = threading.Barrier(len(clients))
+    statuses, errors = [], []
+
+    def submit(client):
+        barrier.wait()
+        for _ in range(per_client):
+            try:
+                response = client.post('/measurements/add', data={'type': 'glycemie', 'value1': value1})
+                statuses.append(response.status_code)
+            except Exception as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=submit, args=(client,)) for client in clients]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return statuses, errors
+
+
+@pytest.mark.parametrize('threads, per_thread', [
+    (4, 5),
+    # 48 averagings: about the most a double can tell apart (see below)
+    pytest.param(12, 4, marks=pytest.mark.benchmark),
+])
+def test_no_averaging_is_lost(app, patient_id, login, threads, per_thread):
+    with app.app_context():
+        db.session.add(Measurement(user_id=patient_id, type='glycemie', value1=500,
+                                   unit='mg/dL', date=datetime.utcnow()))
+        db.session.commit()
+        MeasurementSummary.rebuild_all()
+    clients = [login('patient@example.com') for _ in range(threads)]
+
+    statuses, errors = submit_concurrently(clients, per_thread, value1=1)
+
+    assert errors == []
+    assert statuses == [302] * (threads * per_thread)
+    with app.app_context():
+        [row] = Measurement.query.filter_by(user_id=patient_id, type='glycemie').all()
+        # Each averaging halves the distance to 1: a lost update would
+        # leave the value twice as far from it.
+        distance = 499 / 2 ** (threads * per_thread)
+        assert row.value1 - 1 == pytest.approx(distance, rel=0.25)
+
+        [summary] = MeasurementSummary.query.filter_by(user_id=patient_id, type='glycemie').all()
+        assert summary.count == 1
+        assert summary.latest_id == row.id
+        assert summary.latest_value1 == row.value1
+
+
+def test_concurrent_first_readings_make_one_row(app, patient_id, login):
+    clients = [login('patient@example.com') for _ in range(8)]
+
+    statuses, errors = submit_concurrently(clients, 1, value1=120)
+
+    assert errors == []
+    assert statuses == [302] * 8
+    with app.app_context():
+        assert Measurement.query.filter_by(user_id=patient_id).count() == 1
+        assert MeasurementSummary.query.filter_by(user_id=patient_id).count() == 1
+
+
+def test_summary_matches_history_after_concurrent_averaging(app, patient_id, login):
+    with app.app_context():
+        add_readings(patient_id, 30)
+    clients = [login('patient@example.com') for _ in range(4)]
+
+    submit_concurrently(clients, 3, value1=150)
+
+    with app.app_context():
+        summary = MeasurementSummary.query.filter_by(user_id=patient_id, type='glycemie').one()
+        values = [m.value1 for m in Measurement.for_user(patient_id, 'glycemie')]
+        assert summary.count == len(values)
+        assert summary.sum_value1 == pytest.approx(sum(values))
+        assert summary.sum_sq_value1 == pytest.approx(sum(v * v for v in values))
+        assert summary.latest_value1 == values[0]
@@ -0,0 +1,70 @@
+"""
+Stress test of slot booking: many patients claiming the same free slot
+at the same time (Appointment.claim, a compare-and-set).
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Appointment
+from app.utils.booking import book_slot
+
+from conftest import create_user
+
+
+def free_slot(doctor_id, start):
+    slot = Appointment(doctor_id=doctor_id, start_time=start, end_time=start + timedelta(minutes=30),
+                       duration=30, status='free')
+    db.session.add(slot)
+    db.session.commit()
+    return slot.id
+
+
+@pytest.mark.parametrize('patients, slots', [
+    (10, 3),
+    pytest.param(40, 20, marks=pytest.mark.benchmark),
+])
+def test_each_slot_is_booked_once(app, doctor_id, login, patients, slots):
+    with app.app_context():
+        for k in range(patients):
+            create_user(f'p{k}@example.com')
+        start = datetime.now() + timedelta(days=3)
+        slot_ids = [free_slot(doctor_id, start + timedelta(hours=i)) for i in range(slots)]
+    clients = [login(f'p{k}@example.com') for k in range(patients)]
+
+    for slot_id in slot_ids:
+        barrier = threading.Barrier(patients)
+        outcomes = [None] * patients
+
+        def book(k):
+            barrier.wait()
+            try:
+                response = clients[k].post('/patient/book', data={'slot_id': slot_id, 'reason': f'p{k}'})
+                won = response.status_code == 302 and '/reminders' in response.headers['Location']
+                outcomes[k] = 'won' if won else response.status_code
+            except Exception as e:
+                outcomes[k] = e
+
+        workers = [threading.Thread(target=book, args=(k,)) for k in range(patients)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        # One winner; everyone else is sent back to the booking page.
+        assert outcomes.count('won') == 1, outcomes
+        assert outcomes.count(302) == patients - 1, outcomes
+        winner = outcomes.index('won')
+        with app.app_context():
+            slot = db.session.get(Appointment, slot_id)
+            assert slot.status == 'pending'
+            assert slot.notes == f'p{winner}'
+
+
+def test_slot_in_the_past_cannot_be_booked(app, doctor_id, patient_id):
+    with app.app_context():
+        slot_id = free_slot(doctor_id, datetime.now() - timedelta(hours=1))
+        assert book_slot(slot_id, patient_id) is False
+        assert db.session.get(Appointment, slot_id).status == 'free'
@@ -0,0 +1,106 @@
+from datetime import date, datetime, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.models import Appointment
+from app.utils.booking import SlotFilters, free_slot_counts, next_free_slots
+from app.utils.cursors import decode_cursor, encode_cursor
+
+from conftest import add_free_slots, create_user
+
+TODAY = date.today()
+TOMORROW = datetime.combine(TODAY + timedelta(days=1), datetime.min.time()).replace(hour=8)
+
+
+def filters(app, **args):
+    with app.test_request_context():
+        return SlotFilters.from_args(MultiDict(args))
+
+
+def test_cursor_round_trip():
+    when = datetime(2024, 3, 1, 8, 30, 0, 250)
+    assert decode_cursor(encode_cursor(when, 42)) == (when, 42)
+    for bad in (None, '', 'abc', '2024-03-01_x', '2024-03-01T08:30:00.000000'):
+        assert decode_cursor(bad) is None
+
+
+def test_from_args(app):
+    day = TODAY + timedelta(days=3)
+    f = filters(app, **{'from': day.isoformat(), 'doctor': '7', 'type': 'visio'})
+    assert (f.first_day, f.doctor_id, f.type) == (day, 7, 'visio')
+    assert f.last_day == day + timedelta(days=app.config['BOOKING_WINDOW_DAYS'] - 1)
+
+    f = filters(app, **{'from': 'demain', 'doctor': 'x', 'type': 'domicile'})
+    assert (f.first_day, f.doctor_id, f.type) == (TODAY, None, None)
+
+
+def test_from_args_clamps_the_window(app):
+    max_days = app.config['BOOKING_MAX_DAYS_AHEAD']
+    assert filters(app, **{'from': '2000-01-01'}).first_day == TODAY
+    f = filters(app, **{'from': (TODAY + timedelta(days=max_days + 30)).isoformat()})
+    assert f.first_day == f.last_day == TODAY + timedelta(days=max_days)
+
+
+def test_cursor_paging_has_no_gaps_or_duplicates(app, doctor_id):
+    with app.app_context():
+        other_id = create_user('other@example.com', role='doctor')
+        # Both doctors have slots at the same times: ties on start_time.
+        add_free_slots(doctor_id, 7, start=TOMORROW)
+        add_free_slots(other_id, 7, start=TOMORROW)
+        expected = [s.id for s in Appointment.query.order_by(Appointment.start_time, Appointment.id)]
+
+        f = SlotFilters()
+        seen, cursor, pages = [], None, 0
+        while True:
+            slots, cursor = next_free_slots(f, after=cursor, limit=3)
+            seen += [s.id for s in slots]
+            pages += 1
+            if cursor is None:
+                break
+        assert seen == expected
+        assert pages == 5
+
+        # A page that ends exactly on the last slot has no next page.
+        slots, cursor = next_free_slots(f, limit=14)
+        assert len(slots) == 14 and cursor is None
+
+
+def test_malformed_cursor_returns_the_first_page(app, doctor_id):
+    with app.app_context():
+        add_free_slots(doctor_id, 5, start=TOMORROW)
+        first, _ = next_free_slots(SlotFilters(), limit=2)
+        again, _ = next_free_slots(SlotFilters(), after='garbage', limit=2)
+        assert [s.id for s in again] == [s.id for s in first]
+
+
+def test_free_slot_counts_per_day(app, doctor_id):
+    with app.app_context():
+        other_id = create_user('other@example.com', role='doctor')
+        add_free_slots(doctor_id, 3, start=TOMORROW)
+        add_free_slots(doctor_id, 2, start=TOMORROW + timedelta(days=2))
+        add_free_slots(other_id, 4, start=TOMORROW + timedelta(days=2))
+        # Booked, out of the window and past slots are not counted.
+        db.session.query(Appointment).filter(Appointment.doctor_id == other_id)\
+            .limit(1).one().status = 'booked'
+        add_free_slots(doctor_id, 1, start=TOMORROW + timedelta(days=200))
+        add_free_slots(doctor_id, 1, start=TOMORROW - timedelta(days=2))
+        db.session.commit()
+
+        day1, day3 = TODAY + timedelta(days=1), TODAY + timedelta(days=3)
+        assert free_slot_counts(SlotFilters()) == {day1: 3, day3: 5}
+        assert free_slot_counts(SlotFilters(doctor_id=doctor_id)) == {day1: 3, day3: 2}
+        assert free_slot_counts(SlotFilters(type='visio')) == {}
+        assert free_slot_counts(SlotFilters(first_day=day3, days=1)) == {day3: 5}
+
+
+def test_booking_page_weekdays_are_translated(app, patient_id, doctor_id, login):
+    with app.app_context():
+        add_free_slots(doctor_id, 1, start=TOMORROW)
+    client = login('patient@example.com')
+    names = {'fr': ['Lun', 'Mar', 'Mer', 'Jeu', 'Ven', 'Sam', 'Dim'],
+             'en': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']}
+    for lang, days in names.items():
+        client.set_cookie('lang', lang)
+        page = client.get('/patient/book').get_data(as_text=True)
+        assert f'text-gray-400">{days[TOMORROW.weekday()]}</span>' in page
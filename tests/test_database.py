@@ -0,0 +1,136 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from app import create_app, db
+from app.models import Measurement
+from app.utils.database import engine_options, normalize_database_uri
+
+from conftest import PASSWORD, TestConfig, create_user, running_app
+
+
+def pragma(name):
+    return db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+
+
+def test_sqlite_connections_use_wal(app):
+    with app.app_context():
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+
+def test_wal_can_be_turned_off(config):
+    config.SQLITE_WAL = False
+    with running_app(config) as app:
+        with app.app_context():
+            assert pragma('journal_mode') == 'delete'
+
+
+def test_postgres_options():
+    config = dict(SQLALCHEMY_DATABASE_URI='postgresql://u@h/db', DB_POOL_SIZE=5,
+                  DB_MAX_OVERFLOW=10, DB_POOL_TIMEOUT=30, DB_POOL_RECYCLE=1800)
+    options = engine_options(config)
+    assert options['pool_pre_ping'] is True
+    assert options['pool_size'] == 5
+    assert normalize_database_uri('postgres://u@h/db') == 'postgresql://u@h/db'
+
+
+# Load tests: rollback journal (synchronous=FULL) against WAL
+# (synchronous=NORMAL) on the same file database.
+
+def load_config(path, wal):
+    class LoadConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        QUERY_BUDGET_ENFORCED = False
+        SQLITE_WAL = wal
+    return LoadConfig
+
+
+def commits_per_second(path, wal, threads, count):
+    """
+    The commit path alone: each thread inserts a reading, commits, then
+    reads the latest ones back, `count` times.
+    """
+    with running_app(load_config(path, wal)) as app:
+        with app.app_context():
+            user_id = create_user('load@example.com')
+        barrier = threading.Barrier(threads)
+
+        def work():
+            with app.app_context():
+                barrier.wait()
+                for i in range(count):
+                    db.session.add(Measurement(user_id=user_id, type='glycemie', value1=100 + i % 7,
+                                               unit='mg/dL'))
+                    db.session.commit()
+                    Measurement.query.filter_by(user_id=user_id) \
+                        .order_by(Measurement.date.desc()).limit(8).all()
+                db.session.remove()
+
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        began = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - began
+        with app.app_context():
+            assert Measurement.query.count() == threads * count
+    return threads * count / elapsed
+
+
+@pytest.mark.benchmark
+def test_wal_commit_throughput(tmp_path):
+    journal = commits_per_second(str(tmp_path / 'journal.db'), False, 4, 250)
+    wal = commits_per_second(str(tmp_path / 'wal.db'), True, 4, 250)
+    print(f'4 threads x 250 commits: rollback journal {journal:.0f}/s, WAL {wal:.0f}/s')
+    assert wal > journal
+
+
+def request_worker(args):
+    """
+    One process, like a gunicorn worker: add_measurement then /home,
+    `count` times.  Returns (writes ok, errors, seconds).
+    """
+    path, wal, email, count = args
+    app = create_app(load_config(path, wal))
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': PASSWORD})
+    ok = errors = 0
+    types = ['tension', 'glycemie', 'poids']
+    began = time.perf_counter()
+    for i in range(count):
+        try:
+            response = client.post('/measurements/add',
+                                   data={'type': types[i % 3], 'value1': 100 + i % 7, 'value2': 80})
+            ok += response.status_code == 302
+            client.get('/home')
+        except Exception:
+            errors += 1
+    return ok, errors, time.perf_counter() - began
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('processes', [4, 8])
+def test_concurrent_workers(tmp_path, processes):
+    count = 100
+    for wal in (False, True):
+        path = str(tmp_path / f'{wal}.db')
+        with running_app(load_config(path, wal)) as app:
+            with app.app_context():
+                emails = [f'load{k}@example.com' for k in range(processes)]
+                for email in emails:
+                    create_user(email)
+
+        with multiprocessing.get_context('spawn').Pool(processes) as pool:
+            results = pool.map(request_worker, [(path, wal, email, count) for email in emails])
+        ok = sum(r[0] for r in results)
+        errors = sum(r[1] for r in results)
+        elapsed = max(r[2] for r in results)
+        print(f"{'WAL' if wal else 'rollback journal'}, {processes} processes: "
+              f"{ok} writes, {errors} errors, {ok / elapsed:.0f} writes/s")
+        if wal:
+            assert (ok, errors) == (processes * count, 0)
@@ -0,0 +1,121 @@
+import os
+import time
+
+import pytest
+
+from app import db
+from app.models import ExportJob
+from app.utils import export_cache, export_jobs
+from app.utils.export_cache import cache_filename, evict, invalidate_user, lookup
+
+from conftest import add_readings, create_user
+
+
+def cached_file(app, name, size=100, age=0):
+    """
+    A file of `size` bytes in the cache, last used `age` seconds ago.
+    """
+    directory = app.config['EXPORT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    used = time.time() - age
+    os.utime(path, (used, used))
+    return path
+
+
+def cached_names(app):
+    return sorted(os.listdir(app.config['EXPORT_DIR']))
+
+
+def test_languages_share_one_rendered_export(app, patient_id, login, monkeypatch):
+    renders = []
+    generate = export_jobs.generate_measurements_pdf
+    monkeypatch.setattr(export_jobs, 'generate_measurements_pdf',
+                        lambda *args: renders.append(1) or generate(*args))
+    with app.app_context():
+        add_readings(patient_id, 10)
+
+    client = login('patient@example.com')
+    for lang in ('fr', 'en', 'fr'):
+        client.set_cookie('lang', lang)
+        assert client.get('/measurements/export/pdf').status_code == 302
+    assert len(renders) == 1
+    with app.app_context():
+        assert len({job.filename for job in ExportJob.query}) == 1
+
+
+def test_key_follows_the_data(app, patient_id):
+    with app.app_context():
+        before = cache_filename(patient_id, 'pdf', 'pdf')
+        assert cache_filename(patient_id, 'pdf', 'pdf') == before
+        assert cache_filename(patient_id, 'excel', 'xlsx') != before
+        add_readings(patient_id, 1)
+        assert cache_filename(patient_id, 'pdf', 'pdf') != before
+        assert before.startswith(f'{patient_id}-')
+
+
+def test_lookup_marks_hits_as_recently_used(app):
+    with app.app_context():
+        path = cached_file(app, '1-a.pdf', age=3600)
+        assert lookup('1-a.pdf')
+        assert os.path.getmtime(path) > time.time() - 60
+        assert not lookup('1-missing.pdf')
+
+
+def test_eviction_is_least_recently_used(app):
+    with app.app_context():
+        cached_file(app, '1-old.pdf', age=300)
+        cached_file(app, '1-older.pdf', age=400)
+        cached_file(app, '1-new.pdf', age=100)
+        cached_file(app, '1-oldest.pdf', age=500)
+        cached_file(app, '1-render.pdf.123.tmp', age=1000)
+        lookup('1-oldest.pdf')  # used just now
+
+        assert evict(max_bytes=250) == 2
+        # In-progress renders are never evicted.
+        assert cached_names(app) == ['1-new.pdf', '1-oldest.pdf', '1-render.pdf.123.tmp']
+        assert evict(max_bytes=250) == 0
+
+
+def test_eviction_of_unused_files(app):
+    with app.app_context():
+        cached_file(app, '1-a.pdf', age=7200)
+        cached_file(app, '1-b.pdf', age=60)
+        assert evict(max_bytes=10 ** 6, unused_since=time.time() - 3600) == 1
+        assert cached_names(app) == ['1-b.pdf']
+
+
+@pytest.mark.parametrize('size_mb, kept', [(1, 1), (0, 0)])
+def test_store_enforces_the_size_bound(app, size_mb, kept):
+    app.config['EXPORT_CACHE_MAX_MB'] = size_mb
+    with app.app_context():
+        tmp = cached_file(app, '1-a.pdf.1.tmp', size=1000)
+        export_cache.store(tmp, '1-a.pdf')
+        assert cached_names(app) == ['1-a.pdf'] * kept
+
+
+def test_invalidate_user(app, patient_id):
+    with app.app_context():
+        other_id = create_user('other@example.com')
+        cached_file(app, f'{patient_id}-a.pdf')
+        cached_file(app, f'{patient_id}-b.xlsx')
+        cached_file(app, f'{other_id}-c.pdf')
+        jobs = [ExportJob(user_id=user_id, format='pdf', filename='x', status=status)
+                for user_id, status in ((patient_id, 'done'), (patient_id, 'failed'), (other_id, 'done'))]
+        db.session.add_all(jobs)
+        db.session.commit()
+
+        invalidate_user(patient_id)
+        db.session.commit()
+        assert cached_names(app) == [f'{other_id}-c.pdf']
+        assert [db.session.get(ExportJob, job.id).status for job in jobs] == ['expired', 'failed', 'done']
+
+
+def test_new_measurement_invalidates_cached_exports(app, patient_id, login):
+    client = login('patient@example.com')
+    client.get('/measurements/export/pdf')
+    assert len(cached_names(app)) == 1
+    client.post('/measurements/add', data={'type': 'poids', 'value1': 70})
+    assert cached_names(app) == []
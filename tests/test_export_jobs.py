@@ -0,0 +1,137 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import ExportJob
+from app.utils import export_jobs
+from app.utils.export_jobs import cleanup_expired_exports, submit_export_job
+
+from conftest import add_readings, create_user
+
+
+@pytest.fixture
+def patient(app, patient_id, login):
+    with app.app_context():
+        add_readings(patient_id, 30)
+    return login('patient@example.com')
+
+
+def export(client, fmt='pdf'):
+    """
+    Requests an export and returns its job id.
+    """
+    response = client.get(f'/measurements/export/{fmt}')
+    assert response.status_code == 302
+    return int(response.headers['Location'].split('/job/')[1])
+
+
+def test_export_runs_and_downloads(app, patient):
+    job_id = export(patient)
+    assert patient.get(f'/measurements/export/job/{job_id}').status_code == 200
+    status = patient.get(f'/measurements/export/job/{job_id}/status').get_json()
+    assert status == {'status': 'done',
+                      'download_url': f'/measurements/export/job/{job_id}/download'}
+
+    response = patient.get(status['download_url'])
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+
+    job_id = export(patient, 'excel')
+    response = patient.get(f'/measurements/export/job/{job_id}/download')
+    assert response.data.startswith(b'PK')  # xlsx is a zip
+
+
+def test_unchanged_data_is_served_from_the_cache(app, patient, monkeypatch):
+    first = export(patient)
+    monkeypatch.setattr(export_jobs, 'generate_measurements_pdf', None)  # any render would fail
+    second = export(patient)
+    assert second != first
+    with app.app_context():
+        jobs = [db.session.get(ExportJob, id) for id in (first, second)]
+        assert [j.status for j in jobs] == ['done', 'done']
+        assert jobs[0].filename == jobs[1].filename
+
+
+def test_jobs_belong_to_their_owner(app, patient, login):
+    job_id = export(patient)
+    with app.app_context():
+        create_user('other@example.com')
+    other = login('other@example.com')
+    for suffix in ('', '/status', '/download'):
+        assert other.get(f'/measurements/export/job/{job_id}{suffix}').status_code == 403
+    assert patient.get('/measurements/export/job/999/status').status_code == 404
+
+
+def test_evicted_artifact_expires_the_job(app, patient):
+    job_id = export(patient)
+    with app.app_context():
+        os.remove(export_jobs.artifact_path(db.session.get(ExportJob, job_id)))
+    assert patient.get(f'/measurements/export/job/{job_id}/download').status_code == 404
+    status = patient.get(f'/measurements/export/job/{job_id}/status').get_json()
+    assert status == {'status': 'expired', 'download_url': None}
+
+
+def test_submit_does_not_clean_up(app, patient_id, monkeypatch):
+    def cleanup():
+        raise AssertionError('cleanup on the request path')
+    monkeypatch.setattr(export_jobs, 'cleanup_expired_exports', cleanup)
+    with app.app_context():
+        assert submit_export_job(patient_id, 'pdf').status == 'done'
+
+
+def test_cleanup_expired_exports(app, patient_id):
+    old = datetime.utcnow() - timedelta(hours=app.config['EXPORT_TTL_HOURS'] + 1)
+    with app.app_context():
+        done = submit_export_job(patient_id, 'pdf')
+        done.finished_at = old
+        stuck = ExportJob(user_id=patient_id, format='excel', filename='stuck.xlsx', created_at=old)
+        db.session.add(stuck)
+        db.session.commit()
+        past = old.timestamp()
+        os.utime(export_jobs.artifact_path(done), (past, past))
+
+        # Two jobs and the unused file.
+        assert cleanup_expired_exports() == 3
+        db.session.refresh(done)
+        db.session.refresh(stuck)
+        assert (done.status, stuck.status, stuck.error) == ('expired', 'failed', 'Timed out')
+        assert not os.path.exists(export_jobs.artifact_path(done))
+
+
+def test_stuck_job_is_not_reused(app, patient_id):
+    old = datetime.utcnow() - timedelta(hours=app.config['EXPORT_TTL_HOURS'] + 1)
+    with app.app_context():
+        filename = submit_export_job(patient_id, 'pdf').filename
+        os.remove(os.path.join(app.config['EXPORT_DIR'], filename))
+        stuck = ExportJob(user_id=patient_id, format='pdf', filename=filename, created_at=old)
+        recent = ExportJob(user_id=patient_id, format='pdf', filename=filename, status='running')
+        db.session.add(stuck)
+        db.session.commit()
+        job = submit_export_job(patient_id, 'pdf')
+        assert job.id != stuck.id and job.status == 'done'
+
+        db.session.add(recent)
+        db.session.commit()
+        assert submit_export_job(patient_id, 'pdf').id == recent.id
+
+
+def test_pool_worker_renders_the_export(config, app, patient, monkeypatch):
+    # A real spawned worker process, with its own app and engine.
+    app.config['EXPORT_WORKERS'] = 1
+    monkeypatch.setattr(export_jobs, '_executor', None)
+    try:
+        job_id = export(patient)
+        deadline = time.monotonic() + 60
+        while True:
+            status = patient.get(f'/measurements/export/job/{job_id}/status').get_json()
+            if status['status'] in ('done', 'failed') or time.monotonic() > deadline:
+                break
+            time.sleep(0.2)
+        assert status['status'] == 'done'
+        assert export_jobs._executor._mp_context.get_start_method() == 'spawn'
+    finally:
+        if export_jobs._executor is not None:
+            export_jobs._executor.shutdown()
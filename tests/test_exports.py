@@ -0,0 +1,127 @@
+import csv
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from reportlab.platypus import Table
+
+from app import db
+from app.models import Measurement
+from app.utils.exports import (CHUNK_SIZE, EXPORT_COLUMNS, PDF_HEADER, generate_measurements_pdf,
+                               pdf_rows_per_table, pdf_table, stream_measurements_csv)
+
+# Page frame of the letter SimpleDocTemplate used for exports
+FRAME_HEIGHT = 648 - 12
+
+
+def readings(count):
+    now = datetime(2026, 1, 1, 8, 0)
+    for i in range(count):
+        tension = i % 2 == 0
+        yield SimpleNamespace(date=now - timedelta(minutes=i),
+                              type='tension' if tension else 'glycemie',
+                              value1=120.0 + i % 40, value2=80.0 if tension else None,
+                              unit='mmHg' if tension else 'mg/dL', notes=None)
+
+
+@pytest.fixture
+def table_splits(monkeypatch):
+    """
+    Tables that reportlab had to split across pages.
+    """
+    splits = []
+    split = Table.split
+
+    def counting_split(self, width, height):
+        parts = split(self, width, height)
+        if parts:
+            splits.append(self)
+        return parts
+    monkeypatch.setattr(Table, 'split', counting_split)
+    return splits
+
+
+def test_rows_per_table_fill_the_frame():
+    rows = pdf_rows_per_table(FRAME_HEIGHT)
+    row = ['01/01/2026 08:00', 'Tension', '120.0', '80.0', 'mmHg']
+    _, height = pdf_table([PDF_HEADER] + [row] * rows).wrap(0, FRAME_HEIGHT)
+    assert height <= FRAME_HEIGHT
+    _, height = pdf_table([PDF_HEADER] + [row] * (rows + 1)).wrap(0, FRAME_HEIGHT)
+    assert height > FRAME_HEIGHT
+
+
+@pytest.mark.parametrize('count', [1, 30, 33, 34, 350, 1000])
+def test_pdf_tables_are_never_split(table_splits, count):
+    output = generate_measurements_pdf(readings(count), 'patient@example.com')
+    assert output.read(5) == b'%PDF-'
+    assert table_splits == []
+
+
+@pytest.mark.benchmark
+def test_pdf_export_time_is_linear():
+    per_row = {}
+    for count in (1_000, 10_000, 100_000):
+        start = time.perf_counter()
+        output = generate_measurements_pdf(readings(count), 'patient@example.com')
+        elapsed = time.perf_counter() - start
+        output.seek(0, 2)
+        per_row[count] = elapsed / count
+        print(f'{count} rows: {elapsed:.2f} s, {per_row[count] * 1e6:.0f} us/row, '
+              f'{output.tell() // 1024} KiB')
+    # Linear: the cost per row does not grow with the size of the export.
+    assert per_row[100_000] < per_row[1_000] * 1.5
+
+
+def csv_rows(data):
+    assert data.startswith('\ufeff')
+    return list(csv.reader(StringIO(data[1:]), delimiter=';'))
+
+
+def test_csv_starts_with_the_bom():
+    chunks = list(stream_measurements_csv([]))
+    assert chunks[0].startswith(b'\xef\xbb\xbf')
+    assert csv_rows(b''.join(chunks).decode('utf-8')) == [EXPORT_COLUMNS]
+
+
+def test_csv_rows_across_chunk_boundaries():
+    def noted(count):
+        for i, m in enumerate(readings(count)):
+            # Quoted fields with separators and line breaks.
+            m.notes = f'après repas; n°{i}\nà jeun' if i % 3 == 0 else None
+            yield m
+    chunks = list(stream_measurements_csv(noted(5000)))
+    assert len(chunks) > 3
+    assert all(len(chunk) >= CHUNK_SIZE for chunk in chunks[:-1])
+    assert sum(chunk.startswith(b'\xef\xbb\xbf') for chunk in chunks) == 1
+
+    rows = csv_rows(b''.join(chunks).decode('utf-8'))
+    assert rows[0] == EXPORT_COLUMNS and len(rows) == 5001
+    assert [row[5] for row in rows[1:4]] == ['après repas; n°0\nà jeun', '', '']
+    assert rows[-1][0] == (datetime(2026, 1, 1, 8) - timedelta(minutes=4999)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def test_csv_route_streams_every_row(app, patient_id, login, monkeypatch):
+    # Many yield_per batches, read while the response is being sent.
+    monkeypatch.setattr('app.routes.patient.EXPORT_BATCH_SIZE', 7)
+    start = datetime(2024, 1, 1)
+    with app.app_context():
+        db.session.bulk_insert_mappings(Measurement, [
+            dict(user_id=patient_id, type='poids', value1=70 + i % 10, unit='kg',
+                 date=start + timedelta(hours=i), notes='x' * 50)
+            for i in range(3000)
+        ])
+        db.session.commit()
+
+    response = login('patient@example.com').get('/measurements/export/csv')
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'].startswith('attachment; filename=mesures_')
+
+    rows = csv_rows(response.get_data(as_text=True))
+    assert len(rows) == 3001
+    # Newest first, none missing.
+    dates = [row[0] for row in rows[1:]]
+    assert dates == [(start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S')
+                     for i in reversed(range(3000))]
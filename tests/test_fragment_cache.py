@@ -0,0 +1,96 @@
+import pytest
+from flask import render_template_string
+
+from app.utils.fragment_cache import FileSystemCache, MemoryCache
+
+from conftest import running_app
+
+
+@pytest.fixture
+def config(config):
+    config.FRAGMENT_CACHE = 'memory'
+    return config
+
+
+@pytest.fixture
+def doctor(app, doctor_id, login):
+    return login('doctor@example.com')
+
+
+@pytest.fixture
+def patient(app, patient_id, login):
+    return login('patient@example.com')
+
+
+def page(client, url='/profile'):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_roles_do_not_share_fragments(app, doctor, patient):
+    # Same template and endpoint: only the role tells the navs apart.
+    assert 'href="/doctor/dashboard"' in page(doctor)
+    patient_page = page(patient)
+    assert 'href="/doctor/dashboard"' not in patient_page
+    assert 'href="/history"' in patient_page
+    assert 'href="/history"' not in page(doctor)
+
+    keys = list(app.extensions['fragment_cache']._entries)
+    assert 'base.html:fr:doctor:nav' in keys and 'base.html:fr:patient:nav' in keys
+
+
+def test_languages_do_not_share_fragments(patient):
+    assert 'Historique' in page(patient)
+    patient.set_cookie('lang', 'en')
+    english = page(patient)
+    assert '>History</a>' in english and 'Historique' not in english
+
+
+def test_cached_block_is_rendered_once(app):
+    calls = []
+    template = "{% cache 'k' %}{{ render() }}{% endcache %}"
+    with app.test_request_context():
+        # Escaped once when rendered, not again when served from the cache.
+        for _ in range(3):
+            assert render_template_string(template, render=lambda: calls.append(1) or '<b>') == '&lt;b&gt;'
+    assert len(calls) == 1
+
+
+def test_none_backend_renders_every_time(app):
+    app.jinja_env.fragment_cache = None
+    calls = []
+    with app.test_request_context():
+        for _ in range(3):
+            render_template_string("{% cache 'k' %}{{ render() }}{% endcache %}",
+                                   render=lambda: calls.append(1) or '')
+    assert len(calls) == 3
+
+
+def test_none_backend_from_config(config):
+    config.FRAGMENT_CACHE = 'none'
+    with running_app(config) as app:
+        assert app.extensions['fragment_cache'] is None
+
+
+def test_memory_cache_is_a_bounded_lru():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 'A', 60)
+    cache.set('b', 'B', 60)
+    assert cache.get('a') == 'A'  # 'b' is now the least recently used
+    cache.set('c', 'C', 60)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ('A', None, 'C')
+    assert len(cache._entries) == 2
+
+    cache.set('d', 'D', -1)
+    assert cache.get('d') is None and 'd' not in cache._entries
+
+
+def test_filesystem_cache(tmp_path):
+    cache = FileSystemCache(str(tmp_path / 'fragments'))
+    cache.set('nav', '<nav>\néè</nav>', 60)
+    assert FileSystemCache(str(tmp_path / 'fragments')).get('nav') == '<nav>\néè</nav>'
+    cache.set('old', 'x', -1)
+    assert cache.get('old') is None and cache.get('missing') is None
+    cache.clear()
+    assert cache.get('nav') is None
@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.utils import http_cache
+
+from conftest import add_readings
+
+
+@pytest.fixture
+def patient(app, patient_id, login):
+    with app.app_context():
+        add_readings(patient_id, 12)
+    return login('patient@example.com')
+
+
+def revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': f'"{etag}"'})
+
+
+@pytest.mark.parametrize('url', ['/history', '/measurements/list', '/home'])
+def test_matching_etag_is_not_modified(patient, url):
+    response = patient.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    etag, _ = response.get_etag()
+
+    response = revalidate(patient, url, etag)
+    assert response.status_code == 304
+    assert response.get_etag()[0] == etag and response.data == b''
+    assert revalidate(patient, url, 'other').status_code == 200
+
+
+def test_etag_changes_with_a_new_measurement(patient):
+    etag, _ = patient.get('/history').get_etag()
+    assert patient.post('/measurements/add', data={'type': 'poids', 'value1': 70}).status_code == 302
+    patient.get('/home')  # shows the flash message
+
+    response = revalidate(patient, '/history', etag)
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_etag_changes_with_the_language(patient):
+    etag, _ = patient.get('/history').get_etag()
+    patient.set_cookie('lang', 'en')
+    assert revalidate(patient, '/history', etag).status_code == 200
+
+
+def test_no_304_while_a_flash_is_pending(patient):
+    etag, _ = patient.get('/history').get_etag()
+    with patient.session_transaction() as session:
+        session['_flashes'] = [('success', 'Mesure ajoutée')]
+    response = revalidate(patient, '/history', etag)
+    assert response.status_code == 200
+    assert 'Mesure ajoutée' in response.get_data(as_text=True)
+
+
+def test_history_etag_changes_the_next_day(patient, monkeypatch):
+    history, _ = patient.get('/history').get_etag()
+    listing, _ = patient.get('/measurements/list').get_etag()
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+    monkeypatch.setattr(http_cache, 'date', Tomorrow)
+
+    # Trends are relative to today; the list of readings is not.
+    assert revalidate(patient, '/history', history).status_code == 200
+    assert revalidate(patient, '/measurements/list', listing).status_code == 304
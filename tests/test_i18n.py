@@ -0,0 +1,64 @@
+import pytest
+from flask import g
+from jinja2 import DictLoader, Environment
+
+from app.i18n import CATALOGS, InlineTranslationsExtension, LanguageVariantLoader, split_lang, t
+
+PAGE = "<h1>{{ t('nav_history') }}</h1><p>{{ t(key) }}</p><i>{{ obj.t('nav_history') }}</i>"
+
+
+@pytest.fixture
+def env():
+    env = Environment(loader=LanguageVariantLoader(DictLoader({'page.html': PAGE})),
+                      extensions=[InlineTranslationsExtension], autoescape=True)
+    env.globals['t'] = t
+    return env
+
+
+def compiled(env, name):
+    source, _, _ = env.loader.get_source(env, name)
+    return env.compile(source, name=name, raw=True)
+
+
+@pytest.mark.parametrize('name, lang', [('page.html', None), ('@en/page.html', 'en'), ('@fr/x/y.html', 'fr')])
+def test_split_lang(name, lang):
+    assert split_lang(name)[0] == lang
+
+
+def test_constant_keys_are_inlined_per_language(env):
+    english, french = compiled(env, '@en/page.html'), compiled(env, '@fr/page.html')
+    assert '<h1>History</h1>' in english
+    assert '<h1>Historique</h1>' in french
+    # The plain name is the untranslated template.
+    assert 'History' not in compiled(env, 'page.html')
+
+
+def test_dynamic_keys_use_the_runtime_path(app, env):
+    assert "t('nav_history')" not in compiled(env, '@en/page.html')
+    with app.test_request_context():
+        g.lang, g.catalog = 'en', CATALOGS['en']
+        html = env.get_template('@en/page.html').render(
+            key='nav_reminders', obj={'t': lambda key: f'[{key}]'})
+    assert html == '<h1>History</h1><p>Reminders</p><i>[nav_history]</i>'
+
+
+def test_inlined_constants_stay_autoescaped(app, env, monkeypatch):
+    monkeypatch.setitem(CATALOGS['en'], 'nav_history', '<b>Tom & Jerry</b>')
+    monkeypatch.setitem(CATALOGS['en'], 'nav_reminders', '<script>')
+    with app.test_request_context():
+        g.lang, g.catalog = 'en', CATALOGS['en']
+        html = env.get_template('@en/page.html').render(key='nav_reminders', obj={'t': str})
+    assert html.startswith('<h1>&lt;b&gt;Tom &amp; Jerry&lt;/b&gt;</h1><p>&lt;script&gt;</p>')
+
+
+def test_unknown_constant_key_renders_the_key(env):
+    env.loader.loader.mapping['missing.html'] = "{{ t('no_such_key') }}"
+    assert env.get_template('@en/missing.html').render() == 'no_such_key'
+
+
+def test_pages_render_in_the_cookie_language(app, patient_id, login):
+    client = login('patient@example.com')
+    assert 'Historique' in client.get('/home').get_data(as_text=True)
+    client.set_cookie('lang', 'en')
+    page = client.get('/home').get_data(as_text=True)
+    assert '>History</a>' in page and 'Historique' not in page
@@ -0,0 +1,182 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Measurement, MeasurementSummary
+from app.utils.ingest import ingest_measurements
+from app.utils.query_budget import count_queries
+
+from conftest import add_readings, create_user
+
+
+def device_readings(prefix, count, start, type='glycemie'):
+    return [{'type': type, 'value1': 100 + i, 'date': (start + timedelta(minutes=40 * i)).isoformat(),
+             'source': 'meter', 'external_id': f'{prefix}-{i}'}
+            for i in range(count)]
+
+
+def test_summaries_are_locked_before_keyed_rows_are_inserted(app, patient_id):
+    start = datetime.utcnow() - timedelta(days=1)
+    rows = device_readings('a', 3, start) + device_readings('b', 3, start, type='tension')
+    with app.app_context():
+        with count_queries() as statements:
+            results = ingest_measurements(patient_id, rows)
+    assert [r['status'] for r in results] == ['created'] * 6
+
+    writes = [s.split('(')[0].split(' SET')[0].strip() for s in statements
+              if s.startswith(('INSERT', 'UPDATE'))]
+    first_insert = writes.index('INSERT INTO measurement')
+    # Both summaries (new: the lock creates them) come first
+    assert writes[:first_insert].count('INSERT INTO measurement_summary') == 2
+
+
+def test_concurrent_first_syncs_share_one_summary(app, patient_id):
+    threads = 8
+    barrier = threading.Barrier(threads)
+    errors = []
+    start = datetime.utcnow() - timedelta(days=2)
+
+    def sync(k):
+        with app.app_context():
+            rows = device_readings(f'device{k}', 5, start + timedelta(minutes=7 * k))
+            barrier.wait()
+            try:
+                ingest_measurements(patient_id, rows)
+            except Exception as e:
+                errors.append(e)
+                db.session.rollback()
+
+    workers = [threading.Thread(target=sync, args=(k,)) for k in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    with app.app_context():
+        summaries = MeasurementSummary.query.filter_by(user_id=patient_id).all()
+        assert [(s.type, s.count) for s in summaries] == [('glycemie', threads * 5)]
+        assert Measurement.query.filter_by(user_id=patient_id).count() == threads * 5
+
+
+def hourly_readings(count, start):
+    return [{'type': 'glycemie', 'value1': 90 + i % 50, 'date': (start + timedelta(hours=i)).isoformat()}
+            for i in range(count)]
+
+
+def test_bulk_endpoint_reports_each_reading(app, patient_id, login):
+    client = login('patient@example.com')
+    start = datetime.utcnow() - timedelta(hours=5)
+    batch = [
+        {'type': 'glycemie', 'value1': 100, 'date': start.isoformat()},
+        {'type': 'glycemie', 'value1': 200, 'date': (start + timedelta(minutes=10)).isoformat()},
+        {'type': 'tension', 'value1': 150, 'value2': 95, 'date': start.isoformat() + '+00:00'},
+        {'type': 'bogus', 'value1': 1},
+        {'type': 'poids', 'value1': 70, 'date': 'garbage'},
+        'not a reading',
+    ]
+    response = client.post('/api/measurements/bulk', json={'measurements': batch})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['status'] for r in body['results']] == \
+        ['created', 'averaged', 'created', 'error', 'error', 'error']
+    assert (body['created'], body['averaged'], body['error']) == (2, 1, 3)
+
+    assert client.post('/api/measurements/bulk', json={'a': 1}).status_code == 400
+    assert client.post('/api/measurements/bulk', json=[{}] * 1001).status_code == 413
+
+
+def test_bulk_ingestion_runs_a_bounded_number_of_statements(app, patient_id, max_queries):
+    # Not one statement per reading: a batch of 500 costs about as much
+    # as a batch of 5.
+    start = datetime.utcnow() - timedelta(days=30)
+    with app.app_context():
+        with max_queries(20):
+            results = ingest_measurements(patient_id, hourly_readings(500, start))
+        assert [r['status'] for r in results] == ['created'] * 500
+        # Each reported id is the row of that reading.
+        stored = {m.id: (m.value1, m.date) for m in Measurement.query.filter_by(user_id=patient_id)}
+        assert [stored[r['id']] for r in results] == \
+            [(90 + i % 50, start + timedelta(hours=i)) for i in range(500)]
+
+
+SUMMARY_FIELDS = ('count', 'sum_value1', 'sum_sq_value1', 'sum_value2', 'count_value2',
+                  'count_warning', 'count_high', 'min_value1', 'max_value1', 'latest_id',
+                  'latest_value1', 'latest_value2', 'latest_date', 'previous_value1',
+                  'previous_value2', 'previous_date', 'recent')
+
+
+def summary_fields(summary):
+    return {field: round(value, 6) if isinstance(value, float) else value
+            for field, value in ((f, getattr(summary, f)) for f in SUMMARY_FIELDS)}
+
+
+def assert_summaries_match_a_rebuild(user_id):
+    for summary in MeasurementSummary.query.filter_by(user_id=user_id):
+        kept = summary_fields(summary)
+        summary.rebuild()
+        assert kept == summary_fields(summary), summary.type
+        db.session.rollback()
+
+
+@pytest.mark.parametrize('offsets, values', [
+    # Newer readings: applied incrementally, no rescan of the history
+    ([10, 20, 80], [100, 130, 200]),
+    # First reading within 30 minutes of the stored latest: averaged into it
+    ([5, 20, 90], [300, 80, 150]),
+])
+def test_newer_readings_update_summaries_incrementally(app, patient_id, offsets, values):
+    with app.app_context():
+        latest = datetime.utcnow() - timedelta(days=1)
+        add_readings(patient_id, 30, start=latest - timedelta(hours=7 * 29))
+        latest = Measurement.for_user(patient_id, 'glycemie').first().date
+        rows = [{'type': 'glycemie', 'value1': value, 'date': (latest + timedelta(minutes=offset)).isoformat()}
+                for offset, value in zip(offsets, values)]
+        with count_queries() as statements:
+            ingest_measurements(patient_id, rows)
+        assert not [s for s in statements if 'count(measurement.id)' in s]
+        assert_summaries_match_a_rebuild(patient_id)
+
+
+def test_back_dated_readings_rebuild_their_summary(app, patient_id):
+    with app.app_context():
+        add_readings(patient_id, 30)
+        first = Measurement.for_user(patient_id, 'tension').all()[-1].date
+        rows = [
+            {'type': 'tension', 'value1': 180, 'value2': 100, 'date': (first - timedelta(days=3)).isoformat()},
+            {'type': 'tension', 'value1': 110, 'value2': 70},
+            {'type': 'poids', 'value1': 72},
+        ]
+        with count_queries() as statements:
+            ingest_measurements(patient_id, rows)
+        # Only the tension summary is rebuilt.
+        assert len([s for s in statements if 'count(measurement.id)' in s]) == 1
+        assert_summaries_match_a_rebuild(patient_id)
+
+
+@pytest.mark.benchmark
+def test_bulk_throughput(app, login):
+    count = 500
+    with app.app_context():
+        create_user('bulk@example.com')
+        create_user('single@example.com')
+    start = datetime.utcnow() - timedelta(days=400)
+
+    client = login('bulk@example.com')
+    began = time.perf_counter()
+    response = client.post('/api/measurements/bulk', json=hourly_readings(count, start))
+    bulk = time.perf_counter() - began
+    assert response.get_json()['created'] == count
+
+    client = login('single@example.com')
+    began = time.perf_counter()
+    for i in range(count):
+        client.post('/measurements/add', data={'type': 'glycemie', 'value1': 90 + i % 50})
+    single = time.perf_counter() - began
+
+    print(f'{count} readings: bulk {bulk * 1000:.0f} ms ({count / bulk:.0f}/s), '
+          f'one request each {single * 1000:.0f} ms ({count / single:.0f}/s)')
+    assert bulk * 10 < single
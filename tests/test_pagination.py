@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Measurement
+from app.models.measurement import PAGE_SIZE
+
+from conftest import create_user
+
+NOON = datetime(2024, 5, 1, 12)
+
+
+def store(user_id, dates, type='poids'):
+    rows = [Measurement(user_id=user_id, type=type, value1=70 + i, unit='kg', date=date)
+            for i, date in enumerate(dates)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [m.id for m in rows]
+
+
+def all_pages(user_id, limit, type=None):
+    pages, cursor = [], None
+    while True:
+        items, cursor = Measurement.page_for(user_id, type=type, before=cursor, limit=limit)
+        pages.append([m.id for m in items])
+        if cursor is None:
+            return pages
+
+
+def test_ties_on_date_are_paged_by_id(app, patient_id):
+    with app.app_context():
+        # Five readings at the same instant between two others.
+        ids = store(patient_id, [NOON + timedelta(hours=1)] + [NOON] * 5 + [NOON - timedelta(hours=1)])
+        expected = [ids[0]] + sorted(ids[1:6], reverse=True) + [ids[6]]
+
+        pages = all_pages(patient_id, limit=2)
+        assert [id for page in pages for id in page] == expected
+        assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+
+@pytest.mark.parametrize('count, limit, pages', [(0, 3, 1), (3, 3, 1), (4, 3, 2), (6, 3, 2)])
+def test_last_page_has_no_cursor(app, patient_id, count, limit, pages):
+    with app.app_context():
+        store(patient_id, [NOON + timedelta(minutes=i) for i in range(count)])
+        assert len(all_pages(patient_id, limit)) == pages
+        items, cursor = Measurement.page_for(patient_id, limit=count + 1)
+        assert len(items) == count and cursor is None
+
+
+@pytest.mark.parametrize('before', ['', 'garbage', '2024-05-01_12', '2024-05-01T12:00:00.000000_x', 'abc_1'])
+def test_malformed_cursor_returns_the_first_page(app, patient_id, before):
+    with app.app_context():
+        store(patient_id, [NOON + timedelta(minutes=i) for i in range(5)])
+        first = Measurement.page_for(patient_id, limit=2)
+        again = Measurement.page_for(patient_id, before=before, limit=2)
+        assert [m.id for m in again[0]] == [m.id for m in first[0]]
+        assert again[1] == first[1]
+
+
+def test_pages_are_per_user_and_type(app, patient_id):
+    with app.app_context():
+        other_id = create_user('other@example.com')
+        mine = store(patient_id, [NOON + timedelta(minutes=i) for i in range(3)])
+        store(patient_id, [NOON] * 2, type='glycemie')
+        store(other_id, [NOON] * 4)
+        assert all_pages(patient_id, limit=2, type='poids') == [mine[:0:-1], mine[:1]]
+        assert sum(map(len, all_pages(patient_id, limit=10))) == 5
+
+
+def test_list_route_follows_the_cursor(app, patient_id, login):
+    with app.app_context():
+        store(patient_id, [NOON + timedelta(minutes=i) for i in range(PAGE_SIZE + 1)])
+        _, cursor = Measurement.page_for(patient_id)
+    link = 'before=' + cursor
+    client = login('patient@example.com')
+    assert link in client.get('/measurements/list').get_data(as_text=True)
+    assert 'before=' not in client.get('/measurements/list?' + link).get_data(as_text=True)
+    assert link in client.get('/measurements/list?before=garbage').get_data(as_text=True)
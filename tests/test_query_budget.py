@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+
+from app import db
+from app.models import Measurement, Alert, Appointment
+from app.utils.query_budget import QueryBudgetExceeded, count_queries, query_budget
+from app.utils.replica import read_only
+
+from conftest import create_user, add_readings, add_free_slots, running_app
+
+
+@pytest.fixture
+def clinic(app, patient_id, doctor_id):
+    """
+    A few patients with a history, alerts and appointments, so that an
+    N+1 query in a list shows up as extra statements.
+    """
+    with app.app_context():
+        patients = [patient_id] + [create_user(f'p{i}@example.com', last_name=f'Nom{i}')
+                                   for i in range(4)]
+        for user_id in patients:
+            add_readings(user_id, 60)
+            db.session.add(Measurement(user_id=user_id, type='tension', value1=170, value2=100,
+                                       unit='mmHg', date=datetime.utcnow()))
+            db.session.flush()
+        db.session.commit()
+        Alert.backfill()
+        add_free_slots(doctor_id, 6)
+        start = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
+        for i, user_id in enumerate(patients):
+            db.session.add(Appointment(doctor_id=doctor_id, patient_id=user_id, status='confirmed',
+                                       start_time=start + timedelta(hours=i),
+                                       end_time=start + timedelta(hours=i, minutes=30),
+                                       duration=30))
+        db.session.commit()
+    return patients
+
+
+@pytest.mark.parametrize('url', [
+    '/home', '/history', '/measurements/list', '/reminders', '/patient/book',
+])
+def test_patient_routes_within_budget(clinic, login, url):
+    # QUERY_BUDGET_ENFORCED: going over budget raises and fails here.
+    assert login('patient@example.com').get(url).status_code == 200
+
+
+@pytest.mark.parametrize('url', [
+    '/doctor/dashboard', '/doctor/agenda', '/doctor/patients', '/doctor/patient/{patient_id}',
+])
+def test_doctor_routes_within_budget(clinic, login, patient_id, url):
+    response = login('doctor@example.com').get(url.format(patient_id=patient_id))
+    assert response.status_code == 200
+
+
+def test_route_over_budget_fails(app, patient_id, login):
+    @query_budget(1)
+    def two_queries():
+        Measurement.query.count()
+        Measurement.query.count()
+        return 'ok'
+    app.add_url_rule('/_two_queries', view_func=two_queries)
+
+    with pytest.raises(QueryBudgetExceeded, match='ran 2 SQL statements'):
+        login('patient@example.com').get('/_two_queries')
+
+
+def test_max_queries_fixture(app, patient_id, max_queries):
+    with app.app_context():
+        with max_queries(1):
+            Measurement.page_for(patient_id)
+        with pytest.raises(pytest.fail.Exception):
+            with max_queries(1):
+                Measurement.page_for(patient_id)
+                Measurement.page_for(patient_id)
+
+
+@pytest.fixture
+def replica_app(config, tmp_path):
+    class ReplicaConfig(config):
+        SQLALCHEMY_REPLICA_URI = 'sqlite:///' + str(tmp_path / 'replica.db')
+    with running_app(ReplicaConfig) as app:
+        yield app
+
+
+def test_replica_statements_are_counted(replica_app):
+    app = replica_app
+
+    @read_only
+    @query_budget(1)
+    def two_replica_queries():
+        assert g.use_replica
+        Measurement.query.count()
+        Measurement.query.count()
+        return 'ok'
+    app.add_url_rule('/_two_replica_queries', view_func=two_replica_queries)
+
+    with pytest.raises(QueryBudgetExceeded):
+        app.test_client().get('/_two_replica_queries')
+
+
+def test_other_threads_are_not_counted(app):
+    def query():
+        with app.app_context():
+            Measurement.query.count()
+
+    with app.app_context():
+        with count_queries() as statements:
+            thread = threading.Thread(target=query)
+            thread.start()
+            thread.join()
+            Measurement.query.count()
+    assert len(statements) == 1
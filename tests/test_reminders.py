@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models.reminder import ALL_WEEKDAYS, Reminder, parse_time_of_day, parse_weekdays
+from app.utils.reminders import MemoryNotifier, Notifier, ReminderScheduler, claim, dispatch_due
+
+MON, TUE, WED, THU, FRI, SAT, SUN = (1 << day for day in range(7))
+
+# A Monday
+NOW = datetime(2024, 6, 3, 12, 0)
+
+
+@pytest.mark.parametrize('value, minutes', [
+    ('08:30', 510), ('8h05', 485), (' 23:59 ', 1439), ('00:00', 0),
+])
+def test_parse_time_of_day(value, minutes):
+    assert parse_time_of_day(value) == minutes
+
+
+@pytest.mark.parametrize('value', ['24:00', '12:60', '7:5', 'midi', '', None])
+def test_parse_time_of_day_rejects(value):
+    with pytest.raises(ValueError):
+        parse_time_of_day(value)
+
+
+@pytest.mark.parametrize('value, mask', [
+    ('', ALL_WEEKDAYS),
+    ('Tous les jours', ALL_WEEKDAYS),
+    ('daily', ALL_WEEKDAYS),
+    ('Lundi, Mercredi', MON | WED),
+    ('Mon, Fri', MON | FRI),
+    ('Lun-Ven', MON | TUE | WED | THU | FRI),
+    ('mon - wed', MON | TUE | WED),
+    ('Samedi et Dimanche', SAT | SUN),
+    ('Sat and Sun', SAT | SUN),
+    ('Ven-Lun', FRI | SAT | SUN | MON),
+    ('mardi/jeudi', TUE | THU),
+    ('Mércredi', WED),
+])
+def test_parse_weekdays(value, mask):
+    assert parse_weekdays(value) == mask
+
+
+def test_parse_weekdays_rejects_unknown_days():
+    with pytest.raises(ValueError):
+        parse_weekdays('Lundi, Funday')
+
+
+def reminder(time, days, **fields):
+    r = Reminder(title='Tension', time=time, days=days, **fields)
+    r.minute_of_day = parse_time_of_day(time)
+    r.weekdays = parse_weekdays(days)
+    return r
+
+
+@pytest.mark.parametrize('time, days, after, expected', [
+    # Later the same day
+    ('13:00', '', NOW, datetime(2024, 6, 3, 13, 0)),
+    # Strictly after: the occurrence at `after` itself is skipped
+    ('12:00', '', NOW, datetime(2024, 6, 4, 12, 0)),
+    # Past today: tomorrow
+    ('08:00', '', NOW, datetime(2024, 6, 4, 8, 0)),
+    # Only on Mondays, already past: a week later
+    ('08:00', 'Lundi', NOW, datetime(2024, 6, 10, 8, 0)),
+    # Weekend to Monday
+    ('08:00', 'Lun-Ven', datetime(2024, 6, 8, 9, 0), datetime(2024, 6, 10, 8, 0)),
+    # Sunday just before midnight to Monday morning
+    ('07:00', 'Lundi', datetime(2024, 6, 9, 23, 59), datetime(2024, 6, 10, 7, 0)),
+    # Across the end of the month and of the year
+    ('09:00', 'Mercredi', datetime(2024, 12, 31, 10, 0), datetime(2025, 1, 1, 9, 0)),
+    ('23:30', '', datetime(2024, 2, 29, 23, 45), datetime(2024, 3, 1, 23, 30)),
+])
+def test_next_occurrence(time, days, after, expected):
+    assert reminder(time, days).next_occurrence(after) == expected
+
+
+def test_notifier_is_abstract():
+    with pytest.raises(TypeError):
+        Notifier()
+
+
+def due_reminders(user_id, count, due=NOW - timedelta(minutes=5)):
+    """
+    `count` active reminders due at `due`, committed.
+    """
+    reminders = [reminder(due.strftime('%H:%M'), '', user_id=user_id, is_active=True,
+                          next_fire_at=due) for _ in range(count)]
+    db.session.add_all(reminders)
+    db.session.commit()
+    return reminders
+
+
+def test_claim_is_a_compare_and_set(app, patient_id):
+    with app.app_context():
+        mine, theirs = due_reminders(patient_id, 2)
+        due = theirs.next_fire_at
+        assert claim(mine, NOW)
+        assert (mine.next_fire_at, mine.last_fired_at) == (datetime(2024, 6, 4, 11, 55), due)
+
+        # Another process claims it first: our copy is stale.
+        db.session.execute(db.update(Reminder).where(Reminder.id == theirs.id)
+                           .values(next_fire_at=datetime(2024, 6, 4, 11, 55), last_fired_at=due)
+                           .execution_options(synchronize_session=False))
+        assert not claim(theirs, NOW)
+        assert (theirs.next_fire_at, theirs.last_fired_at) == (due, None)
+
+
+class BatchNotifier(MemoryNotifier):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def send(self, reminders):
+        self.batches.append(len(reminders))
+        super().send(reminders)
+
+
+def test_dispatch_due_in_batches(app, patient_id):
+    with app.app_context():
+        due = due_reminders(patient_id, 5)
+        later = due_reminders(patient_id, 1, due=NOW + timedelta(hours=1))
+        inactive = due_reminders(patient_id, 1)[0]
+        inactive.is_active = False
+        db.session.commit()
+
+        notifier = BatchNotifier()
+        sent = dispatch_due(NOW, notifier, batch_size=2)
+        assert notifier.batches == [2, 2, 1]
+        assert sorted(r.id for r in sent) == sorted(r.id for r in due)
+        assert all(r.last_fired_at == NOW - timedelta(minutes=5) for r in sent)
+        assert all(r.next_fire_at == datetime(2024, 6, 4, 11, 55) for r in sent)
+
+        # Nothing is sent twice; the others are untouched.
+        assert dispatch_due(NOW, notifier, batch_size=2) == []
+        assert later[0].last_fired_at is None and inactive.last_fired_at is None
+
+
+def test_scheduler_dispatches_from_its_heap(app, patient_id):
+    with app.app_context():
+        r, = due_reminders(patient_id, 1, due=NOW + timedelta(seconds=30))
+        notifier = MemoryNotifier()
+        scheduler = ReminderScheduler(app, notifier)
+
+        # Sleeps until the reminder is due, then sends it.
+        assert scheduler.run_pending(NOW) == 30
+        assert scheduler.run_pending(NOW + timedelta(seconds=30)) > 0
+        assert [id for id, *_ in notifier.sent] == [r.id]
@@ -0,0 +1,75 @@
+import sqlite3
+import time
+
+import pytest
+from flask import g
+
+from app import db
+from app.models import Patient
+from app.utils.replica import REPLICA_BIND, STICKY_KEY
+
+from conftest import create_user
+
+
+@pytest.fixture
+def config(config, tmp_path):
+    config.SQLALCHEMY_REPLICA_URI = 'sqlite:///' + str(tmp_path / 'replica.db')
+    return config
+
+
+@pytest.fixture
+def doctor(app, doctor_id, login):
+    """
+    A logged in doctor; one patient, called 'Primaire' on the primary and
+    'Replique' on the replica (a copy of the primary).
+    """
+    with app.app_context():
+        create_user('p@example.com', last_name='Primaire')
+        primary, replica = db.engines[None], db.engines[REPLICA_BIND]
+        with sqlite3.connect(primary.url.database) as source, \
+                sqlite3.connect(replica.url.database) as target:
+            source.backup(target)
+            target.execute("UPDATE patient SET last_name = 'Replique' WHERE last_name = 'Primaire'")
+        replica.dispose()
+    return login('doctor@example.com')
+
+
+def shown_patient(client):
+    page = client.get('/doctor/patients').get_data(as_text=True)
+    assert ('Primaire' in page) != ('Replique' in page)
+    return 'Primaire' if 'Primaire' in page else 'Replique'
+
+
+def test_read_only_views_read_the_replica(doctor):
+    assert shown_patient(doctor) == 'Replique'
+    with doctor.session_transaction() as session:
+        assert STICKY_KEY not in session
+
+
+def test_writes_stick_to_the_primary(app, doctor):
+    response = doctor.post('/appointment/create_slot', data={'date': '2030-01-07', 'time': '09:00'})
+    assert response.status_code == 302
+    with doctor.session_transaction() as session:
+        until = session[STICKY_KEY]
+    assert time.time() < until <= time.time() + app.config['REPLICA_STICKY_SECONDS']
+    assert shown_patient(doctor) == 'Primaire'
+
+    # Once the delay is over, reads go back to the replica.
+    with doctor.session_transaction() as session:
+        session[STICKY_KEY] = time.time() - 1
+    assert shown_patient(doctor) == 'Replique'
+
+
+def test_flush_drops_the_replica_for_the_rest_of_the_request(app, doctor):
+    def last_name():
+        return db.session.scalar(db.select(Patient.last_name).filter_by(first_name='Jean'))
+
+    with app.test_request_context():
+        g.use_replica = True
+        assert last_name() == 'Replique'
+        patient = db.session.scalar(db.select(Patient).filter_by(first_name='Jean'))
+        patient.first_name = 'Jeanne'
+        db.session.flush()
+        assert g.db_wrote and 'use_replica' not in g
+        assert db.session.scalar(db.select(Patient.last_name).filter_by(first_name='Jeanne')) == 'Primaire'
+        db.session.rollback()
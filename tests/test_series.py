@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Measurement
+from app.utils.series import bucketed_series, lttb
+
+
+def store(user_id, readings, type='glycemie'):
+    db.session.add_all(Measurement(user_id=user_id, type=type, value1=value1, value2=value2,
+                                   unit='mg/dL', date=date)
+                       for date, value1, value2 in readings)
+    db.session.commit()
+
+
+def hourly(count, start=datetime(2024, 1, 1)):
+    return [(start + timedelta(hours=i), 100 + i % 10, None) for i in range(count)]
+
+
+def test_lttb_keeps_first_last_and_peaks():
+    rows = hourly(1000)
+    rows[500] = (rows[500][0], 400, None)
+    sampled = lttb(rows, 50)
+    assert len(sampled) == 50
+    assert sampled[0] == rows[0] and sampled[-1] == rows[-1]
+    assert rows[500] in sampled
+    assert [r[0] for r in sampled] == sorted(r[0] for r in sampled)
+
+
+@pytest.mark.parametrize('threshold', [1000, 5000])
+def test_lttb_returns_short_series_unchanged(threshold):
+    rows = hourly(1000)
+    assert lttb(rows, threshold) == rows
+
+
+@pytest.mark.parametrize('points, expected', [
+    ('0', 3), ('-5', 3), ('3', 3), ('50', 50), ('abc', 200), ('5000', 1000),
+])
+def test_raw_points_are_clamped(app, patient_id, login, points, expected):
+    with app.app_context():
+        store(patient_id, hourly(1000))
+    response = login('patient@example.com').get(
+        f'/api/measurements/series?type=glycemie&points={points}')
+    assert len(response.get_json()['points']) == expected
+
+
+def test_raw_points_upper_bound(app, patient_id, login, monkeypatch):
+    monkeypatch.setattr('app.routes.api.MAX_RAW_POINTS', 100)
+    with app.app_context():
+        store(patient_id, hourly(1000))
+    response = login('patient@example.com').get(
+        '/api/measurements/series?type=glycemie&points=1000')
+    assert len(response.get_json()['points']) == 100
+
+
+def test_week_buckets_span_new_year(app, patient_id):
+    # Monday 30 December 2024 to Sunday 5 January 2025 is one ISO week.
+    readings = [
+        (datetime(2024, 12, 29, 20), 90, None),   # Sunday, previous week
+        (datetime(2024, 12, 30, 8), 100, None),
+        (datetime(2025, 1, 1, 8), 110, None),
+        (datetime(2025, 1, 5, 22), 120, None),
+        (datetime(2025, 1, 6, 8), 130, None),     # Monday, next week
+    ]
+    with app.app_context():
+        store(patient_id, readings)
+        series = bucketed_series(patient_id, 'glycemie', 'week')
+    assert [(p['date'][:10], p['count']) for p in series] == \
+        [('2024-12-29', 1), ('2024-12-30', 3), ('2025-01-06', 1)]
+    assert series[1]['val1'] == {'min': 100, 'max': 120, 'mean': 110}
+    assert series[1]['val2'] is None
+
+
+def test_day_and_month_buckets(app, patient_id):
+    readings = [
+        (datetime(2024, 3, 1, 8), 150, 90),
+        (datetime(2024, 3, 1, 20), 130, 80),
+        (datetime(2024, 3, 15, 8), 110, 70),
+        (datetime(2024, 4, 2, 8), 120, 75),
+    ]
+    with app.app_context():
+        store(patient_id, readings, type='tension')
+        days = bucketed_series(patient_id, 'tension', 'day')
+        months = bucketed_series(patient_id, 'tension', 'month')
+        april = bucketed_series(patient_id, 'tension', 'month', start=datetime(2024, 4, 1))
+    assert [p['count'] for p in days] == [2, 1, 1]
+    assert days[0]['val1'] == {'min': 130, 'max': 150, 'mean': 140}
+    assert days[0]['val2'] == {'min': 80, 'max': 90, 'mean': 85}
+    assert [(p['date'][:7], p['count']) for p in months] == [('2024-03', 3), ('2024-04', 1)]
+    assert [p['count'] for p in april] == [1]
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Measurement
+from app.models.measurement import STATUS_COLORS
+
+# (type, value1, value2, severity, is_alert).  Severity thresholds are
+# inclusive (>=), alert thresholds strictly above (>).
+EDGES = [
+    ('tension', 119, 79, 'normal', False),
+    ('tension', 120, 70, 'warning', False),
+    ('tension', 110, 80, 'warning', False),
+    ('tension', 139, 89, 'warning', False),
+    ('tension', 140, 80, 'high', False),
+    ('tension', 130, 90, 'high', False),
+    ('tension', 140, 90, 'high', False),
+    ('tension', 141, 85, 'high', True),
+    ('tension', 130, 91, 'high', True),
+    ('tension', 119, None, 'normal', False),
+    ('tension', 120, None, 'warning', False),
+    ('tension', 141, None, 'high', True),
+    ('glycemie', 99.9, None, 'normal', False),
+    ('glycemie', 100, None, 'warning', False),
+    ('glycemie', 125.9, None, 'warning', False),
+    ('glycemie', 126, None, 'high', False),
+    ('glycemie', 180, None, 'high', False),
+    ('glycemie', 180.5, None, 'high', True),
+    ('poids', 80, None, 'normal', False),
+    ('poids', 130, None, 'normal', False),
+    ('poids', 131, None, 'normal', True),
+]
+
+
+@pytest.fixture
+def readings(app, patient_id):
+    with app.app_context():
+        rows = [Measurement(user_id=patient_id, type=type, value1=value1, value2=value2, unit='',
+                            date=datetime(2024, 1, 1, 8))
+                for type, value1, value2, _, _ in EDGES]
+        db.session.add_all(rows)
+        db.session.commit()
+        yield {m.id: edge for m, edge in zip(rows, EDGES)}
+
+
+@pytest.mark.parametrize('type, value1, value2, severity, is_alert', EDGES)
+def test_python_side(type, value1, value2, severity, is_alert):
+    m = Measurement(type=type, value1=value1, value2=value2)
+    assert (m.severity, m.status_color, m.is_alert) == (severity, STATUS_COLORS[severity], is_alert)
+
+
+def test_sql_side_agrees(readings):
+    rows = db.session.query(Measurement.id, Measurement.severity,
+                            Measurement.status_color, Measurement.is_alert)
+    for id, severity, color, is_alert in rows:
+        edge = readings[id]
+        assert (severity, color, bool(is_alert)) == (edge[3], STATUS_COLORS[edge[3]], edge[4]), edge
+
+
+def test_sql_filters_agree(readings):
+    alerting = {id for id, in db.session.query(Measurement.id).filter(Measurement.is_alert)}
+    assert alerting == {id for id, edge in readings.items() if edge[4]}
+    for level in STATUS_COLORS:
+        ids = {id for id, in db.session.query(Measurement.id).filter(Measurement.severity == level)}
+        assert ids == {id for id, edge in readings.items() if edge[3] == level}, level
+
+
+def test_severity_counts(readings, patient_id):
+    counts = Measurement.severity_counts([patient_id])[patient_id]
+    expected = {}
+    for type, _, _, severity, _ in readings.values():
+        expected.setdefault(type, {}).setdefault(severity, 0)
+        expected[type][severity] += 1
+    assert counts == expected
@@ -0,0 +1,83 @@
+from datetime import date, datetime, time, timedelta
+
+from app import db
+from app.models import Appointment
+from app.models.slot_template import SlotTemplate
+from app.utils.slots import expand_templates, template_slots, without_overlaps
+
+MON, THU = 0, 3
+
+
+def template(doctor_id=None, days=(MON, THU), start='09:00', end='10:00', duration=20, type='cabinet'):
+    return SlotTemplate(doctor_id=doctor_id, weekdays=SlotTemplate.weekdays_mask(days),
+                        start=start, end=end, slot_duration=duration, type=type)
+
+
+def test_template_slots_on_its_weekdays():
+    # Monday 24 March to Thursday 3 April 2025, across the European
+    # change to summer time (30 March): slots stay at wall-clock times.
+    slots = list(template_slots(template(), date(2025, 3, 24), date(2025, 4, 3)))
+    assert sorted({start.date() for start, _ in slots}) == \
+        [date(2025, 3, 24), date(2025, 3, 27), date(2025, 3, 31), date(2025, 4, 3)]
+    assert {start.time() for start, _ in slots} == {time(9, 0), time(9, 20), time(9, 40)}
+    assert all(end - start == timedelta(minutes=20) for start, end in slots)
+    assert len(slots) == 12
+
+
+def test_template_slots_must_fit_before_the_end():
+    slots = list(template_slots(template(end='10:10'), date(2025, 3, 24), date(2025, 3, 24)))
+    assert [start.time() for start, _ in slots] == [time(9, 0), time(9, 20), time(9, 40)]
+    assert list(template_slots(template(end='09:10'), date(2025, 3, 24), date(2025, 3, 24))) == []
+
+
+def at(hour, minute=0):
+    return datetime(2025, 3, 24, hour, minute)
+
+
+def test_without_overlaps():
+    candidates = [(at(h, m), at(h, m) + timedelta(minutes=30), (h, m))
+                  for h in (9, 10, 11, 12) for m in (0, 30)]
+    candidates.insert(1, (at(9), at(10), 'long'))  # overlaps the 09:00 slot kept before it
+    busy = [
+        (at(8), at(9)),                 # ends as the first slot starts: no overlap
+        (at(8, 30), at(10, 15)),        # started earlier, still running at 10:00
+        (at(9, 45), at(9, 50)),
+        (at(11, 30), at(12)),
+    ]
+    kept = [payload for _, _, payload in without_overlaps(candidates, busy)]
+    assert kept == [(10, 30), (11, 0), (12, 0), (12, 30)]
+    assert without_overlaps(candidates[:2], []) == candidates[:1]
+
+
+def test_expand_templates(app, doctor_id):
+    tomorrow = date.today() + timedelta(days=1)
+    with app.app_context():
+        templates = [
+            template(doctor_id, days=(tomorrow.weekday(), (tomorrow.weekday() + 1) % 7),
+                     start='09:00', end='12:00', duration=30),
+            # Overlaps the first template: its slot is dropped.
+            template(doctor_id, days=(tomorrow.weekday(),), start='09:00', end='10:00',
+                     duration=60, type='visio'),
+        ]
+        db.session.add_all(templates)
+        morning = datetime.combine(tomorrow, time(10, 15))
+        db.session.add_all([
+            Appointment(doctor_id=doctor_id, start_time=morning, end_time=morning + timedelta(minutes=30),
+                        duration=30, status='booked'),
+            # Cancelled appointments do not block slots.
+            Appointment(doctor_id=doctor_id, start_time=morning + timedelta(days=1, hours=1),
+                        end_time=morning + timedelta(days=1, hours=2), duration=60, status='cancelled'),
+        ])
+        db.session.commit()
+
+        until = date.today() + timedelta(days=7)
+        # Two days of 6 slots, less 10:00 and 10:30 tomorrow.
+        assert expand_templates(doctor_id, templates, until) == 10
+        db.session.commit()
+        free = Appointment.query.filter_by(status='free').order_by(Appointment.start_time).all()
+        assert [s.start_time.strftime('%H:%M') for s in free[:4]] == ['09:00', '09:30', '11:00', '11:30']
+        assert {s.template_id for s in free} == {templates[0].id}
+        assert all(t.generated_until == until for t in templates)
+
+        # Idempotent: nothing left to create up to the same horizon.
+        assert expand_templates(doctor_id, templates, until) == 0
@@ -0,0 +1,45 @@
+import pytest
+from flask import g
+from sqlalchemy.exc import OperationalError
+
+from app import db
+
+
+@pytest.fixture
+def config(config):
+    config.SQL_INSTRUMENTATION = True
+    config.SQL_SLOW_QUERY_MS = 0
+    return config
+
+
+def test_failed_statement_leaves_no_start_time(app):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql('SELECT * FROM no_such_table')
+            assert conn.info['query_start_time'] == []
+            conn.exec_driver_sql('SELECT 1')
+            assert conn.info['query_start_time'] == []
+
+
+def test_explain_runs_on_the_executing_connection(app):
+    # A temporary table only exists on the connection that created it.
+    with app.test_request_context():
+        g.sql_stats = {'count': 0, 'time': 0.0, 'slowest': []}
+        db.session.execute(db.text('CREATE TEMP TABLE scratch (x INTEGER)'))
+        db.session.execute(db.text('SELECT x FROM scratch WHERE x = :x'), {'x': 1})
+        plans = {statement: plan for _, statement, plan in g.sql_stats['slowest']}
+        db.session.rollback()
+    plan = plans['SELECT x FROM scratch WHERE x = ?']
+    assert any('scratch' in line for line in plan), plan
+
+
+def test_slow_statements_are_logged_with_their_plan(app, patient_id, login, caplog):
+    client = login('patient@example.com')
+    with caplog.at_level('WARNING', logger='app.sql'):
+        response = client.get('/home')
+    assert response.status_code == 200
+    assert 'db;dur=' in response.headers['Server-Timing']
+    slow = [r.getMessage() for r in caplog.records if r.getMessage().startswith('Slow SQL')]
+    assert slow and all('EXPLAIN failed' not in message for message in slow)
+    assert any('\nPlan:\n' in message for message in slow)